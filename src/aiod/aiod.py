@@ -1,12 +1,25 @@
 from collections import namedtuple
 import requests
-from keycloak import KeycloakOpenID
 import logging
+from typing import TYPE_CHECKING
+from aiod.cache import DocumentCache
+from telemetry.metrics import REGISTRY
+from telemetry.tracing import span
+from transport.session import new_session
+
+if TYPE_CHECKING:
+    from keycloak import KeycloakOpenID
 
 logger = logging.getLogger(__name__)
 
 Result = namedtuple('Result', ['success', 'value', 'reason'])
 
+_request_seconds = REGISTRY.histogram(
+    'aiod_request_seconds',
+    'Duration of the requests to AIoD',
+    ('method', 'endpoint', 'status')
+)
+
 
 class AIoD:
     _session: requests.Session | None = None
@@ -22,8 +35,9 @@ class AIoD:
     _keycloak_client_id: str = ''
     _keycloak_realm_name: str = ''
     _keycloak_client_secret_key: str = ''
-    _keycloak_configuration: KeycloakOpenID | None = None
+    _keycloak_configuration: 'KeycloakOpenID | None' = None
     _token: dict = dict()
+    _cache: DocumentCache | None = None
 
     def __init__(
         self,
@@ -31,7 +45,9 @@ class AIoD:
         keycloak_server_url: str = '',
         keycloak_client_id: str = '',
         keycloak_realm_name: str = '',
-        keycloak_client_secret_key: str = ''
+        keycloak_client_secret_key: str = '',
+        cache_filepath: str = '',
+        cache_options: dict = {}
     ):
         self._aiod_baseurl = aiod_baseurl
         self._aiod_endpoint_template = self._aiod_baseurl + \
@@ -44,17 +60,27 @@ class AIoD:
         self._keycloak_realm_name = keycloak_realm_name
         self._keycloak_client_secret_key = keycloak_client_secret_key
 
+        # The documents read from AIoD are cached only if a file is given
+        if cache_filepath:
+            self._cache = DocumentCache.open(cache_filepath, **cache_options)
+
     @property
     def session(self) -> requests.Session:
         if not self._session:
-            self._session = requests.session()
-            self._session.headers.update(self._headers)
+            self._session = new_session(self._headers)
         return self._session
 
+    def save_cache(self) -> None:
+        # Write the cached documents now, they are also written when the process exits
+        if self._cache:
+            self._cache.save()
+
     @property
-    def keycloak_configuration(self) -> KeycloakOpenID:
+    def keycloak_configuration(self) -> 'KeycloakOpenID':
         # TODO: Maybe a property is not the best thing, need to handle possible errors
         if not self._keycloak_configuration:
+            # Slow to import, and not needed when an access token is given
+            from keycloak import KeycloakOpenID
             self._keycloak_configuration = KeycloakOpenID(
                 server_url=self._keycloak_server_url,
                 client_id=self._keycloak_client_id,
@@ -131,9 +157,19 @@ class AIoD:
         finally:
             return result
 
+    def _request(self, method: str, endpoint: str, url: str, **kwargs) -> requests.Response:
+        # Send a request through the session, measuring it by endpoint and status
+        with span('aiod', method=method, endpoint=endpoint) as current:
+            with _request_seconds.time(method=method, endpoint=endpoint, status='error') as labels:
+                response = self.session.request(method, url, **kwargs)
+                labels['status'] = response.status_code
+            if current:
+                current.attributes['status'] = response.status_code
+        return response
+
     @property
     def logged_user(self) -> dict:
-        response = self.session.get(f'{self._aiod_baseurl}/authorization_test')
+        response = self._request('GET', 'authorization_test', f'{self._aiod_baseurl}/authorization_test')
         success, user, reason = self._handle_response(response)
         if not success:
             logger.debug(
@@ -150,7 +186,9 @@ class AIoD:
 
     @property
     def count(self) -> Result:
-        response = self.session.get(
+        response = self._request(
+            'GET',
+            'counts',
             self._aiod_endpoint_template.format(
                 asset_type='counts',
                 identifier=''
@@ -159,16 +197,23 @@ class AIoD:
         return self._handle_response(response)
 
     def get_asset(self, asset_type: str, id: int) -> Result:
-        response = self.session.get(
-            self._aiod_endpoint_template.format(
-                asset_type=asset_type,
-                identifier=id
-            )
+        url = self._aiod_endpoint_template.format(
+            asset_type=asset_type,
+            identifier=id
         )
-        return self._handle_response(response)
+        if not self._cache:
+            return self._handle_response(self._request('GET', asset_type, url))
+        return Result(*self._cache.get(
+            asset_type,
+            id,
+            lambda headers: self._request('GET', asset_type, url, headers=headers),
+            self._handle_response
+        ))
 
     def add_asset(self, asset_type: str, asset: dict) -> Result:
-        response = self.session.post(
+        response = self._request(
+            'POST',
+            asset_type,
             self._aiod_endpoint_template.format(
                 asset_type=asset_type,
                 identifier=''
@@ -183,32 +228,70 @@ class AIoD:
         asset_type: str,
         platform_resource_identifier: str
     ) -> Result:
-        response = self.session.get(
+        response = self._request(
+            'GET',
+            asset_type,
             self._aiod_endpoint_platform_template.format(
-                platform_name=platform_name,
+                platform=platform_name,
                 asset_type=asset_type,
                 platform_resource_identifier=platform_resource_identifier
             )
         )
         return self._handle_response(response)
 
+    def list_assets_from_platform(
+        self,
+        platform_name: str,
+        asset_type: str,
+        offset: int = 0,
+        limit: int = 100
+    ) -> Result:
+        # A page of the assets of the type owned by the platform
+        response = self._request(
+            'GET',
+            asset_type,
+            self._aiod_endpoint_platform_template.format(
+                platform=platform_name,
+                asset_type=asset_type,
+                platform_resource_identifier=''
+            ).rstrip('/'),
+            params={
+                'offset': offset,
+                'limit': limit
+            }
+        )
+        return self._handle_response(response)
+
     def update_asset(self, asset_type, asset: dict) -> Result:
-        response = self.session.put(
+        response = self._request(
+            'PUT',
+            asset_type,
             self._aiod_endpoint_template.format(
                 asset_type=asset_type,
                 identifier=asset['identifier']
             ),
             json=asset
         )
-        return self._handle_response(response)
+        result = self._handle_response(response)
+        if self._cache:
+            # Keep the document written, or read it again next time if the write failed
+            if result.success:
+                self._cache.put(asset_type, asset['identifier'], asset)
+            else:
+                self._cache.invalidate(asset_type, asset['identifier'])
+        return result
 
     def delete_asset(self, id: int, asset_type: str) -> Result:
-        response = self.session.delete(
+        response = self._request(
+            'DELETE',
+            asset_type,
             self._aiod_endpoint_template.format(
                 asset_type=asset_type,
                 identifier=id
             )
         )
+        if self._cache:
+            self._cache.invalidate(asset_type, id)
         return self._handle_response(response)
 
     def get_platform(self, id: int) -> dict:
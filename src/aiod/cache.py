@@ -0,0 +1,231 @@
+import atexit
+from collections import OrderedDict
+import copy
+import json
+from logging import getLogger
+import os
+from threading import Event, Lock
+import time
+from typing import Callable
+
+import requests
+
+from telemetry.metrics import REGISTRY
+
+logger = getLogger(__name__)
+
+_lookups = REGISTRY.counter(
+    'aiod_cache_lookups_total',
+    'Lookups of the AIoD documents kept in the cache',
+    ('result',)
+)
+
+
+class _Entry:
+    __slots__ = ('body', 'etag', 'last_modified', 'stored_at')
+
+    body: dict
+    etag: str
+    last_modified: str
+    stored_at: float
+
+    def __init__(self, body: dict, etag: str, last_modified: str, stored_at: float) -> None:
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+
+class _Flight:
+    # A GET on its way, the identical GETs wait for its outcome
+    __slots__ = ('done', 'result', 'error')
+
+    done: Event
+    result: object
+    error: BaseException | None
+
+    def __init__(self) -> None:
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class DocumentCache:
+    # The AIoD documents last read, by type and identifier, kept in a JSON
+    # file between runs. A document younger than "ttl" seconds is used without
+    # any request; an older one is asked again with its ETag and
+    # Last-Modified (if the server sent them), and kept if AIoD answers it did
+    # not change. Beyond "size" documents the least recently used ones are
+    # dropped. Identical GETs sent at the same time share a single request.
+    _filepath: str
+    _ttl: float
+    _size: int
+    _entries: OrderedDict[tuple[str, int], _Entry]
+    _in_flight: dict[tuple[str, int], _Flight]
+    _changed: bool = False
+    _lock: Lock
+
+    # One cache by file in the process, saved when it exits
+    _opened: dict[str, 'DocumentCache'] = dict()
+
+    def __init__(self, filepath: str = '', ttl: float = 300, size: int = 10000) -> None:
+        self._filepath = filepath
+        self.configure(ttl, size)
+        self._entries = OrderedDict()
+        self._in_flight = dict()
+        self._lock = Lock()
+        if filepath:
+            self._load()
+
+    @classmethod
+    def open(cls, filepath: str, ttl: float = 300, size: int = 10000) -> 'DocumentCache':
+        # The cache of the file, shared by the AIoD connectors of the process
+        # (e.g. when the daemon rebuilds them) so that the file is only
+        # written by one of them
+        cache = cls._opened.get(filepath)
+        if cache is None:
+            cache = cls._opened[filepath] = cls(filepath, ttl, size)
+            atexit.register(cache.save)
+        else:
+            cache.configure(ttl, size)
+        return cache
+
+    def configure(self, ttl: float, size: int) -> None:
+        if ttl < 0:
+            raise ValueError('The time to live of the cache cannot be a negative number')
+        if size < 1:
+            raise ValueError('The size of the cache has to be a positive number')
+        self._ttl = ttl
+        self._size = size
+
+    def _load(self) -> None:
+        if not os.path.isfile(self._filepath):
+            return
+        try:
+            with open(self._filepath, 'r') as fin:
+                entries = json.load(fin)
+        except (OSError, json.JSONDecodeError) as ex:
+            logger.warning(
+                'Could not read the AIoD cache %(filepath)s: %(error_message)s',
+                {
+                    'filepath': self._filepath,
+                    'error_message': repr(ex)
+                }
+            )
+            return
+        # From the least to the most recently used
+        for asset_type, identifier, etag, last_modified, stored_at, body in entries[-self._size:]:
+            self._entries[(asset_type, identifier)] = _Entry(body, etag, last_modified, stored_at)
+
+    def save(self) -> None:
+        if not self._filepath:
+            return
+        with self._lock:
+            if not self._changed:
+                return
+            entries = [
+                [asset_type, identifier, entry.etag, entry.last_modified, entry.stored_at, entry.body]
+                for (asset_type, identifier), entry in self._entries.items()
+            ]
+            self._changed = False
+        # Replaced at once, a crash cannot leave half a file
+        temporary = f'{self._filepath}.tmp'
+        try:
+            with open(temporary, 'w') as fout:
+                json.dump(entries, fout)
+            os.replace(temporary, self._filepath)
+        except OSError as ex:
+            logger.warning(
+                'Could not write the AIoD cache %(filepath)s: %(error_message)s',
+                {
+                    'filepath': self._filepath,
+                    'error_message': repr(ex)
+                }
+            )
+
+    def _store(self, key: tuple[str, int], entry: _Entry) -> None:
+        # Called holding the lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+        self._changed = True
+
+    def put(self, asset_type: str, identifier: int, document: dict) -> None:
+        # The document just written to AIoD, without validators: once stale
+        # it is read again in full
+        with self._lock:
+            self._store((asset_type, identifier), _Entry(copy.deepcopy(document), '', '', time.time()))
+
+    def invalidate(self, asset_type: str, identifier: int) -> None:
+        # The document changed on AIoD, e.g. after a PUT or a DELETE
+        with self._lock:
+            if self._entries.pop((asset_type, identifier), None) is not None:
+                self._changed = True
+
+    def get(
+        self,
+        asset_type: str,
+        identifier: int,
+        send: Callable[[dict[str, str]], requests.Response],
+        handle: Callable[[requests.Response], tuple]
+    ) -> tuple[bool, dict | None, list]:
+        # The (success, document, reasons) of GETting the document: "send"
+        # sends the GET with the given headers and "handle" turns its
+        # response in such a tuple
+        key = (asset_type, identifier)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.stored_at < self._ttl:
+                self._entries.move_to_end(key)
+                _lookups.inc(result='hit')
+                return True, copy.deepcopy(entry.body), []
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+
+        if not leader:
+            _lookups.inc(result='collapsed')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            headers = dict()
+            if entry is not None:
+                if entry.etag:
+                    headers['If-None-Match'] = entry.etag
+                if entry.last_modified:
+                    headers['If-Modified-Since'] = entry.last_modified
+            response = send(headers)
+            if entry is not None and response.status_code == requests.codes.not_modified:
+                _lookups.inc(result='revalidated')
+                with self._lock:
+                    entry.stored_at = time.time()
+                    self._store(key, entry)
+                result = (True, entry.body, [])
+            else:
+                _lookups.inc(result='miss')
+                success, document, reasons = handle(response)
+                result = (success, document, reasons)
+                with self._lock:
+                    if success:
+                        self._store(key, _Entry(
+                            copy.deepcopy(document),
+                            response.headers.get('ETag', ''),
+                            response.headers.get('Last-Modified', ''),
+                            time.time()
+                        ))
+                    elif self._entries.pop(key, None) is not None:
+                        self._changed = True
+            flight.result = result
+            return copy.deepcopy(result)
+        except BaseException as ex:
+            flight.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
@@ -1,13 +1,65 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from contextlib import contextmanager, nullcontext
+from itertools import chain
+import json
 from logging import getLogger
-from typing import Iterator
+from threading import Condition, RLock
+import time
+from typing import TYPE_CHECKING, Callable, ContextManager, Iterable, Iterator
 from airedgio.memory import Memory
+from airedgio.reconciliation import Plan
 from bridge.bridge import Bridge
+from bridge.entities import Entity, dump_bundle, load_bundle
 from .queries import Queries
 from datetime import datetime
-from requests import Session, session, status_codes
+from requests import Session, status_codes
+from telemetry.metrics import REGISTRY
+from telemetry.tracing import span
+from transport.session import new_session
+
+if TYPE_CHECKING:
+    from telemetry.profiling import Profiler
 
 logger = getLogger(__name__)
 
+_query_seconds = REGISTRY.histogram(
+    'airedgio_query_seconds',
+    'Duration of the queries to the AI REDGIO portal',
+    ('query', 'status')
+)
+_downloaded_assets = REGISTRY.counter(
+    'airedgio_downloaded_assets_total',
+    'Assets downloaded from the AI REDGIO portal',
+    ('query',)
+)
+_window_seconds = REGISTRY.histogram(
+    'bridge_window_seconds',
+    'Duration of the conversion of the time windows',
+    ('phase',)
+)
+_translation_seconds = REGISTRY.histogram(
+    'bridge_translation_seconds',
+    'Duration of the translation of the assets of a window',
+    ('mode',)
+)
+_cached_translations = REGISTRY.counter(
+    'bridge_cached_translations_total',
+    'Lookups of the translations kept in the memory',
+    ('result',)
+)
+_reconciled_assets = REGISTRY.counter(
+    'bridge_reconciled_assets_total',
+    'Assets planned by the reconciliation by action',
+    ('action',)
+)
+_converted_assets = REGISTRY.counter(
+    'bridge_converted_assets_total',
+    'Assets converted to AIoD by outcome',
+    ('outcome',)
+)
+
 
 class AIRedgio:
     _session: Session | None = None
@@ -18,72 +70,149 @@ class AIRedgio:
     }
     _bridge: Bridge
     _memory: Memory
+    _checkpoint_size: int
+    _translation_processes: int
+    _gc_batch_size: int
+    _gc_concurrency: int
+    _deletion_concurrency: int
+    _max_deletion_share: float
+    # A deletion check may always remove that many assets, whatever the share
+    _min_deletions = 10
+    _reconciliation_concurrency: int
+    _reconciliation_page_size: int
+    # The portal holds no asset created before, the memories start there too
+    _earliest_date = datetime(2023, 10, 1)
+    _profiler: 'Profiler | None'
+    _memory_lock: RLock
+    _conversion_gate: Condition
+    _conversions: int = 0
+    _collecting: bool = False
 
     @property
     def session(self) -> Session:
         if not self._session:
-            self._session = session()
-            self._session.headers.update(self._headers)
+            self._session = new_session(self._headers)
         return self._session
 
     @property
     def memory(self) -> Memory:
         return self._memory
 
+    @property
+    def memory_lock(self) -> RLock:
+        # Held while writing to the memory, which can be shared with other threads
+        return self._memory_lock
+
+    def close(self) -> None:
+        # Release the memory, once no thread converts with this instance anymore
+        with self._memory_lock:
+            self._memory.close()
+
     def __init__(
         self,
         api_endpoint: str,
         bridge: Bridge,
         memory_filepath: str,
-        queries: dict = {}
+        queries: dict = {},
+        checkpoint_size: int = 100,
+        memory_options: dict = {},
+        translation_processes: int = 0,
+        gc_batch_size: int = 100,
+        gc_concurrency: int = 4,
+        deletion_concurrency: int = 4,
+        max_deletion_share: float = 0.5,
+        reconciliation_concurrency: int = 4,
+        reconciliation_page_size: int = 100,
+        profiler: 'Profiler | None' = None
     ):
+        if checkpoint_size < 1:
+            raise ValueError('The checkpoint size has to be a positive number')
+        if gc_batch_size < 0:
+            raise ValueError('The garbage collection batch size cannot be a negative number')
+        if gc_concurrency < 1:
+            raise ValueError('The garbage collection concurrency has to be a positive number')
+        if deletion_concurrency < 1:
+            raise ValueError('The deletion concurrency has to be a positive number')
+        if not 0 < max_deletion_share <= 1:
+            raise ValueError('The maximum deletion share has to be between 0 and 1')
+        if reconciliation_concurrency < 1:
+            raise ValueError('The reconciliation concurrency has to be a positive number')
+        if reconciliation_page_size < 1:
+            raise ValueError('The reconciliation page size has to be a positive number')
+
         self._api_endpoint = api_endpoint
         self._bridge = bridge
+        self._checkpoint_size = checkpoint_size
+        self._translation_processes = translation_processes
+        self._gc_batch_size = gc_batch_size
+        self._gc_concurrency = gc_concurrency
+        self._deletion_concurrency = deletion_concurrency
+        self._max_deletion_share = max_deletion_share
+        self._reconciliation_concurrency = reconciliation_concurrency
+        self._reconciliation_page_size = reconciliation_page_size
+        self._profiler = profiler
 
-        self._memory = Memory.memory_factory(memory_filepath)
+        self._memory_lock = RLock()
+        self._conversion_gate = Condition()
+        self._memory = Memory.memory_factory(
+            memory_filepath,
+            **memory_options
+        )
 
         self._queries = Queries(queries)
 
-    def _post_query(self, query: str) -> list[dict]:
-        response = self.session.post(
-            url=self._api_endpoint,
-            data=query
-        )
+    def _query(self, query: str, name: str) -> list[dict] | None:
+        # The assets found by the query, None if the portal failed to answer.
+        # The name of the query labels its metrics
+        with _query_seconds.time(query=name, status='error') as labels:
+            response = self.session.post(
+                url=self._api_endpoint,
+                data=query
+            )
+            labels['status'] = response.status_code
         if response.status_code != status_codes.codes.OK:
-            return []
+            return None
 
         content = response.json()
         if not ('success' in content and content['success']):
-            return []
+            return None
 
         if 'data' not in content:
-            return []
+            return None
 
+        _downloaded_assets.inc(len(content['data']), query=name)
         return content['data']
 
+    def _post_query(self, query: str, name: str) -> list[dict]:
+        assets = self._query(query, name)
+        return assets if assets is not None else []
+
     def get_created(self, start_date: datetime, end_date: datetime) -> list[dict]:
         start_string = start_date.strftime(self._timestamp_format)
         end_string = end_date.strftime(self._timestamp_format)
         query_string = self._queries.created(start_string, end_string)
 
-        return self._post_query(query_string)
+        return self._post_query(query_string, 'created')
 
     def get_changed(self, start_date: datetime, end_date: datetime) -> list[dict]:
         start_string = start_date.strftime(self._timestamp_format)
         end_string = end_date.strftime(self._timestamp_format)
         query_string = self._queries.modified(start_string, end_string)
 
-        return self._post_query(query_string)
+        return self._post_query(query_string, 'modified')
 
-    def get_by_id(self, asset_id: str) -> dict:
+    def get_by_id(self, asset_id: str) -> dict | None:
+        # Empty if the portal does not have the asset, None if it failed to answer
         query_string = self._queries.by_id(asset_id)
 
-        res = self._post_query(query_string)
+        res = self._query(query_string, 'by_id')
+        if res is None:
+            return None
 
         return res[0] if res else {}
 
     def get_all(self) -> list[dict]:
-        return self._post_query('{}')
+        return self._post_query('{}', 'all')
 
     def _next_month(self, date: datetime) -> datetime:
         year = date.year
@@ -93,10 +222,17 @@ class AIRedgio:
             month %= 12
         return datetime(year=year, month=month, day=1)
 
-    def download_all_created_assets(self) -> Iterator[list[dict]]:
-        start_date = self.memory.latest_created_date
-        end_date = start_date
+    def windows(self, start_date: datetime) -> Iterator[tuple[datetime, datetime]]:
+        # Split the time from the given date until now in monthly windows
         while start_date <= datetime.now():
+            end_date = self._next_month(start_date)
+            yield start_date, min(end_date, datetime.now())
+            start_date = end_date
+
+    def download_all_created_assets(self) -> Iterator[tuple[datetime, list[dict]]]:
+        # The watermark is not advanced here: the caller moves it to the
+        # yielded window end only once the outcome of the window is recorded
+        for start_date, end_date in self.windows(self.memory.latest_created_date):
             logger.debug(
                 'Requesting assets created between %(start_date)s and %(end_date)s',
                 {
@@ -104,59 +240,272 @@ class AIRedgio:
                     'end_date': end_date
                 }
             )
-            start_date = end_date
-            end_date = self._next_month(start_date)
 
             # Get all the assets created in a month
             created_month = self.get_created(start_date, end_date)
 
-            self.memory.latest_created_date = min(end_date, datetime.now())
+            yield end_date, created_month
 
-            yield created_month
+    def _asset_type(self, asset: dict) -> str:
+        return (
+            asset['_source']['aitype']
+            .lower()
+            .replace(' ', '_')
+        )
 
-    def convert_created(self) -> None:
-        failed = list()
-        success = list()
+    def _source_hash(self, asset: dict) -> str:
+        # Hash of the parts of the asset read by the translators
+        return hashlib.sha256(
+            json.dumps(
+                [asset.get('_source'), asset.get('sort')],
+                sort_keys=True
+            ).encode()
+        ).hexdigest()
+
+    @contextmanager
+    def _converting(self) -> Iterator[None]:
+        # Conversions run together but not during a garbage collection: an
+        # entity a conversion finds on AIoD could be deleted meanwhile
+        with self._conversion_gate:
+            self._conversion_gate.wait_for(lambda: not self._collecting)
+            self._conversions += 1
+        try:
+            yield
+        finally:
+            with self._conversion_gate:
+                self._conversions -= 1
+                self._conversion_gate.notify_all()
+
+    @contextmanager
+    def _collecting_orphans(self) -> Iterator[None]:
+        # Wait for the conversions on their way, and hold the new ones back
+        with self._conversion_gate:
+            self._conversion_gate.wait_for(lambda: not self._collecting and not self._conversions)
+            self._collecting = True
+        try:
+            yield
+        finally:
+            with self._conversion_gate:
+                self._collecting = False
+                self._conversion_gate.notify_all()
+
+    def _convert(
+        self,
+        asset: dict,
+        created: dict[str, Entity] | None = None,
+        identifier: int | None = None
+    ) -> bool:
         logger.debug(
-            'Converting all created assets from %(latest_created_date)s',
+            'Converting asset %(asset_id)s',
             {
-                'latest_created_date': self.memory.latest_created_date
+                'asset_id': asset['_id']
             }
         )
-        # Download assets month by month
-        for month in self.download_all_created_assets():
-            # Convert each asset
-            for asset in month:
-                # TODO: Validate AIRedgio entity
-                logger.debug(
-                    'Converting asset %(asset_id)s',
-                    {
-                        'asset_id': asset['_id']
-                    }
-                )
-                asset_type = (
-                    asset['_source']['aitype']
-                    .lower()
-                    .replace(' ', '_')
+        asset_type = self._asset_type(asset)
+        # Each asset is the root of a trace
+        with self._converting(), span('asset', id=asset['_id'], type=asset_type) as current:
+            if created is None:
+                created = self._translate_all([asset])[0]
+            converted = self._bridge.convert_asset(asset, asset_type, created, identifier)
+            _converted_assets.inc(outcome='success' if converted else 'failed')
+            if current:
+                current.attributes['converted'] = converted
+
+            # Committed together with the outcome at the next checkpoint
+            if not converted:
+                # The entities posted before the failure may be referenced by
+                # no asset, the garbage collection checks them. The ones found
+                # on AIoD already may be referenced by assets not counted yet
+                with span('memory', operation='track'), self._memory_lock:
+                    self.memory.track_entities(
+                        self._bridge.referenced_entities(created, asset_type, posted_only=True)
+                    )
+                return False
+
+            references = self._bridge.referenced_entities(created, asset_type)
+
+            with span('memory', operation='record'), self._memory_lock:
+                self.memory.update_references(asset['_id'], references)
+                self.memory.update_identifiers([(
+                    asset['_id'],
+                    asset_type,
+                    created[f'/{asset_type}'].identifier
+                )])
+                self.memory.update_fingerprints([(
+                    asset['_id'],
+                    asset_type,
+                    self._bridge.translators_hash(asset_type)
+                )])
+
+        logger.debug(
+            'Successfully converted asset %(asset_id)s',
+            {
+                'asset_id': asset['_id']
+            }
+        )
+        return True
+
+    def _translate_all(self, assets: list[dict]) -> list[dict[str, Entity]]:
+        # Translate the whole window up front, so that the uploads only wait
+        # for the network: with a translation pool if configured, otherwise
+        # in one batch per asset type
+        asset_types = [self._asset_type(asset) for asset in assets]
+        translations: list[dict[str, Entity] | None] = [None] * len(assets)
+
+        # Unchanged assets already translated with the same translators are
+        # taken from the memory
+        keys = list()
+        if self.memory.caches_translations:
+            with self._memory_lock:
+                for position, (asset, asset_type) in enumerate(zip(assets, asset_types)):
+                    key = (
+                        self._source_hash(asset),
+                        self._bridge.translators_hash(asset_type)
+                    )
+                    keys.append(key)
+                    cached = self.memory.cached_translation(asset['_id'], *key)
+                    if cached is not None:
+                        translations[position] = load_bundle(cached)
+                    _cached_translations.inc(result='miss' if cached is None else 'hit')
+        missing = [
+            position
+            for position, created in enumerate(translations)
+            if created is None
+        ]
+
+        if self._translation_processes > 1 and len(missing) > 1:
+            with span('translate', count=len(missing)), _translation_seconds.time(mode='pool'):
+                batch = self._bridge.translate_many(
+                    [assets[position] for position in missing],
+                    [asset_types[position] for position in missing],
+                    processes=self._translation_processes
                 )
-                if not self._bridge.convert_asset(asset, asset_type):
-                    failed.append(asset['_id'])
-                    continue
+            for position, created in zip(missing, batch):
+                translations[position] = created
+        else:
+            for asset_type in set(asset_types[position] for position in missing):
+                positions = [
+                    position
+                    for position in missing
+                    if asset_types[position] == asset_type
+                ]
+                with span('translate', count=len(positions)), _translation_seconds.time(mode='batch'):
+                    batch = self._bridge.translate_batch(
+                        [assets[position] for position in positions],
+                        asset_type
+                    )
+                for position, created in zip(positions, batch):
+                    translations[position] = created
 
-                success.append(asset['_id'])
-                logger.debug(
-                    'Successfully converted asset %(asset_id)s',
+        if keys:
+            # Stored before the uploads add the AIoD identifiers to the translations
+            with self._memory_lock:
+                for position in missing:
+                    if translations[position]:
+                        self.memory.update_cached_translation(
+                            assets[position]['_id'],
+                            *keys[position],
+                            dump_bundle(translations[position])
+                        )
+        return translations
+
+    def _checkpoint(
+        self,
+        success: list[str],
+        failed: list[str],
+        modified: bool = False,
+        window: str = ''
+    ) -> None:
+        # Record the outcomes and commit them, so a crash cannot lose them
+        with span('memory', operation='checkpoint'), self._memory_lock:
+            if modified:
+                self.memory.update_modified(success, failed)
+            else:
+                self.memory.update_created(success, failed)
+            if window:
+                self.memory.update_processed(window, chain(success, failed))
+            self.memory.save()
+        success.clear()
+        failed.clear()
+
+    def convert_window(
+        self,
+        assets: list[dict],
+        window: str,
+        modified: bool = False,
+        heartbeat: Callable[[], bool] | None = None,
+        heartbeat_interval: float = 0
+    ) -> tuple[list[str], list[str]]:
+        # Convert the assets of a time window, committing the outcomes every
+        # checkpoint: the outcomes of the last assets are returned so that the
+        # caller can record them in the same commit that closes the window.
+        # If given, "heartbeat" is called before converting an asset once
+        # "heartbeat_interval" seconds passed since the last call, after
+        # committing the outcomes, and the window is abandoned as soon as it
+        # returns False.
+        failed = list()
+        success = list()
+        # Skip the assets already handled by an interrupted run
+        processed = self.memory.processed(window)
+        pending = list()
+        for asset in assets:
+            if asset['_id'] in processed:
+                continue
+
+            # If the modified date is the same as the created date, then it has not been modified
+            if modified and asset['_source']['properties']['created'] == asset['_source']['properties']['changed']:
+                logger.info(
+                    'Asset %(asset_id)s has not been modified since creation',
                     {
                         'asset_id': asset['_id']
                     }
                 )
+                continue
 
-        self.memory.update_created(success, failed)
+            pending.append(asset)
 
-    def download_all_modified_assets(self) -> Iterator[list[dict]]:
-        start_date = self.memory.latest_modified_date
-        end_date = start_date
-        while start_date <= datetime.now():
+        # Convert each asset
+        beat = time.monotonic()
+        with _window_seconds.time(phase='modified' if modified else 'created'):
+            for asset, created in zip(pending, self._translate_all(pending)):
+                if heartbeat and time.monotonic() - beat >= heartbeat_interval:
+                    self._checkpoint(success, failed, modified, window)
+                    if not heartbeat():
+                        break
+                    beat = time.monotonic()
+
+                if self._convert(asset, created):
+                    success.append(asset['_id'])
+                else:
+                    failed.append(asset['_id'])
+
+                if len(success) + len(failed) >= self._checkpoint_size:
+                    self._checkpoint(success, failed, modified, window)
+
+        return success, failed
+
+    def convert_created(self) -> None:
+        logger.debug(
+            'Converting all created assets from %(latest_created_date)s',
+            {
+                'latest_created_date': self.memory.latest_created_date
+            }
+        )
+        # Download assets month by month
+        for end_date, month in self.download_all_created_assets():
+            success, failed = self.convert_window(month, 'created')
+
+            # Record the last outcomes and advance the watermark in the same commit
+            with self._memory_lock:
+                self.memory.update_created(success, failed)
+                self.memory.latest_created_date = end_date
+                self.memory.clear_processed('created')
+                self.memory.save()
+
+    def download_all_modified_assets(self) -> Iterator[tuple[datetime, list[dict]]]:
+        # The watermark is not advanced here: the caller moves it to the
+        # yielded window end only once the outcome of the window is recorded
+        for start_date, end_date in self.windows(self.memory.latest_modified_date):
             logger.debug(
                 'Requesting assets modified between %(start_date)s and %(end_date)s',
                 {
@@ -164,20 +513,13 @@ class AIRedgio:
                     'end_date': end_date
                 }
             )
-            start_date = end_date
-            end_date = self._next_month(start_date)
 
             # Get all the assets modified in a month
             modified_month = self.get_changed(start_date, end_date)
 
-            self.memory.latest_modified_date = min(
-                end_date, datetime.now())
-
-            yield modified_month
+            yield end_date, modified_month
 
     def convert_modified(self) -> None:
-        failed = list()
-        success = list()
         logger.debug(
             'Converting all modified assets from %(latest_modified_date)s',
             {
@@ -185,57 +527,37 @@ class AIRedgio:
             }
         )
         # Download assets month by month
-        for month in self.download_all_modified_assets():
-            # Convert each asset
-            for asset in month:
-                # TODO: Validate AIRedgio entity
-                # If the modified date is the same as the created date, then it has not been modified
-                if asset['_source']['properties']['created'] == asset['_source']['properties']['changed']:
-                    logger.info(
-                        'Asset %(asset_id)s has not been modified since creation',
-                        {
-                            'asset_id': asset['_id']
-                        }
-                    )
-                    continue
+        for end_date, month in self.download_all_modified_assets():
+            success, failed = self.convert_window(
+                month, 'modified', modified=True)
 
-                logger.debug(
-                    'Converting asset %(asset_id)s',
-                    {
-                        'asset_id': asset['_id']
-                    }
-                )
-                asset_type = (
-                    asset['_source']['aitype']
-                    .lower()
-                    .replace(' ', '_')
-                )
-                if not self._bridge.convert_asset(asset, asset_type):
-                    failed.append(asset['_id'])
-                    continue
+            # Record the last outcomes and advance the watermark in the same commit
+            with self._memory_lock:
+                self.memory.update_modified(success, failed)
+                self.memory.latest_modified_date = end_date
+                self.memory.clear_processed('modified')
+                self.memory.save()
 
-                success.append(asset['_id'])
-                logger.debug(
-                    'Successfully converted asset %(asset_id)s',
-                    {
-                        'asset_id': asset['_id']
-                    }
-                )
-
-        self.memory.update_modified(success, failed)
-
-    def convert_failed_created(self) -> None:
+    def convert_ids(
+        self,
+        asset_ids: Iterable[str],
+        modified: bool = False,
+        heartbeat: Callable[[], bool] | None = None,
+        heartbeat_interval: float = 0
+    ) -> None:
+        # Download and convert the given assets, committing the outcomes every
+        # checkpoint. "heartbeat" is called as by convert_window.
         failed = list()
         success = list()
-        logger.debug('Converting all failed assets')
-        for asset_id in self.memory.failed_created:
+        beat = time.monotonic()
+        for asset_id in asset_ids:
+            if heartbeat and time.monotonic() - beat >= heartbeat_interval:
+                self._checkpoint(success, failed, modified)
+                if not heartbeat():
+                    break
+                beat = time.monotonic()
+
             # TODO Check if failed ones have been deleted before we could upload them
-            logger.debug(
-                'Converting asset %(asset_id)s',
-                {
-                    'asset_id': asset_id
-                }
-            )
             asset = self.get_by_id(asset_id)
             if not asset:
                 logger.debug(
@@ -245,114 +567,514 @@ class AIRedgio:
                     }
                 )
                 failed.append(asset_id)
+            elif self._convert(asset):
+                success.append(asset_id)
+            else:
+                failed.append(asset_id)
 
-            asset_type = asset['_source']['aitype'].lower().replace(' ', '_')
-            if not self._bridge.convert_asset(asset, asset_type):
-                failed.append(asset['_id'])
-                continue
+            if len(success) + len(failed) >= self._checkpoint_size:
+                self._checkpoint(success, failed, modified)
 
-            success.append(asset['_id'])
-            logger.debug(
-                'Successfully converted asset %(asset_id)s',
-                {
-                    'asset_id': asset_id
-                }
-            )
+        self._checkpoint(success, failed, modified)
 
-        self.memory.update_created(success, failed)
+    def convert_failed_created(self) -> None:
+        logger.debug('Converting all failed assets')
+        # Copy the ids, the failed set is updated at every checkpoint
+        with self._memory_lock:
+            asset_ids = list(self.memory.failed_created)
+        self.convert_ids(asset_ids)
 
     def convert_failed_modified(self) -> None:
-        failed = list()
-        success = list()
         logger.debug('Converting all failed assets')
-        for asset_id in self.memory.failed_modified:
-            logger.debug(
-                'Converting asset %(asset_id)s',
-                {
-                    'asset_id': asset_id
-                }
-            )
+        # Copy the ids, the failed set is updated at every checkpoint
+        with self._memory_lock:
+            asset_ids = list(self.memory.failed_modified)
+        self.convert_ids(asset_ids, modified=True)
+
+    def check_deletion(self) -> None:
+        # TODO: Implement a retry-mechanism to assure each asset in the list gets tested at least once in a while
+        deleted = list()
+        logger.debug("Checking if any asset has been deleted from AIREDGIO")
+        with self._memory_lock:
+            asset_ids = list(self.memory.success_created)
+        for asset_id in asset_ids:
             asset = self.get_by_id(asset_id)
-            if not asset:
+            if asset is None:
+                # Only an answer without the asset means it was deleted
+                logger.warning(
+                    'Could not check asset %(asset_id)s on the AIRedgio platform, not removing any asset',
+                    {
+                        'asset_id': asset_id
+                    }
+                )
+                return
+            if asset:
                 logger.debug(
-                    'Failed to download asset %(asset_id)s from the AIRedgio platform',
+                    'Asset %(asset_id)s has not been deleted',
                     {
                         'asset_id': asset_id
                     }
                 )
-                failed.append(asset_id)
-
-            asset_type = asset['_source']['aitype'].lower().replace(' ', '_')
-            if not self._bridge.convert_asset(asset, asset_type):
-                failed.append(asset['_id'])
                 continue
+            deleted.append(asset_id)
+
+        # A portal losing its assets must not empty AIoD at once
+        if len(deleted) > max(self._max_deletion_share * len(asset_ids), self._min_deletions):
+            logger.warning(
+                'Not removing %(count)d of %(total)d assets at once from AIoD, above the share of %(share)s',
+                {
+                    'count': len(deleted),
+                    'total': len(asset_ids),
+                    'share': self._max_deletion_share
+                }
+            )
+            return
+
+        # Remove them from AIoD all together
+        if deleted:
+            self.delete_many(deleted)
+
+    def delete_many(
+        self,
+        asset_ids: list[str],
+        asset_types: dict[str, str] = {}
+    ) -> dict[str, bool]:
+        # Delete the assets from AIoD with a bounded number of concurrent
+        # requests, using the identifiers recorded when they were uploaded
+        # (the others are looked up by platform identifier, in the endpoint
+        # of their type if known or given, of every asset type otherwise),
+        # then the entities they were the last to reference. Returns whether
+        # each asset was deleted.
+        with self._memory_lock:
+            known = self.memory.identifiers(asset_ids)
+        assets = dict()
+        for asset_id in asset_ids:
+            if asset_id in known and known[asset_id][0]:
+                assets[asset_id] = known[asset_id]
+            else:
+                assets[asset_id] = (asset_types.get(asset_id), None)
+
+        outcomes = self._bridge.delete_assets(assets, self._deletion_concurrency)
+        removed = [asset_id for asset_id, success in outcomes.items() if success]
+        with self._memory_lock:
+            self.memory.update_removed(removed)
+            self.memory.save()
+        logger.info(
+            'Removed %(removed)d of %(count)d assets from AIoD',
+            {
+                'removed': len(removed),
+                'count': len(asset_ids)
+            }
+        )
 
-            success.append(asset['_id'])
+        # The entities referenced by the removed assets may be orphans now
+        if removed:
+            self.collect_orphans()
+
+        return {
+            asset_id: outcomes.get(asset_id, False)
+            for asset_id in asset_ids
+        }
+
+    def collect_orphans(self) -> None:
+        # Delete from AIoD the entities no uploaded asset references anymore,
+        # a batch at a time with a bounded number of concurrent requests: the
+        # ones that could not be deleted are tried again by the next collection
+        if not self._gc_batch_size:
+            return
+        with self._memory_lock:
+            unknown = self.memory.uncounted_references()
+        if unknown:
+            # Any entity may be referenced by the assets not counted yet
+            logger.warning(
+                'Not deleting unreferenced entities, the references of %(count)d assets are not counted yet',
+                {
+                    'count': unknown
+                }
+            )
+            return
+        logger.debug('Deleting the entities not referenced by any asset from AIoD')
+        collected = 0
+        after = None
+        with self._collecting_orphans():
+            while True:
+                with self._memory_lock:
+                    orphans = self.memory.orphans(self._gc_batch_size, after)
+                if not orphans:
+                    break
+                after = orphans[-1]
+                deleted = self._bridge.delete_entities(orphans, self._gc_concurrency)
+                with self._memory_lock:
+                    self.memory.forget_entities(deleted)
+                    self.memory.save()
+                collected += len(deleted)
+        if collected:
+            logger.info(
+                'Deleted %(count)d entities not referenced by any asset from AIoD',
+                {
+                    'count': collected
+                }
+            )
+
+    def convert_one(self, asset_id: str, asset: dict = {}, modified: bool = False) -> bool:
+        # Convert a single asset outside of the time windows, downloading it if not given
+        if not asset:
+            asset = self.get_by_id(asset_id)
+        if not asset:
             logger.debug(
-                'Successfully converted asset %(asset_id)s',
+                'Failed to download asset %(asset_id)s from the AIRedgio platform',
                 {
                     'asset_id': asset_id
                 }
             )
+            converted = False
+        else:
+            converted = self._convert(asset)
 
-        self.memory.update_modified(success, failed)
+        success = [asset_id] if converted else []
+        failed = [] if converted else [asset_id]
+        self._checkpoint(success, failed, modified)
+        return converted
 
-    def check_deletion(self) -> None:
-        # TODO: Implement a retry-mechanism to assure each asset in the list gets tested at least once in a while
-        removed = list()
-        logger.debug("Checking if any asset has been deleted from AIREDGIO")
-        for asset_id in self.memory.success_created:
-            asset = self.get_by_id(asset_id)
-            if asset:
-                logger.debug(
-                    'Asset %(asset_id)s has not been deleted',
+    def delete_one(self, asset_id: str, asset_type: str) -> bool:
+        return self.delete_many([asset_id], {asset_id: asset_type})[asset_id]
+
+    @property
+    def bridge(self) -> Bridge:
+        return self._bridge
+
+    @bridge.setter
+    def bridge(self, bridge: Bridge) -> None:
+        self._bridge = bridge
+
+    def _fingerprint(self, asset_type: str) -> str | None:
+        # The assets uploaded before their type was recorded have none, they
+        # are outdated whatever the translators
+        return self._bridge.translators_hash(asset_type) if asset_type else None
+
+    def enqueue_outdated(self) -> None:
+        # Queue for a new sync the assets uploaded with translators that
+        # changed since then, the work is proportional to the change
+        with self._memory_lock:
+            for asset_type in self.memory.fingerprinted_types():
+                outdated = list(self.memory.outdated(
+                    asset_type,
+                    self._fingerprint(asset_type)
+                ))
+                if not outdated:
+                    continue
+                logger.info(
+                    'The translators of %(asset_type)s changed, synchronizing %(count)d assets again',
                     {
-                        'asset_id': asset_id
+                        'asset_type': asset_type or 'the assets synchronized before the fingerprints',
+                        'count': len(outdated)
                     }
                 )
-                continue
+                # The failed modified assets are converted again by the next sync
+                self.memory.update_modified([], outdated)
+            self.memory.save()
 
-            asset_type = asset['_source']['aitype'].lower().replace(' ', '_')
-            if self._bridge.delete_asset(asset_id, asset_type):
-                logger.debug(
-                    'Asset %(asset_id)s has not been removed from AIoD',
-                    {
-                        'asset_id': asset_id
-                    }
+    def has_changes(self) -> bool:
+        # Whether a sync has anything to convert: failed assets to retry,
+        # assets uploaded with outdated translators, or assets the portal
+        # reports created or modified since the last run (one query each).
+        # A portal failing to answer is not idle, the sync reports the failure
+        with self._memory_lock:
+            if next(iter(self.memory.failed_created), None) is not None:
+                return True
+            if next(iter(self.memory.failed_modified), None) is not None:
+                return True
+            for asset_type in self.memory.fingerprinted_types():
+                outdated = self.memory.outdated(
+                    asset_type,
+                    self._fingerprint(asset_type)
                 )
-                removed.append(asset_id)
-            else:
-                logger.debug(
-                    'Could not remove asset %(asset_id)s from AIoD',
+                if next(iter(outdated), None) is not None:
+                    return True
+            created_since = self.memory.latest_created_date
+            modified_since = self.memory.latest_modified_date
+        now = datetime.now()
+        for query, since, name in (
+            (self._queries.created, created_since, 'created'),
+            (self._queries.modified, modified_since, 'modified')
+        ):
+            assets = self._query(
+                query(
+                    since.strftime(self._timestamp_format),
+                    now.strftime(self._timestamp_format)
+                ),
+                name
+            )
+            if assets is None:
+                logger.warning(
+                    'Could not query the assets %(query)s on the AI REDGIO platform, not skipping the sync',
                     {
-                        'asset_id': asset_id
+                        'query': name
                     }
                 )
-        self.memory.update_removed(removed)
+                return True
+            if assets:
+                return True
+        return False
 
-    def convert_all(self) -> None:
+    def _reconciled_types(self, assets: list[dict]) -> dict[str, str]:
+        # The AIoD endpoints to reconcile with the asset type stored in each:
+        # the ones of the translators and the ones of the given portal assets
+        asset_types = self._bridge.asset_types() | {self._asset_type(asset) for asset in assets}
+        return {
+            self._bridge.aiod_endpoint_from_type(asset_type): asset_type
+            for asset_type in sorted(asset_types)
+            if self._bridge.aiod_endpoint_from_type(asset_type)
+        }
+
+    def plan_reconciliation(
+        self,
+        assets: list[dict],
+        translations: list[dict[str, Entity]]
+    ) -> Plan:
+        # Diff the portal assets, translated, against the assets of the
+        # platform listed from AIoD a page at a time
+        expected = dict()
+        for asset, created in zip(assets, translations):
+            asset_type = self._asset_type(asset)
+            endpoint = self._bridge.aiod_endpoint_from_type(asset_type)
+            if endpoint:
+                expected[(endpoint, asset['_id'])] = created.get(f'/{asset_type}') if created else None
+
+        plan = Plan(expected)
+        for endpoint, asset_type in self._reconciled_types(assets).items():
+            with span('list', endpoint=endpoint):
+                for document in self._bridge.platform_assets(asset_type, self._reconciliation_page_size):
+                    plan.listed(endpoint, document)
+        plan.close()
+        return plan
+
+    def _convert_concurrently(
+        self,
+        assets: list[dict],
+        translations: list[dict[str, Entity]],
+        identifiers: list[int | None],
+        modified: bool
+    ) -> None:
+        # Convert the assets with a bounded number of assets at a time,
+        # committing the outcomes every checkpoint. The entities the batch
+        # translation shares between assets are uploaded one at a time first,
+        # the garbage collection waiting until the assets reference them.
+        failed = list()
+        success = list()
+        with self._converting():
+            self._upload_shared(translations)
+            with ThreadPoolExecutor(max_workers=self._reconciliation_concurrency) as executor:
+                outcomes = executor.map(self._convert, assets, translations, identifiers)
+                for asset, converted in zip(assets, outcomes):
+                    (success if converted else failed).append(asset['_id'])
+                    if len(success) + len(failed) >= self._checkpoint_size:
+                        self._checkpoint(success, failed, modified)
+        self._checkpoint(success, failed, modified)
+
+    def _upload_shared(self, translations: list[dict[str, Entity]]) -> None:
+        # The posted ones are tracked, as the assets may not be uploaded
+        counts = Counter(
+            entity
+            for created in translations
+            if created
+            for entity in created.values()
+        )
+        shared = [entity for entity, count in counts.items() if count > 1]
+        for entity in shared:
+            self._bridge.upload(entity)
+        with self._memory_lock:
+            self.memory.track_entities(
+                (self._bridge.aiod_endpoint_from_type(entity.type), entity.identifier)
+                for entity in shared
+                if entity.posted
+            )
+
+    def _scan_portal(self) -> list[dict] | None:
+        # All the assets of the portal, downloaded a monthly window at a time
+        # like the sync does, None if a window could not be downloaded
+        assets = dict()
+        for start_date, end_date in self.windows(self._earliest_date):
+            window = self._query(
+                self._queries.created(
+                    start_date.strftime(self._timestamp_format),
+                    end_date.strftime(self._timestamp_format)
+                ),
+                'created'
+            )
+            if window is None:
+                return None
+            for asset in window:
+                assets[asset['_id']] = asset
+        return list(assets.values())
+
+    def _delete_reconciled(self, assets: list[dict], plan: Plan) -> None:
+        endpoint_types = self._reconciled_types(assets)
+        removed = list()
+        for endpoint, identifiers in plan.delete.items():
+            outcomes = self._bridge.delete_assets(
+                {
+                    asset_id: (endpoint_types[endpoint], identifier)
+                    for asset_id, identifier in identifiers.items()
+                },
+                self._reconciliation_concurrency
+            )
+            removed.extend(asset_id for asset_id, success in outcomes.items() if success)
+        with self._memory_lock:
+            self.memory.update_removed(removed)
+            self.memory.save()
+
+    def reconcile(self, dry_run: bool = False, delete: bool = False) -> Plan | None:
+        # Make the assets of the platform on AIoD match the portal whatever
+        # the memory holds: all the portal assets are downloaded and diffed
+        # against all the AIoD ones, then only the missing assets are created,
+        # the differing ones updated with a single PUT and, if "delete", the
+        # ones removed from the portal deleted. The watermarks are left as
+        # they are. Returns the plan, None if the portal or AIoD could not be read.
         if not self._bridge.check_aiod_login():
-            return
+            return None
 
         if not self._bridge.check_platform():
-            return
+            return None
 
+        with self._phase('reconciliation_scan'):
+            assets = self._scan_portal()
+            if assets is None:
+                logger.warning('Could not download the assets of the AI REDGIO portal, not reconciling')
+                return None
+            translations = self._translate_all(assets)
+            try:
+                plan = self.plan_reconciliation(assets, translations)
+            except ConnectionError as ex:
+                logger.warning(
+                    'Could not list the assets of the platform from AIoD, not reconciling: %(error_message)s',
+                    {
+                        'error_message': str(ex)
+                    }
+                )
+                return None
+
+        counts = plan.counts
+        for action, count in counts.items():
+            _reconciled_assets.inc(count, action=action)
+        logger.info(
+            'Reconciliation plan: %(create)d to create, %(update)d to update, %(delete)d to delete, %(unchanged)d unchanged',
+            counts
+        )
+        if dry_run:
+            return plan
+
+        positions = {asset['_id']: position for position, asset in enumerate(assets)}
+        asset_types = {asset['_id']: self._asset_type(asset) for asset in assets}
+
+        # Record the assets found up to date, the memory may have lost them.
+        # The references of the ones it did not know are not counted: they
+        # get no fingerprint, so that the next sync uploads them again and
+        # no entity is collected until then
+        unchanged = list(plan.unchanged)
+        with self._memory_lock:
+            known = set(self.memory.success_created)
+            self.memory.update_identifiers(
+                (asset_id, asset_types[asset_id], identifier)
+                for asset_id, identifier in plan.unchanged.items()
+            )
+            self.memory.update_fingerprints(
+                (asset_id, asset_types[asset_id], '')
+                for asset_id in unchanged
+                if asset_id not in known
+            )
+            self.memory.update_created(unchanged, [])
+            self.memory.update_modified(unchanged, [])
+            self.memory.save()
+
+        # The deletions come first, so that an asset whose type changed is
+        # deleted from its former endpoint before being created again. A
+        # portal answering with fewer assets than were uploaded from it may
+        # have lost them, nothing is deleted then
+        deletions = plan.counts['delete']
+        if deletions and not delete:
+            logger.warning(
+                'Not deleting %(count)d assets missing from the AI REDGIO portal without the deletions enabled',
+                {
+                    'count': deletions
+                }
+            )
+        elif deletions and len(assets) < len(known):
+            logger.warning(
+                'Not deleting %(count)d assets, the AI REDGIO portal listed %(listed)d of the %(uploaded)d assets uploaded',
+                {
+                    'count': deletions,
+                    'listed': len(assets),
+                    'uploaded': len(known)
+                }
+            )
+        elif deletions:
+            with self._phase('reconciliation_delete'):
+                self._delete_reconciled(assets, plan)
+
+        with self._phase('reconciliation_create'):
+            self._convert_concurrently(
+                [assets[positions[asset_id]] for asset_id in plan.create],
+                [translations[positions[asset_id]] for asset_id in plan.create],
+                [None] * len(plan.create),
+                modified=False
+            )
+
+        with self._phase('reconciliation_update'):
+            self._convert_concurrently(
+                [assets[positions[asset_id]] for asset_id in plan.update],
+                [translations[positions[asset_id]] for asset_id in plan.update],
+                list(plan.update.values()),
+                modified=True
+            )
+
+        # The entities referenced only by the deleted or updated assets
+        with self._phase('reconciliation_gc'):
+            self.collect_orphans()
+
+        return plan
+
+    def _phase(self, name: str) -> ContextManager:
+        # Profile the phase if a profiler is set, do nothing otherwise
+        return self._profiler.phase(name) if self._profiler else nullcontext()
+
+    def convert_incremental(self) -> None:
         # Convert the assets that failed to upload the last time
-        self.convert_failed_created()
-        self.memory.save()
+        with self._phase('failed_created'):
+            self.convert_failed_created()
+            with self._memory_lock:
+                self.memory.save()
 
         # Convert assets created after the last run
-        self.convert_created()
-        self.memory.save()
+        with self._phase('created'):
+            self.convert_created()
+            with self._memory_lock:
+                self.memory.save()
 
         # Convert the assets that failed to upload the last time
-        self.convert_failed_modified()
-        self.memory.save()
+        with self._phase('failed_modified'):
+            self.convert_failed_modified()
+            with self._memory_lock:
+                self.memory.save()
 
         # Convert assets created after the last run
-        self.convert_modified()
-        self.memory.save()
+        with self._phase('modified'):
+            self.convert_modified()
+            with self._memory_lock:
+                self.memory.save()
+
+    def convert_all(self) -> None:
+        if not self._bridge.check_aiod_login():
+            return
+
+        if not self._bridge.check_platform():
+            return
+
+        self.enqueue_outdated()
+        self.convert_incremental()
 
         # Check if created have been deleted
-        self.check_deletion()
-        self.memory.save()
+        with self._phase('deletion'):
+            self.check_deletion()
+            with self._memory_lock:
+                self.memory.save()
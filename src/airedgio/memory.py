@@ -1,6 +1,14 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
 from typing import Iterable
+from telemetry.metrics import REGISTRY
+
+# Observed by the backends around each save
+commit_seconds = REGISTRY.histogram(
+    'memory_commit_seconds',
+    'Duration of the memory commits',
+    ('backend',)
+)
 
 class Memory(ABC):
     _timestamp_format = '%Y-%m-%dT%H:%M:%S.%fZ'
@@ -15,6 +23,10 @@ class Memory(ABC):
     @abstractmethod
     def save(self) -> None:
         pass
+
+    def close(self) -> None:
+        # Save and release the memory, it cannot be used anymore
+        self.save()
     
     @property
     @abstractmethod
@@ -63,13 +75,109 @@ class Memory(ABC):
     def update_removed(self, removed: Iterable[str]) -> None:
         pass
 
+    # The "processed" ids are the assets of a time window whose outcome has
+    # already been recorded, so that a run interrupted in the middle of a
+    # window can resume from where it stopped
+    @abstractmethod
+    def processed(self, window: str) -> set[str]:
+        pass
+
+    @abstractmethod
+    def update_processed(self, window: str, processed: Iterable[str]) -> None:
+        pass
+
+    @abstractmethod
+    def clear_processed(self, window: str) -> None:
+        pass
+
+    # Translations of assets kept between runs, keyed by the asset id, the
+    # hash of its content and the hash of the translators used, so that an
+    # unchanged asset converted again is not translated again. Backends not
+    # keeping translations always miss.
+    @property
+    def caches_translations(self) -> bool:
+        return False
+
+    def cached_translation(
+        self,
+        asset_id: str,
+        source_hash: str,
+        translators_hash: str
+    ) -> dict | None:
+        return None
+
+    def update_cached_translation(
+        self,
+        asset_id: str,
+        source_hash: str,
+        translators_hash: str,
+        created: dict
+    ) -> None:
+        pass
+
+    # The fingerprint of the translators each asset was last uploaded with,
+    # so that the assets translated by translators changed since then can
+    # be synchronized again. Backends not keeping them never find any.
+    def update_fingerprints(self, fingerprints: Iterable[tuple[str, str, str]]) -> None:
+        # Each fingerprint is an (asset id, asset type, fingerprint) tuple
+        pass
+
+    def fingerprinted_types(self) -> set[str]:
+        return set()
+
+    def outdated(self, asset_type: str, fingerprint: str | None) -> Iterable[str]:
+        # The assets of the type uploaded with a different fingerprint, all
+        # of them if None
+        return []
+
+    # The AIoD entities referenced by each uploaded asset (its contacts, its
+    # owner...) and how many assets reference each, so that the entities no
+    # asset references anymore can be deleted from AIoD. Each entity is an
+    # (AIoD endpoint, identifier) tuple. Backends not keeping them never find
+    # any orphan.
+    def update_references(self, asset_id: str, references: Iterable[tuple[str, int]]) -> None:
+        # Replace the entities referenced by the asset
+        pass
+
+    def track_entities(self, entities: Iterable[tuple[str, int]]) -> None:
+        # Entities uploaded without being referenced, e.g. by a failed upload
+        pass
+
+    def orphans(self, limit: int, after: tuple[str, int] | None = None) -> list[tuple[str, int]]:
+        # The entities no asset references, in order, starting after the given one
+        return []
+
+    def forget_entities(self, entities: Iterable[tuple[str, int]]) -> None:
+        # Stop tracking the deleted entities, unless referenced again meanwhile
+        pass
+
+    def uncounted_references(self) -> int:
+        # The number of uploaded assets whose references are not counted yet
+        # (uploaded before the counts, and not synchronized since): until
+        # then no entity is known to be an orphan
+        return 0
+
+    # The type and the AIoD identifier of each uploaded asset, so that it can
+    # be deleted from AIoD without looking it up. The identifier is None when
+    # only the type is known. Backends not keeping them know none.
+    def update_identifiers(self, identifiers: Iterable[tuple[str, str, int | None]]) -> None:
+        # Each is an (asset id, asset type, AIoD identifier) tuple
+        pass
+
+    def identifiers(self, asset_ids: Iterable[str]) -> dict[str, tuple[str, int | None]]:
+        # The type and AIoD identifier of the known assets among the given ones
+        return dict()
+
     @classmethod
-    def memory_factory(cls, connection_string: str, *args):
+    def memory_factory(cls, connection_string: str, *args, **kwargs):
         if connection_string.startswith('json:'):
             from airedgio.memory_json import MemoryJSON
-            return MemoryJSON(connection_string, *args)
+            return MemoryJSON(connection_string, *args, **kwargs)
+        elif connection_string.startswith('jsonl:'):
+            from airedgio.memory_jsonl import MemoryJSONL
+            return MemoryJSONL(connection_string, *args, **kwargs)
         elif connection_string.startswith('sqlite:'):
             from airedgio.memory_sqlite import MemorySQLite
-            return MemorySQLite(connection_string, *args)
+            return MemorySQLite(connection_string, *args, **kwargs)
         else:
             raise ValueError('Could not infer type from connection string')
\ No newline at end of file
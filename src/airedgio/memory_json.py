@@ -3,17 +3,20 @@ import json
 import os
 from typing import Iterable
 
-from airedgio.memory import Memory
+from airedgio.memory import Memory, commit_seconds
 
 
 class MemoryJSON(Memory):
+    _prefix = 'json:'
     _memory_filepath: str
     _memory: dict
 
     def __init__(self, filepath: str, timestamp_format: str = '') -> None:
         super().__init__(timestamp_format)
+        if filepath.startswith(self._prefix):
+            filepath = filepath.replace(self._prefix, '', 1)
         if not os.path.isfile(filepath):
-            memory_folder = os.path.basename(filepath)
+            memory_folder = os.path.dirname(filepath) or '.'
             if not os.path.isdir(memory_folder):
                 raise ValueError(
                     f'Could not find memory file at "{filepath}"')
@@ -51,14 +54,53 @@ class MemoryJSON(Memory):
         else:
             self._memory['created'] = set(self._memory['created'])
 
-    def save(self) -> None:
-        with open(self._memory_filepath, 'w') as fout:
+        if 'processed' not in self._memory:
+            self._memory['processed'] = dict()
+        for window, processed in self._memory['processed'].items():
+            self._memory['processed'][window] = set(processed)
+
+    def _write_snapshot(self) -> None:
+        # Write to a temporary file and swap it in, a crash never leaves a truncated memory
+        tmp_filepath = f'{self._memory_filepath}.tmp'
+        with open(tmp_filepath, 'w') as fout:
             json.dump(
                 self._memory,
                 fout,
                 indent=4,
                 default=lambda obj: list(obj) if isinstance(obj, set) else obj
             )
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_filepath, self._memory_filepath)
+
+    def save(self) -> None:
+        with commit_seconds.time(backend='json'):
+            self._write_snapshot()
+
+    # Every change to the memory goes through the following methods, ids
+    # sets are named by their path in the memory (e.g. "failed/created")
+    def _ids(self, name: str) -> set[str]:
+        *parents, key = name.split('/')
+        current = self._memory
+        for parent in parents:
+            current = current.setdefault(parent, dict())
+        return current.setdefault(key, set())
+
+    def _add(self, name: str, ids: Iterable[str]) -> None:
+        self._ids(name).update(ids)
+
+    def _remove(self, name: str, ids: Iterable[str]) -> None:
+        self._ids(name).difference_update(ids)
+
+    def _clear(self, name: str) -> None:
+        *parents, key = name.split('/')
+        current = self._memory
+        for parent in parents:
+            current = current.setdefault(parent, dict())
+        current.pop(key, None)
+
+    def _set_latest(self, key: str, value: str) -> None:
+        self._memory['latest'][key] = value
 
     @property
     def latest_created_date(self) -> datetime:
@@ -70,7 +112,7 @@ class MemoryJSON(Memory):
     @latest_created_date.setter
     def latest_created_date(self, date: datetime) -> None:
         date_str = date.strftime(self._timestamp_format)
-        self._memory['latest']['created'] = date_str
+        self._set_latest('created', date_str)
 
     @property
     def latest_modified_date(self) -> datetime:
@@ -82,7 +124,7 @@ class MemoryJSON(Memory):
     @latest_modified_date.setter
     def latest_modified_date(self, date: datetime) -> None:
         date_str = date.strftime(self._timestamp_format)
-        self._memory['latest']['modified'] = date_str
+        self._set_latest('modified', date_str)
 
     @property
     def success_created(self) -> set[str]:
@@ -97,20 +139,25 @@ class MemoryJSON(Memory):
         return self._memory['failed']['modified']
 
     def update_created(self, success: Iterable[str], failed: Iterable[str]) -> None:
-        tmp = self.failed_created.difference(success)
-        tmp.update(failed)
-        self.failed_created.clear()
-        self.failed_created.update(tmp)
-        self.success_created.update(success)
+        success = set(success)
+        self._remove('failed/created', success)
+        self._add('failed/created', failed)
+        self._add('created', success)
 
     def update_modified(self, success: Iterable[str], failed: Iterable[str]) -> None:
-        tmp = self.failed_modified.difference(success)
-        tmp.update(failed)
-        self.failed_modified.clear()
-        self.failed_modified.update(tmp)
-        self.success_created.update(success)
+        success = set(success)
+        self._remove('failed/modified', success)
+        self._add('failed/modified', failed)
+        self._add('created', success)
 
     def update_removed(self, removed: Iterable[str]) -> None:
-        tmp = self.success_created.difference(removed)
-        self.success_created.clear()
-        self.success_created.update(tmp)
+        self._remove('created', removed)
+
+    def processed(self, window: str) -> set[str]:
+        return self._memory['processed'].get(window, set())
+
+    def update_processed(self, window: str, processed: Iterable[str]) -> None:
+        self._add(f'processed/{window}', processed)
+
+    def clear_processed(self, window: str) -> None:
+        self._clear(f'processed/{window}')
@@ -0,0 +1,128 @@
+import json
+import os
+from typing import Iterable
+
+from airedgio.memory import commit_seconds
+from airedgio.memory_json import MemoryJSON
+
+
+class MemoryJSONL(MemoryJSON):
+    # The memory is a JSON snapshot (same format as MemoryJSON) plus a
+    # journal of JSON lines next to it holding the changes made after the
+    # snapshot was written. Saving appends the pending changes to the
+    # journal, once the journal grows past the threshold it is compacted
+    # into a new snapshot.
+    _prefix = 'jsonl:'
+    _journal_filepath: str
+    _journal_entries: int
+    _compact_threshold: int
+    _pending: list[dict]
+
+    def __init__(
+        self,
+        filepath: str,
+        timestamp_format: str = '',
+        compact_threshold: int = 1000
+    ) -> None:
+        if compact_threshold < 1:
+            raise ValueError(
+                'The compaction threshold has to be a positive number')
+        # The pending changes are needed by the methods called while loading
+        self._pending = list()
+        super().__init__(filepath, timestamp_format)
+        self._compact_threshold = compact_threshold
+        self._journal_filepath = f'{self._memory_filepath}.journal'
+        self._journal_entries = 0
+        self._replay()
+        self._pending.clear()
+
+    def _replay(self) -> None:
+        if not os.path.isfile(self._journal_filepath):
+            return
+
+        valid_size = 0
+        with open(self._journal_filepath, 'rb') as fin:
+            for line in fin:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line half written by a crash, drop it and whatever follows
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                self._apply(entry)
+                self._journal_entries += 1
+                valid_size += len(line)
+
+        if valid_size != os.path.getsize(self._journal_filepath):
+            with open(self._journal_filepath, 'r+b') as fout:
+                fout.truncate(valid_size)
+
+    def _apply(self, entry: dict) -> None:
+        match entry['op']:
+            case 'add':
+                super()._add(entry['set'], entry['ids'])
+            case 'remove':
+                super()._remove(entry['set'], entry['ids'])
+            case 'clear':
+                super()._clear(entry['set'])
+            case 'latest':
+                super()._set_latest(entry['key'], entry['value'])
+            case _:
+                raise ValueError(
+                    f'Unknown operation "{entry["op"]}" in the memory journal'
+                )
+
+    def _add(self, name: str, ids: Iterable[str]) -> None:
+        current = self._ids(name)
+        ids = [asset_id for asset_id in set(ids) if asset_id not in current]
+        if ids:
+            self._pending.append({'op': 'add', 'set': name, 'ids': ids})
+        super()._add(name, ids)
+
+    def _remove(self, name: str, ids: Iterable[str]) -> None:
+        current = self._ids(name)
+        ids = [asset_id for asset_id in set(ids) if asset_id in current]
+        if ids:
+            self._pending.append({'op': 'remove', 'set': name, 'ids': ids})
+        super()._remove(name, ids)
+
+    def _clear(self, name: str) -> None:
+        self._pending.append({'op': 'clear', 'set': name})
+        super()._clear(name)
+
+    def _set_latest(self, key: str, value: str) -> None:
+        self._pending.append({'op': 'latest', 'key': key, 'value': value})
+        super()._set_latest(key, value)
+
+    def compact(self) -> None:
+        # The snapshot is swapped in atomically before the journal is emptied:
+        # after a crash in between, replaying the old journal on the new
+        # snapshot leads to the same memory
+        self._write_snapshot()
+        with open(self._journal_filepath, 'w') as fout:
+            fout.flush()
+            os.fsync(fout.fileno())
+        self._journal_entries = 0
+        self._pending.clear()
+
+    def save(self) -> None:
+        with commit_seconds.time(backend='jsonl'):
+            self._append_pending()
+
+    def _append_pending(self) -> None:
+        if not self._pending:
+            return
+
+        if self._journal_entries + len(self._pending) > self._compact_threshold:
+            self.compact()
+            return
+
+        with open(self._journal_filepath, 'a') as fout:
+            for entry in self._pending:
+                fout.write(json.dumps(entry, separators=(',', ':')))
+                fout.write('\n')
+            fout.flush()
+            os.fsync(fout.fileno())
+        self._journal_entries += len(self._pending)
+        self._pending.clear()
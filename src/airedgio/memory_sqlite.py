@@ -1,8 +1,11 @@
 from datetime import datetime
+from itertools import islice
+import json
+import time
 from typing import Iterable
 import sqlite3
 
-from airedgio.memory import Memory
+from airedgio.memory import Memory, commit_seconds
 
 
 class MemorySQLite(Memory):
@@ -10,44 +13,44 @@ class MemorySQLite(Memory):
     _memory: dict
     _connection: sqlite3.Connection
     _fetch_size: int
+    _chunk_size: int
+    _latest: dict[str, datetime]
+    _cache_size: int
+    _cache_ttl: float
+    _cache_inserted: bool
 
-    def __init__(
-        self,
-        connection_string: str,
-        timestamp_format: str = '',
-        fetch_size: int = 1000
-    ) -> None:
-        if not connection_string.startswith('sqlite:'):
-            raise ValueError('Connection string must begin with "sqlite:"')
-        connection_string = connection_string.replace('sqlite:', '', 1)
-        super().__init__(timestamp_format)
-        self._connection = sqlite3.connect(connection_string)
-        self._fetch_size = fetch_size
+    _synchronous_levels = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
 
-        cur = self._connection.cursor()
-        cur.execute(
+    # Each migration is the list of statements bringing the schema from the
+    # previous version to the next one: the schema version is the number of
+    # migrations applied and is stored in the "user_version" pragma
+    _migrations = [
+        # 1: initial schema, tables may already exist in older databases
+        [
             '''
             CREATE TABLE IF NOT EXISTS failed_to_create (
                 id TEXT PRIMARY KEY
             )
-            '''
-        )
-        cur.execute(
+            ''',
             '''
             CREATE TABLE IF NOT EXISTS failed_to_modify (
                 id TEXT PRIMARY KEY
             )
-            '''
-        )
-        cur.execute(
+            ''',
             '''
             CREATE TABLE IF NOT EXISTS created (
                 id TEXT PRIMARY KEY
             )
+            ''',
+            # Assets of the window being processed whose outcome is already recorded
             '''
-        )
-        # The table only allows the id PKEY to have value equal to 0 so that there is always only one row
-        cur.execute(
+            CREATE TABLE IF NOT EXISTS processed (
+                phase TEXT,
+                id TEXT,
+                PRIMARY KEY (phase, id)
+            )
+            ''',
+            # The table only allows the id PKEY to have value equal to 0 so that there is always only one row
             '''
             CREATE TABLE IF NOT EXISTS latest (
                 id INTEGER PRIMARY KEY CHECK (id = 0),
@@ -55,40 +58,247 @@ class MemorySQLite(Memory):
                 latest_modified_date TEXT
             )
             '''
+        ],
+        # 2: the id tables are only looked up by id, store them as clustered indexes
+        [
+            statement
+            for table, columns, key in (
+                ('failed_to_create', 'id TEXT', 'id'),
+                ('failed_to_modify', 'id TEXT', 'id'),
+                ('created', 'id TEXT', 'id'),
+                ('processed', 'phase TEXT, id TEXT', 'phase, id')
+            )
+            for statement in (
+                f'''
+                CREATE TABLE {table}_without_rowid (
+                    {columns},
+                    PRIMARY KEY ({key})
+                ) WITHOUT ROWID
+                ''',
+                f'INSERT INTO {table}_without_rowid SELECT {key} FROM {table}',
+                f'DROP TABLE {table}',
+                f'ALTER TABLE {table}_without_rowid RENAME TO {table}'
+            )
+        ],
+        # 3: work sharing between workers using the same database
+        [
+            # A lease grants its owner the exclusive right to work on a resource until it expires
+            '''
+            CREATE TABLE leases (
+                resource TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expiry REAL NOT NULL
+            ) WITHOUT ROWID
+            ''',
+            # The time windows still to be converted by the workers
+            '''
+            CREATE TABLE windows (
+                phase TEXT,
+                start_date TEXT,
+                end_date TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (phase, start_date)
+            ) WITHOUT ROWID
+            '''
+        ],
+        # 4: translations kept between runs, evicted by age and least recent use
+        [
+            '''
+            CREATE TABLE translations (
+                id TEXT PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                translators_hash TEXT NOT NULL,
+                created TEXT NOT NULL,
+                used REAL NOT NULL
+            ) WITHOUT ROWID
+            ''',
+            'CREATE INDEX translations_used ON translations(used)'
+        ],
+        # 5: the translators each asset was last uploaded with
+        [
+            '''
+            CREATE TABLE fingerprints (
+                id TEXT PRIMARY KEY,
+                asset_type TEXT NOT NULL,
+                fingerprint TEXT NOT NULL
+            ) WITHOUT ROWID
+            ''',
+            'CREATE INDEX fingerprints_type ON fingerprints(asset_type, fingerprint)'
+        ],
+        # 6: the translations are stored as bundles of entities, drop the older ones
+        [
+            'DELETE FROM translations'
+        ],
+        # 7: the AIoD entities referenced by the uploaded assets
+        [
+            '''
+            CREATE TABLE asset_references (
+                id TEXT,
+                endpoint TEXT,
+                identifier INTEGER,
+                PRIMARY KEY (id, endpoint, identifier)
+            ) WITHOUT ROWID
+            ''',
+            '''
+            CREATE TABLE entities (
+                endpoint TEXT,
+                identifier INTEGER,
+                refcount INTEGER NOT NULL,
+                PRIMARY KEY (endpoint, identifier)
+            ) WITHOUT ROWID
+            ''',
+            'CREATE INDEX entities_orphans ON entities(endpoint, identifier) WHERE refcount <= 0',
+            # The references of the assets already uploaded are unknown: make
+            # them outdated so that the next run synchronizes and counts them
+            "UPDATE fingerprints SET fingerprint = ''"
+        ],
+        # 8: the AIoD identifiers of the uploaded assets, the types of the
+        # assets uploaded before are known from their fingerprints
+        [
+            '''
+            CREATE TABLE identifiers (
+                id TEXT PRIMARY KEY,
+                asset_type TEXT NOT NULL,
+                identifier INTEGER
+            ) WITHOUT ROWID
+            ''',
+            'INSERT INTO identifiers(id, asset_type) SELECT id, asset_type FROM fingerprints'
+        ],
+        # 9: the assets uploaded before the fingerprints have none, their
+        # type unknown: make them outdated so that the next run synchronizes
+        # them, recording their fingerprint, identifier and references
+        [
+            """
+            INSERT OR IGNORE INTO fingerprints(id, asset_type, fingerprint)
+            SELECT id, '', '' FROM created
+            """
+        ]
+    ]
+
+    def __init__(
+        self,
+        connection_string: str,
+        timestamp_format: str = '',
+        fetch_size: int = 1000,
+        synchronous: str = 'NORMAL',
+        chunk_size: int = 10000,
+        busy_timeout: float = 30,
+        cache_size: int = 10000,
+        cache_ttl: float = 30 * 24 * 3600
+    ) -> None:
+        if not connection_string.startswith('sqlite:'):
+            raise ValueError('Connection string must begin with "sqlite:"')
+        if synchronous.upper() not in self._synchronous_levels:
+            raise ValueError(
+                f'The synchronous level must be one of {", ".join(self._synchronous_levels)}'
+            )
+        if chunk_size < 1:
+            raise ValueError('The chunk size has to be a positive number')
+        if cache_size < 0:
+            raise ValueError('The cache size cannot be a negative number')
+        if cache_ttl <= 0:
+            raise ValueError('The cache duration has to be a positive number')
+        connection_string = connection_string.replace('sqlite:', '', 1)
+        super().__init__(timestamp_format)
+        # The connection can be used by other threads (e.g. the push server
+        # workers), which serialize their access through the caller's lock
+        # Other processes may be writing to the same database, wait for
+        # their transactions to end for up to "busy_timeout" seconds
+        self._connection = sqlite3.connect(
+            connection_string,
+            timeout=busy_timeout,
+            check_same_thread=False
         )
+        self._fetch_size = fetch_size
+        self._chunk_size = chunk_size
+        self._latest = dict()
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+        self._cache_inserted = False
+
+        cur = self._connection.cursor()
+        # With WAL a commit appends to the log instead of rewriting pages,
+        # and the NORMAL level only syncs the log at checkpoints
+        cur.execute('PRAGMA journal_mode = WAL')
+        cur.execute(f'PRAGMA synchronous = {synchronous.upper()}')
+        cur.execute('PRAGMA temp_store = MEMORY')
+
+        self._migrate()
+
+        # Scratch table used to apply set operations to chunks of ids
+        cur.execute(
+            '''
+            CREATE TEMP TABLE IF NOT EXISTS chunk (
+                id TEXT PRIMARY KEY
+            ) WITHOUT ROWID
+            '''
+        )
+
         # If the table is empty add default dates
         cur.execute(
             '''SELECT EXISTS (SELECT 1 FROM latest)'''
         )
         empty = cur.fetchone()[0] == 0
         if empty:
-            # print('Table "latest" is empty, inserting default dates... ', end='', flush=True)
             default_date = datetime(2023, 10, 1).strftime(
                 self._timestamp_format)
             cur.execute(
                 '''INSERT OR REPLACE INTO latest(id, latest_created_date, latest_modified_date) VALUES(?, ?, ?)''',
                 (0, default_date, default_date)
             )
-            # print('Populated table "latest" with default dates.')
         self._connection.commit()
 
+    @property
+    def schema_version(self) -> int:
+        return self._connection.execute('PRAGMA user_version').fetchone()[0]
+
+    def _migrate(self) -> None:
+        version = self.schema_version
+        if version > len(self._migrations):
+            raise ValueError(
+                f'The memory schema version {version} is newer than the supported one'
+            )
+
+        cur = self._connection.cursor()
+        for target, migration in enumerate(self._migrations[version:], version + 1):
+            # Each migration is applied in its own transaction together with the version bump
+            cur.execute('BEGIN')
+            try:
+                for statement in migration:
+                    cur.execute(statement)
+                cur.execute(f'PRAGMA user_version = {target}')
+            except sqlite3.Error:
+                self._connection.rollback()
+                raise
+            self._connection.commit()
+
     def save(self) -> None:
-        self._connection.commit()
+        with commit_seconds.time(backend='sqlite'):
+            if self._cache_inserted:
+                self._evict_translations()
+            self._connection.commit()
+
+    def close(self) -> None:
+        self.save()
+        self._connection.close()
 
     def _latest_date(self, date_type: str) -> datetime:
-        cur = self._connection.cursor()
-        latest = (
-            cur
-            .execute(
-                f'''SELECT {date_type} from latest'''
+        # Only the first read parses the stored date, the setter keeps the cache updated
+        if date_type not in self._latest:
+            cur = self._connection.cursor()
+            latest = (
+                cur
+                .execute(
+                    f'''SELECT {date_type} from latest'''
+                )
+                .fetchone()
+                [0]
             )
-            .fetchone()
-            [0]
-        )
-        return datetime.strptime(
-            latest,
-            self._timestamp_format
-        )
+            self._latest[date_type] = datetime.strptime(
+                latest,
+                self._timestamp_format
+            )
+        return self._latest[date_type]
 
     def _latest_date_setter(self, date_type: str, date: datetime) -> None:
         cur = self._connection.cursor()
@@ -98,6 +308,7 @@ class MemorySQLite(Memory):
             ''',
             (date.strftime(self._timestamp_format),)
         )
+        self._latest[date_type] = date
 
     @property
     def latest_created_date(self) -> datetime:
@@ -124,6 +335,20 @@ class MemorySQLite(Memory):
                 yield row[0]
             rows = cursor.fetchmany(self._fetch_size)
 
+    def _apply_in_chunks(self, ids: Iterable[str], statements: list[str]) -> None:
+        # Load the ids in the "chunk" table a chunk at a time and apply the
+        # statements to it, instead of binding one variable per id
+        cursor = self._connection.cursor()
+        ids = iter(ids)
+        while chunk := list(islice(ids, self._chunk_size)):
+            cursor.executemany(
+                'INSERT OR IGNORE INTO temp.chunk(id) VALUES(?)',
+                map(lambda asset_id: (asset_id,), chunk)
+            )
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute('DELETE FROM temp.chunk')
+
     @property
     def success_created(self) -> Iterable[str]:
         return self._get_iterable_from_table('created')
@@ -136,61 +361,447 @@ class MemorySQLite(Memory):
     def failed_modified(self) -> Iterable[str]:
         return self._get_iterable_from_table('failed_to_modify')
 
-    def update_created(self, success: list[str], failed: list[str]) -> None:
+    def update_created(self, success: Iterable[str], failed: Iterable[str]) -> None:
+        self._apply_in_chunks(
+            success,
+            [
+                'DELETE FROM failed_to_create WHERE id IN (SELECT id FROM temp.chunk)',
+                'INSERT OR IGNORE INTO created(id) SELECT id FROM temp.chunk'
+            ]
+        )
+        self._apply_in_chunks(
+            failed,
+            ['INSERT OR IGNORE INTO failed_to_create(id) SELECT id FROM temp.chunk']
+        )
+
+    def update_modified(self, success: Iterable[str], failed: Iterable[str]) -> None:
+        self._apply_in_chunks(
+            success,
+            [
+                'DELETE FROM failed_to_modify WHERE id IN (SELECT id FROM temp.chunk)',
+                'INSERT OR IGNORE INTO created(id) SELECT id FROM temp.chunk'
+            ]
+        )
+        self._apply_in_chunks(
+            failed,
+            ['INSERT OR IGNORE INTO failed_to_modify(id) SELECT id FROM temp.chunk']
+        )
+
+    def update_removed(self, removed: Iterable[str]) -> None:
+        self._apply_in_chunks(
+            removed,
+            [
+                # The entities referenced by the removed assets lose a reference each
+                '''
+                UPDATE entities SET refcount = refcount - (
+                    SELECT COUNT(*) FROM asset_references
+                    WHERE asset_references.endpoint = entities.endpoint
+                    AND asset_references.identifier = entities.identifier
+                    AND asset_references.id IN (SELECT id FROM temp.chunk)
+                )
+                WHERE (endpoint, identifier) IN (
+                    SELECT endpoint, identifier FROM asset_references
+                    WHERE id IN (SELECT id FROM temp.chunk)
+                )
+                ''',
+                'DELETE FROM asset_references WHERE id IN (SELECT id FROM temp.chunk)',
+                'DELETE FROM created WHERE id IN (SELECT id FROM temp.chunk)',
+                'DELETE FROM failed_to_create WHERE id IN (SELECT id FROM temp.chunk)',
+                'DELETE FROM failed_to_modify WHERE id IN (SELECT id FROM temp.chunk)',
+                'DELETE FROM translations WHERE id IN (SELECT id FROM temp.chunk)',
+                'DELETE FROM fingerprints WHERE id IN (SELECT id FROM temp.chunk)',
+                'DELETE FROM identifiers WHERE id IN (SELECT id FROM temp.chunk)'
+            ]
+        )
+
+    @property
+    def caches_translations(self) -> bool:
+        return self._cache_size > 0
+
+    def cached_translation(
+        self,
+        asset_id: str,
+        source_hash: str,
+        translators_hash: str
+    ) -> dict | None:
+        if not self._cache_size:
+            return None
         cursor = self._connection.cursor()
-        # cursor.executemany(
-        #     "DELETE FROM failed_to_create WHERE id = ?",
-        #     map(lambda asset_id: (asset_id,), success)
-        # )
         cursor.execute(
-            f"DELETE FROM failed_to_create WHERE id IN ({', '.join(['?'] * len(success))})",
-            success
+            '''
+            SELECT created FROM translations
+            WHERE id = ? AND source_hash = ? AND translators_hash = ?
+            ''',
+            (asset_id, source_hash, translators_hash)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute(
+            'UPDATE translations SET used = ? WHERE id = ?',
+            (time.time(), asset_id)
         )
-        cursor.executemany(
+        return json.loads(row[0])
+
+    def update_cached_translation(
+        self,
+        asset_id: str,
+        source_hash: str,
+        translators_hash: str,
+        created: dict
+    ) -> None:
+        # A single translation is kept for each asset, the latest one
+        if not self._cache_size:
+            return
+        cursor = self._connection.cursor()
+        cursor.execute(
             '''
-            INSERT OR REPLACE INTO failed_to_create(id) VALUES(?)
+            INSERT OR REPLACE INTO translations(id, source_hash, translators_hash, created, used)
+            VALUES(?, ?, ?, ?, ?)
             ''',
-            map(lambda asset_id: (asset_id,), failed)
+            (asset_id, source_hash, translators_hash, json.dumps(created), time.time())
         )
-        cursor.executemany(
+        self._cache_inserted = True
+
+    def _evict_translations(self) -> None:
+        # Drop the translations unused for longer than the cache duration,
+        # then the least recently used ones above the cache size
+        cursor = self._connection.cursor()
+        cursor.execute(
+            'DELETE FROM translations WHERE used < ?',
+            (time.time() - self._cache_ttl,)
+        )
+        cursor.execute(
             '''
-            INSERT OR REPLACE INTO created(id) VALUES(?)
+            DELETE FROM translations WHERE id IN (
+                SELECT id FROM translations ORDER BY used DESC LIMIT -1 OFFSET ?
+            )
             ''',
-            map(lambda asset_id: (asset_id,), success)
+            (self._cache_size,)
         )
+        self._cache_inserted = False
 
-    def update_modified(self, success: Iterable[str], failed: Iterable[str]) -> None:
+    def update_fingerprints(self, fingerprints: Iterable[tuple[str, str, str]]) -> None:
         cursor = self._connection.cursor()
         cursor.executemany(
-            "DELETE FROM failed_to_modify WHERE id = ?",
-            map(lambda asset_id: (asset_id,), success)
+            'INSERT OR REPLACE INTO fingerprints(id, asset_type, fingerprint) VALUES(?, ?, ?)',
+            fingerprints
+        )
+
+    def fingerprinted_types(self) -> set[str]:
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT DISTINCT asset_type FROM fingerprints')
+        return {row[0] for row in cursor.fetchall()}
+
+    def outdated(self, asset_type: str, fingerprint: str | None) -> Iterable[str]:
+        cursor = self._connection.cursor()
+        cursor.execute(
+            'SELECT id FROM fingerprints WHERE asset_type = ? AND fingerprint IS NOT ?',
+            (asset_type, fingerprint)
+        )
+        rows = cursor.fetchmany(self._fetch_size)
+        while rows:
+            for row in rows:
+                yield row[0]
+            rows = cursor.fetchmany(self._fetch_size)
+
+    def update_references(self, asset_id: str, references: Iterable[tuple[str, int]]) -> None:
+        cursor = self._connection.cursor()
+        cursor.execute(
+            'SELECT endpoint, identifier FROM asset_references WHERE id = ?',
+            (asset_id,)
+        )
+        old = set(map(tuple, cursor.fetchall()))
+        new = set(references)
+        cursor.executemany(
+            'UPDATE entities SET refcount = refcount - 1 WHERE endpoint = ? AND identifier = ?',
+            old - new
+        )
+        cursor.executemany(
+            'DELETE FROM asset_references WHERE id = ? AND endpoint = ? AND identifier = ?',
+            [(asset_id, *entity) for entity in old - new]
         )
         cursor.executemany(
             '''
-            INSERT OR REPLACE INTO failed_to_modify(id) VALUES(?)
+            INSERT INTO entities(endpoint, identifier, refcount) VALUES(?, ?, 1)
+            ON CONFLICT(endpoint, identifier) DO UPDATE SET refcount = refcount + 1
             ''',
-            map(lambda asset_id: (asset_id,), failed)
+            new - old
+        )
+        cursor.executemany(
+            'INSERT INTO asset_references(id, endpoint, identifier) VALUES(?, ?, ?)',
+            [(asset_id, *entity) for entity in new - old]
         )
+
+    def track_entities(self, entities: Iterable[tuple[str, int]]) -> None:
+        cursor = self._connection.cursor()
         cursor.executemany(
+            'INSERT OR IGNORE INTO entities(endpoint, identifier, refcount) VALUES(?, ?, 0)',
+            entities
+        )
+
+    def orphans(self, limit: int, after: tuple[str, int] | None = None) -> list[tuple[str, int]]:
+        cursor = self._connection.cursor()
+        cursor.execute(
             '''
-            INSERT OR REPLACE INTO created(id) VALUES(?)
+            SELECT endpoint, identifier FROM entities
+            WHERE refcount <= 0 AND (endpoint, identifier) > (?, ?)
+            ORDER BY endpoint, identifier
+            LIMIT ?
             ''',
-            map(lambda asset_id: (asset_id,), success)
+            (*(after or ('', 0)), limit)
         )
+        return list(map(tuple, cursor.fetchall()))
 
-    def update_removed(self, removed: Iterable[str]) -> None:
+    def forget_entities(self, entities: Iterable[tuple[str, int]]) -> None:
         cursor = self._connection.cursor()
         cursor.executemany(
-            "DELETE FROM created WHERE id = ?",
-            map(lambda asset_id: (asset_id,), removed)
+            'DELETE FROM entities WHERE endpoint = ? AND identifier = ? AND refcount <= 0',
+            entities
         )
+
+    def uncounted_references(self) -> int:
+        # The assets uploaded before the counts have an empty fingerprint
+        # until synchronized again
+        cursor = self._connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM fingerprints WHERE fingerprint = ''")
+        return cursor.fetchone()[0]
+
+    def update_identifiers(self, identifiers: Iterable[tuple[str, str, int | None]]) -> None:
         cursor = self._connection.cursor()
         cursor.executemany(
-            "DELETE FROM failed_to_create WHERE id = ?",
-            map(lambda asset_id: (asset_id,), removed)
+            'INSERT OR REPLACE INTO identifiers(id, asset_type, identifier) VALUES(?, ?, ?)',
+            identifiers
+        )
+
+    def identifiers(self, asset_ids: Iterable[str]) -> dict[str, tuple[str, int | None]]:
+        identifiers = dict()
+        cursor = self._connection.cursor()
+        asset_ids = iter(asset_ids)
+        while chunk := list(islice(asset_ids, self._chunk_size)):
+            cursor.executemany(
+                'INSERT OR IGNORE INTO temp.chunk(id) VALUES(?)',
+                map(lambda asset_id: (asset_id,), chunk)
+            )
+            cursor.execute(
+                '''
+                SELECT id, asset_type, identifier FROM identifiers
+                WHERE id IN (SELECT id FROM temp.chunk)
+                '''
+            )
+            for asset_id, asset_type, identifier in cursor.fetchall():
+                identifiers[asset_id] = (asset_type, identifier)
+            cursor.execute('DELETE FROM temp.chunk')
+        return identifiers
+
+    def processed(self, window: str) -> set[str]:
+        cursor = self._connection.cursor()
+        cursor.execute(
+            'SELECT id FROM processed WHERE phase = ?',
+            (window,)
         )
+        return {row[0] for row in cursor.fetchall()}
+
+    def update_processed(self, window: str, processed: Iterable[str]) -> None:
         cursor = self._connection.cursor()
         cursor.executemany(
-            "DELETE FROM failed_to_modify WHERE id = ?",
-            map(lambda asset_id: (asset_id,), removed)
+            '''
+            INSERT OR IGNORE INTO processed(phase, id) VALUES(?, ?)
+            ''',
+            map(lambda asset_id: (window, asset_id), processed)
         )
+
+    def clear_processed(self, window: str) -> None:
+        cursor = self._connection.cursor()
+        cursor.execute(
+            'DELETE FROM processed WHERE phase = ?',
+            (window,)
+        )
+
+    # The following methods let several workers share the database: each
+    # commits right away so that the other workers see its effect, taking
+    # the write lock first (BEGIN IMMEDIATE) when it needs to read and write
+    # atomically. The changes made before have to be saved first, they would
+    # be committed along otherwise.
+
+    def _begin_immediate(self) -> sqlite3.Cursor:
+        if self._connection.in_transaction:
+            raise RuntimeError('The changes made before have to be saved before taking the write lock')
+        cursor = self._connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        return cursor
+
+    def acquire_lease(self, resource: str, owner: str, ttl: float) -> bool:
+        # Take the lease if free, expired or already owned (renewing it)
+        now = time.time()
+        cursor = self._begin_immediate()
+        cursor.execute(
+            '''
+            INSERT INTO leases(resource, owner, expiry) VALUES(?, ?, ?)
+            ON CONFLICT(resource) DO UPDATE SET owner = excluded.owner, expiry = excluded.expiry
+            WHERE leases.owner = excluded.owner OR leases.expiry < ?
+            ''',
+            (resource, owner, now + ttl, now)
+        )
+        acquired = cursor.rowcount > 0
+        self._connection.commit()
+        return acquired
+
+    def renew_lease(self, resource: str, owner: str, ttl: float) -> bool:
+        # False if the lease expired and was taken by another worker
+        cursor = self._begin_immediate()
+        cursor.execute(
+            'UPDATE leases SET expiry = ? WHERE resource = ? AND owner = ?',
+            (time.time() + ttl, resource, owner)
+        )
+        renewed = cursor.rowcount > 0
+        self._connection.commit()
+        return renewed
+
+    def claim_failed(
+        self,
+        owner: str,
+        ttl: float,
+        count: int,
+        modified: bool = False,
+        after: str = ''
+    ) -> list[str]:
+        # Lease up to "count" failed ids after the given one, in order, that
+        # no worker holds a lease on: the caller passes the last id claimed,
+        # so that each id is tried at most once per pass however long it takes
+        table = 'failed_to_modify' if modified else 'failed_to_create'
+        now = time.time()
+        cursor = self._begin_immediate()
+        cursor.execute(
+            f'''
+            SELECT id FROM {table}
+            WHERE id > ? AND NOT EXISTS (
+                SELECT 1 FROM leases WHERE resource = 'asset:' || {table}.id AND expiry >= ?
+            )
+            ORDER BY id
+            LIMIT ?
+            ''',
+            (after, now, count)
+        )
+        asset_ids = [row[0] for row in cursor.fetchall()]
+        cursor.executemany(
+            'INSERT OR REPLACE INTO leases(resource, owner, expiry) VALUES(?, ?, ?)',
+            map(lambda asset_id: (f'asset:{asset_id}', owner, now + ttl), asset_ids)
+        )
+        self._connection.commit()
+        return asset_ids
+
+    def plan_windows(self, phase: str, windows: Iterable[tuple[datetime, datetime]]) -> None:
+        # Windows already planned by another worker are kept as they are.
+        # Windows starting before the watermark were completed (and removed)
+        # by other workers after the caller read it, they are not planned again
+        cursor = self._begin_immediate()
+        latest = cursor.execute(
+            f'SELECT latest_{phase}_date FROM latest'
+        ).fetchone()[0]
+        rows = (
+            (
+                phase,
+                window[0].strftime(self._timestamp_format),
+                window[1].strftime(self._timestamp_format)
+            )
+            for window in windows
+        )
+        cursor.executemany(
+            'INSERT OR IGNORE INTO windows(phase, start_date, end_date) VALUES(?, ?, ?)',
+            filter(lambda row: row[1] >= latest, rows)
+        )
+        self._connection.commit()
+
+    def claim_window(
+        self,
+        phase: str,
+        owner: str,
+        ttl: float
+    ) -> tuple[datetime, datetime] | None:
+        # Lease the oldest window not done yet that no other worker holds
+        now = time.time()
+        cursor = self._begin_immediate()
+        cursor.execute(
+            '''
+            SELECT start_date, end_date FROM windows
+            WHERE phase = ? AND done = 0 AND NOT EXISTS (
+                SELECT 1 FROM leases
+                WHERE resource = 'window:' || windows.phase || ':' || windows.start_date
+                    AND owner != ? AND expiry >= ?
+            )
+            ORDER BY start_date
+            LIMIT 1
+            ''',
+            (phase, owner, now)
+        )
+        row = cursor.fetchone()
+        if row:
+            cursor.execute(
+                'INSERT OR REPLACE INTO leases(resource, owner, expiry) VALUES(?, ?, ?)',
+                (f'window:{phase}:{row[0]}', owner, now + ttl)
+            )
+        self._connection.commit()
+        if not row:
+            return None
+        return (
+            datetime.strptime(row[0], self._timestamp_format),
+            datetime.strptime(row[1], self._timestamp_format)
+        )
+
+    def window_lease(self, phase: str, start_date: datetime) -> str:
+        return f'window:{phase}:{start_date.strftime(self._timestamp_format)}'
+
+    def complete_window(
+        self,
+        phase: str,
+        start_date: datetime,
+        owner: str,
+        window: str,
+        success: Iterable[str],
+        failed: Iterable[str]
+    ) -> None:
+        # Record the outcomes of the last assets of the window, forget its
+        # processed assets and mark it as done in a single transaction, so a
+        # crash leaves it either done or claimable with its processed assets.
+        # The watermark moves to the end of the done windows preceding the
+        # oldest window not done yet, so it never gets ahead of the outcomes.
+        start = start_date.strftime(self._timestamp_format)
+        date_type = f'latest_{phase}_date'
+        cursor = self._begin_immediate()
+        if phase == 'modified':
+            self.update_modified(success, failed)
+        else:
+            self.update_created(success, failed)
+        self.clear_processed(window)
+        cursor.execute(
+            'UPDATE windows SET done = 1 WHERE phase = ? AND start_date = ?',
+            (phase, start)
+        )
+        cursor.execute(
+            'DELETE FROM leases WHERE resource = ? AND owner = ?',
+            (f'window:{phase}:{start}', owner)
+        )
+        cursor.execute(
+            '''
+            SELECT MAX(end_date) FROM windows
+            WHERE phase = ? AND done = 1 AND start_date < COALESCE(
+                (SELECT MIN(start_date) FROM windows WHERE phase = ? AND done = 0),
+                '9999'
+            )
+            ''',
+            (phase, phase)
+        )
+        latest = cursor.fetchone()[0]
+        if latest:
+            cursor.execute(
+                f'UPDATE latest SET {date_type} = ? WHERE id = 0 AND {date_type} < ?',
+                (latest, latest)
+            )
+            cursor.execute(
+                'DELETE FROM windows WHERE phase = ? AND done = 1 AND end_date <= ?',
+                (phase, latest)
+            )
+        self._connection.commit()
+        # Other workers may have moved the watermark too, read it again when needed
+        self._latest.pop(date_type, None)
@@ -0,0 +1,267 @@
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from logging import getLogger
+from queue import Queue
+from threading import Lock, Thread
+from airedgio.airedgio import AIRedgio
+
+logger = getLogger(__name__)
+
+
+class PushServer:
+    # Receives create, update and delete notifications from the AI REDGIO
+    # portal and converts the assets right away instead of waiting for the
+    # next time-window poll, which becomes only a safety net.
+    #
+    # A notification is a JSON object POSTed to /notifications:
+    #   {"action": "create" | "update", "asset": {<full asset>}}
+    #   {"action": "create" | "update", "id": "<asset id>"}
+    #   {"action": "delete", "id": "<asset id>", "type": "<asset type>"}
+    # Notifications for an asset already waiting in the queue replace the
+    # queued one, so a burst of updates results in a single conversion.
+    _actions = ('create', 'update', 'delete')
+
+    _airedgio: AIRedgio
+    _host: str
+    _port: int
+    _workers: int
+    _queue_size: int
+
+    _queue: Queue
+    _lock: Lock
+    _pending: dict[str, dict]
+    _in_progress: set[str]
+    _deferred: dict[str, dict]
+    _server: ThreadingHTTPServer | None = None
+    _threads: list[Thread]
+
+    def __init__(
+        self,
+        airedgio: AIRedgio,
+        host: str = '127.0.0.1',
+        port: int = 8081,
+        workers: int = 4,
+        queue_size: int = 1000
+    ) -> None:
+        if workers < 1:
+            raise ValueError('The number of workers has to be a positive number')
+        if queue_size < 1:
+            raise ValueError('The queue size has to be a positive number')
+
+        self._airedgio = airedgio
+        self._host = host
+        self._port = port
+        self._workers = workers
+        self._queue_size = queue_size
+
+        self._queue = Queue()
+        self._lock = Lock()
+        self._pending = dict()
+        self._in_progress = set()
+        self._deferred = dict()
+        self._threads = list()
+
+    @property
+    def airedgio(self) -> AIRedgio:
+        return self._airedgio
+
+    @airedgio.setter
+    def airedgio(self, airedgio: AIRedgio) -> None:
+        self._airedgio = airedgio
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._deferred)
+
+    def notify(self, notification: dict) -> bool:
+        # Queue the notification, return False if the queue is full
+        asset_id = notification['id']
+        with self._lock:
+            if asset_id in self._pending:
+                # Still waiting: only the latest notification matters
+                self._pending[asset_id] = notification
+                return True
+            if asset_id in self._in_progress:
+                # Processed again once the running conversion is over
+                self._deferred[asset_id] = notification
+                return True
+            if len(self._pending) >= self._queue_size:
+                return False
+            self._pending[asset_id] = notification
+            self._queue.put(asset_id)
+        return True
+
+    def _process(self, notification: dict) -> bool:
+        asset_id = notification['id']
+        match notification['action']:
+            case 'delete':
+                return self._airedgio.delete_one(asset_id, notification['type'])
+            case 'create':
+                return self._airedgio.convert_one(asset_id, notification['asset'])
+            case 'update':
+                return self._airedgio.convert_one(
+                    asset_id, notification['asset'], modified=True)
+        return False
+
+    def _work(self) -> None:
+        while True:
+            asset_id = self._queue.get()
+            if asset_id is None:
+                break
+
+            with self._lock:
+                notification = self._pending.pop(asset_id)
+                self._in_progress.add(asset_id)
+
+            try:
+                logger.debug(
+                    'Processing %(action)s notification for asset %(asset_id)s',
+                    {
+                        'action': notification['action'],
+                        'asset_id': asset_id
+                    }
+                )
+                self._process(notification)
+            except Exception as ex:
+                logger.warning(
+                    'Error with asset %(asset_id)s: %(error_message)s',
+                    {
+                        'asset_id': asset_id,
+                        'error_message': repr(ex)
+                    }
+                )
+            finally:
+                with self._lock:
+                    self._in_progress.discard(asset_id)
+                    if asset_id in self._deferred:
+                        self._pending[asset_id] = self._deferred.pop(asset_id)
+                        self._queue.put(asset_id)
+
+    def parse(self, body: dict) -> dict:
+        # Validate a notification and normalize it to action, id, type and asset
+        if not isinstance(body, dict):
+            raise ValueError('The notification must be a JSON object')
+
+        action = body.get('action', '')
+        if action not in self._actions:
+            raise ValueError(
+                f'The action must be one of {", ".join(self._actions)}'
+            )
+
+        asset = body.get('asset', dict())
+        if not isinstance(asset, dict):
+            raise ValueError('The asset must be a JSON object')
+        asset_id = asset.get('_id', body.get('id', ''))
+        if not asset_id or not isinstance(asset_id, str):
+            raise ValueError('The notification must have an asset or an id')
+
+        if asset and not isinstance(asset.get('_source'), dict):
+            raise ValueError('The source of the asset must be a JSON object')
+
+        asset_type = body.get('type', '')
+        if not isinstance(asset_type, str):
+            raise ValueError('The type must be a string')
+        if not asset_type and asset:
+            aitype = asset['_source'].get('aitype', '')
+            if not aitype or not isinstance(aitype, str):
+                raise ValueError('The asset must have a type')
+            asset_type = (
+                aitype
+                .lower()
+                .replace(' ', '_')
+            )
+        if action == 'delete' and not asset_type:
+            raise ValueError('A delete notification must have a type')
+
+        return {
+            'action': action,
+            'id': asset_id,
+            'type': asset_type,
+            'asset': asset
+        }
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: HTTPStatus, content: dict) -> None:
+                body = json.dumps(content).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                if self.path != '/health':
+                    self._reply(HTTPStatus.NOT_FOUND, {'detail': 'Not found'})
+                    return
+                self._reply(HTTPStatus.OK, {'pending': server.pending})
+
+            def do_POST(self) -> None:
+                if self.path != '/notifications':
+                    self._reply(HTTPStatus.NOT_FOUND, {'detail': 'Not found'})
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    notification = server.parse(
+                        json.loads(self.rfile.read(length)))
+                except (ValueError, KeyError, AttributeError, TypeError) as ex:
+                    self._reply(HTTPStatus.BAD_REQUEST, {'detail': str(ex)})
+                    return
+
+                if not server.notify(notification):
+                    self._reply(
+                        HTTPStatus.SERVICE_UNAVAILABLE,
+                        {'detail': 'Too many pending notifications'}
+                    )
+                    return
+                self._reply(HTTPStatus.ACCEPTED, {'id': notification['id']})
+
+            def log_message(self, format: str, *args) -> None:
+                logger.debug(format, *args)
+
+        return Handler
+
+    def _start_workers(self) -> None:
+        for _ in range(self._workers):
+            thread = Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def drain(self) -> None:
+        # Stop the workers once the notifications queued so far are
+        # processed; the ones received meanwhile stay queued until resumed
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def resume(self) -> None:
+        if not self._threads:
+            self._start_workers()
+
+    def start(self) -> None:
+        self._start_workers()
+
+        self._server = ThreadingHTTPServer(
+            (self._host, self._port), self._handler())
+        thread = Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        logger.info(
+            'Listening for notifications on %(host)s:%(port)d',
+            {
+                'host': self._host,
+                'port': self._server.server_address[1]
+            }
+        )
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.drain()
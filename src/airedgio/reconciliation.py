@@ -0,0 +1,95 @@
+from bridge.entities import Entity
+
+
+def project(current: object, wanted: object) -> object:
+    # The part of an AIoD value a translated value sets: the keys of the
+    # dicts missing from the translation are left out, so that the fields
+    # filled in by AIoD do not count as differences
+    match wanted:
+        case dict() if isinstance(current, dict):
+            return {
+                key: project(current.get(key), value)
+                for key, value in wanted.items()
+            }
+        case list() if isinstance(current, list) and len(current) == len(wanted):
+            return [
+                project(element, value)
+                for element, value in zip(current, wanted)
+            ]
+    return current
+
+
+def differs(entity: Entity, document: dict) -> bool:
+    # Whether the AIoD document holds something else than the translated
+    # entity, except its identifier and the references to other entities,
+    # whose identifiers are only known once uploaded
+    skipped = {'identifier'} | {
+        reference.path[0]
+        for reference in entity.references
+    }
+    return any(
+        project(document.get(key), value) != value
+        for key, value in entity.body.items()
+        if key not in skipped
+    )
+
+
+class Plan:
+    # The changes making the assets of the platform on AIoD match the
+    # portal, worked out from the translated portal assets and the AIoD
+    # documents listed one at a time:
+    # - "create": the portal assets missing from AIoD
+    # - "update": the portal assets whose AIoD document differs, with its identifier
+    # - "unchanged": the portal assets already up to date, with their identifier
+    # - "delete": by AIoD endpoint, the assets missing from the portal, with their identifier
+    _expected: dict[tuple[str, str], Entity | None]
+    _listed: set[tuple[str, str]]
+
+    create: list[str]
+    update: dict[str, int]
+    unchanged: dict[str, int]
+    delete: dict[str, dict[str, int]]
+
+    def __init__(self, expected: dict[tuple[str, str], Entity | None]) -> None:
+        # The translated assets of the portal by AIoD endpoint and asset id,
+        # None for the ones that could not be translated: they are neither
+        # created nor deleted
+        self._expected = expected
+        self._listed = set()
+
+        self.create = list()
+        self.update = dict()
+        self.unchanged = dict()
+        self.delete = dict()
+
+    def listed(self, endpoint: str, document: dict) -> None:
+        asset_id = document.get('platform_resource_identifier', '')
+        key = (endpoint, asset_id)
+        self._listed.add(key)
+        if key not in self._expected:
+            self.delete.setdefault(endpoint, dict())[asset_id] = document['identifier']
+            return
+        entity = self._expected[key]
+        if entity is None:
+            return
+        if differs(entity, document):
+            self.update[asset_id] = document['identifier']
+        else:
+            self.unchanged[asset_id] = document['identifier']
+
+    def close(self) -> None:
+        # Once every AIoD document is listed, the others are created
+        self.create = [
+            asset_id
+            for (endpoint, asset_id), entity in self._expected.items()
+            if entity is not None and (endpoint, asset_id) not in self._listed
+        ]
+
+    @property
+    def counts(self) -> dict[str, int]:
+        return {
+            'create': len(self.create),
+            'update': len(self.update),
+            'delete': sum(len(assets) for assets in self.delete.values()),
+            'unchanged': len(self.unchanged)
+        }
@@ -0,0 +1,164 @@
+from logging import getLogger
+from airedgio.airedgio import AIRedgio
+from airedgio.memory_sqlite import MemorySQLite
+
+logger = getLogger(__name__)
+
+
+class ShardedWorker:
+    # Runs the conversion together with other workers (processes on the same
+    # machine, or on nodes sharing the volume of the SQLite memory): the time
+    # windows and the failed assets are split between the workers through
+    # leases stored in the memory, so that each one is converted by a single
+    # worker. A worker renews its leases every half of their duration, before
+    # converting the next asset, and stops as soon as one is lost: it never
+    # starts an upload once its lease may have expired. The leases of a
+    # worker that stopped expire and are taken over by the others.
+    _airedgio: AIRedgio
+    _memory: MemorySQLite
+    _owner: str
+    _lease_ttl: float
+    _batch_size: int
+
+    def __init__(
+        self,
+        airedgio: AIRedgio,
+        owner: str,
+        lease_ttl: float = 600,
+        batch_size: int = 100
+    ) -> None:
+        if not isinstance(airedgio.memory, MemorySQLite):
+            raise ValueError('Sharding the conversion needs an SQLite memory')
+        if lease_ttl <= 0:
+            raise ValueError('The lease duration has to be a positive number')
+        if batch_size < 1:
+            raise ValueError('The batch size has to be a positive number')
+
+        self._airedgio = airedgio
+        self._memory = airedgio.memory
+        self._owner = owner
+        self._lease_ttl = lease_ttl
+        self._batch_size = batch_size
+
+    def _renew(self, resources: list[str]) -> bool:
+        # Renew the leases once the outcomes committed, False if one was lost
+        with self._airedgio.memory_lock:
+            self._memory.save()
+            return all([
+                self._memory.renew_lease(
+                    resource, self._owner, self._lease_ttl)
+                for resource in resources
+            ])
+
+    def convert_windows(self, phase: str) -> None:
+        modified = phase == 'modified'
+        latest = (
+            self._memory.latest_modified_date
+            if modified
+            else self._memory.latest_created_date
+        )
+        self._memory.plan_windows(phase, self._airedgio.windows(latest))
+
+        while window := self._memory.claim_window(phase, self._owner, self._lease_ttl):
+            start_date, end_date = window
+            lease = self._memory.window_lease(phase, start_date)
+            logger.debug(
+                'Worker %(owner)s converting assets %(phase)s between %(start_date)s and %(end_date)s',
+                {
+                    'owner': self._owner,
+                    'phase': phase,
+                    'start_date': start_date,
+                    'end_date': end_date
+                }
+            )
+            assets = (
+                self._airedgio.get_changed(start_date, end_date)
+                if modified
+                else self._airedgio.get_created(start_date, end_date)
+            )
+
+            lost = False
+
+            def heartbeat() -> bool:
+                nonlocal lost
+                lost = not self._renew([lease])
+                return not lost
+
+            window_key = f'{phase}:{start_date:%Y%m%d%H%M%S}'
+            success, failed = self._airedgio.convert_window(
+                assets,
+                window_key,
+                modified=modified,
+                heartbeat=heartbeat,
+                heartbeat_interval=self._lease_ttl / 2
+            )
+
+            with self._airedgio.memory_lock:
+                # The changes of the conversions are committed on their own
+                self._memory.save()
+                if lost:
+                    # Another worker took the window over, the outcomes were
+                    # committed with the processed assets it skips
+                    logger.warning(
+                        'Worker %(owner)s lost the lease on %(lease)s',
+                        {
+                            'owner': self._owner,
+                            'lease': lease
+                        }
+                    )
+                    continue
+                self._memory.complete_window(
+                    phase,
+                    start_date,
+                    self._owner,
+                    window_key,
+                    success,
+                    failed
+                )
+
+    def convert_failed(self, phase: str) -> None:
+        modified = phase == 'modified'
+        after = ''
+        while asset_ids := self._memory.claim_failed(
+            self._owner,
+            self._lease_ttl,
+            self._batch_size,
+            modified=modified,
+            after=after
+        ):
+            # The ids failing again are not claimed again by this pass
+            after = asset_ids[-1]
+            resources = [f'asset:{asset_id}' for asset_id in asset_ids]
+
+            self._airedgio.convert_ids(
+                asset_ids,
+                modified=modified,
+                heartbeat=lambda: self._renew(resources),
+                heartbeat_interval=self._lease_ttl / 2
+            )
+
+    def check_deletion(self) -> None:
+        # A single worker checks for deletions, the lease is left to expire
+        # so that the other workers of the same run do not check again
+        if self._memory.acquire_lease('deletion', self._owner, self._lease_ttl):
+            self._airedgio.check_deletion()
+            with self._airedgio.memory_lock:
+                self._memory.save()
+
+    def convert_all(self) -> None:
+        if not self._airedgio.bridge.check_aiod_login():
+            return
+
+        if not self._airedgio.bridge.check_platform():
+            return
+
+        self._airedgio.enqueue_outdated()
+
+        # Each worker passes once over the failed assets in order, the leases
+        # keep the other workers from converting them at the same time
+        self.convert_failed('created')
+        self.convert_windows('created')
+        self.convert_failed('modified')
+        self.convert_windows('modified')
+
+        self.check_deletion()
@@ -0,0 +1,384 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from multiprocessing.connection import Connection
+import random
+from threading import Lock, Thread
+import time
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-ins of the AI REDGIO portal and of AIoD for the load
+# benchmarks: both answer like the real servers for the requests sent by the
+# bridge, and report the requests they received on GET /_benchmark/stats
+
+_timestamp_format = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+STATS_PATH = '/_benchmark/stats'
+
+
+def _timestamp(date: datetime) -> str:
+    # Milliseconds, like the dates stored by the portal
+    return date.strftime(_timestamp_format)[:-4] + 'Z'
+
+
+def synthetic_assets(
+    count: int,
+    contacts: int = 2,
+    list_length: int = 3,
+    contact_overlap: float = 0.5,
+    seed: int = 0,
+    start_date: datetime = datetime(2023, 10, 1)
+) -> list[dict]:
+    # "aiasset" documents shaped like check_publish/services.json, created
+    # evenly from "start_date" until now: "contacts" contacts each, a share
+    # "contact_overlap" of them drawn from a pool shared by all the assets,
+    # and "list_length" entries in each of the other lists
+    if count < 0:
+        raise ValueError('The number of assets cannot be a negative number')
+    if not 0 <= contact_overlap <= 1:
+        raise ValueError('The contact overlap has to be between 0 and 1')
+    generator = random.Random(seed)
+    # Shared contacts are drawn from a pool small enough to be named again
+    shared = [f'Shared Contact {i}' for i in range(max(1, count * contacts // 10))]
+    step = (datetime.now() - start_date) / max(count, 1)
+
+    assets = list()
+    for i in range(count):
+        asset_id = f'bench-{seed}-{i:08d}'
+        created = _timestamp(start_date + step * i + timedelta(milliseconds=1))
+        names = [
+            generator.choice(shared)
+            if generator.random() < contact_overlap
+            else f'Contact {i}-{j}'
+            for j in range(contacts)
+        ]
+        title = f'Synthetic asset {i}'
+        assets.append({
+            '_index': 'aiasset',
+            '_type': 'aiasset',
+            '_id': asset_id,
+            '_score': None,
+            '_source': {
+                'title': title,
+                'subtitle': f'Subtitle of {title}',
+                'aitype': 'As a Service',
+                'additionalmaterial': [
+                    {
+                        'label': f'Material {j}',
+                        'url': f'https://example.org/{asset_id}/material/{j}'
+                    }
+                    for j in range(list_length)
+                ],
+                'devby': {
+                    'label': f'Developer of {title}',
+                    'url': f'https://example.org/{asset_id}/developer'
+                },
+                'description': f'<p>Description of {title}<br></p>',
+                'hashtags': [f'hashtag{j}' for j in range(list_length)],
+                'businesscategories': [f'Business {j}' for j in range(list_length)],
+                'technicalcategories': [f'Technical {j}' for j in range(list_length)],
+                'documents': [
+                    {
+                        'label': f'Document {j}'
+                    }
+                    for j in range(list_length)
+                ],
+                'trustworthyai': f'Trustworthiness of {title}',
+                'gdpr': f'GDPR compliance of {title}',
+                'contact': [
+                    {
+                        'namesurname': name
+                    }
+                    for name in names
+                ],
+                'properties': {
+                    'status': '1',
+                    'visibility': '0',
+                    'owner': {
+                        'uid': f'owner{i % 100}@example.org',
+                        'gid': '20121'
+                    },
+                    'lang': 'und',
+                    'tid': '0',
+                    'created': created,
+                    'changed': created,
+                    'ipsource': 'https://example.org/'
+                }
+            },
+            'sort': [title],
+            'relations': []
+        })
+    return assets
+
+
+class _FakeServer:
+    # A threaded HTTP server answering with JSON after "latency" seconds and
+    # counting the requests by method and endpoint
+    _latency: float
+    _server: ThreadingHTTPServer | None = None
+    _requests: Counter
+    _lock: Lock
+
+    def __init__(self, latency: float = 0.0) -> None:
+        if latency < 0:
+            raise ValueError('The latency cannot be a negative number')
+        self._latency = latency
+        self._requests = Counter()
+        self._lock = Lock()
+
+    def handle(self, method: str, path: str, body: dict | None) -> tuple[int, object]:
+        raise NotImplementedError
+
+    def _count(self, method: str, endpoint: str) -> None:
+        with self._lock:
+            self._requests[f'{method} {endpoint}'] += 1
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep the connections of the sessions alive, without delaying
+            # the small answers
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _answer(self, method: str) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                if self.path == STATS_PATH:
+                    with fake._lock:
+                        status, content = HTTPStatus.OK, dict(fake._requests)
+                else:
+                    if fake._latency:
+                        time.sleep(fake._latency)
+                    status, content = fake.handle(method, self.path, body)
+                data = json.dumps(content).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                self._answer('GET')
+
+            def do_POST(self) -> None:
+                self._answer('POST')
+
+            def do_PUT(self) -> None:
+                self._answer('PUT')
+
+            def do_DELETE(self) -> None:
+                self._answer('DELETE')
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> None:
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class FakePortal(_FakeServer):
+    # Answers the Elasticsearch queries of airedgio.queries.Queries: the
+    # "_id" terms and the "properties.<date>" ranges of their filters
+    _assets: list[dict]
+    _by_id: dict[str, dict]
+
+    def __init__(self, assets: list[dict], latency: float = 0.0) -> None:
+        super().__init__(latency)
+        self._assets = assets
+        self._by_id = {asset['_id']: asset for asset in assets}
+
+    def _matches(self, asset: dict, condition: dict) -> bool:
+        match condition:
+            case {'term': {'_id': asset_id}}:
+                return asset['_id'] == asset_id
+            case {'term': {'_index': index}}:
+                return asset['_index'] == index
+            case {'range': ranges}:
+                for field, bounds in ranges.items():
+                    value = asset['_source']
+                    for key in field.split('.'):
+                        value = value[key]
+                    date = datetime.strptime(value, _timestamp_format)
+                    if 'gt' in bounds and not date > datetime.strptime(bounds['gt'], _timestamp_format):
+                        return False
+                    if 'lte' in bounds and not date <= datetime.strptime(bounds['lte'], _timestamp_format):
+                        return False
+                return True
+        return True
+
+    def handle(self, method: str, path: str, body: dict | None) -> tuple[int, object]:
+        filters = (
+            (body or {})
+            .get('query', {})
+            .get('query', {})
+            .get('bool', {})
+            .get('filter', [])
+        )
+        asset_ids = [f['term']['_id'] for f in filters if '_id' in f.get('term', {})]
+        self._count(method, 'by_id' if asset_ids else 'search')
+        # The queries by id do not scan all the assets
+        candidates = (
+            [self._by_id[asset_ids[0]]] if asset_ids[0] in self._by_id else []
+        ) if asset_ids else self._assets
+        data = [
+            asset
+            for asset in candidates
+            if all(self._matches(asset, condition) for condition in filters)
+        ]
+        return HTTPStatus.OK, {'success': True, 'data': data}
+
+
+class FakeAIoD(_FakeServer):
+    # Stores the assets POSTed to "/<endpoint>/v1", unique by platform and
+    # platform resource identifier like in AIoD. A share "conflict_rate" of
+    # the new assets are answered as already uploaded by an earlier run, and a
+    # share "error_rate" of the requests on assets fail with a server error.
+    # The assets of a platform are listed by page on
+    # GET /platforms/<platform>/<endpoint>/v1?offset=<offset>&limit=<limit>
+    _conflict_rate: float
+    _error_rate: float
+    _random: random.Random
+    _assets: dict[str, dict[int, dict]]
+    _platform_identifiers: dict[tuple[str, str, str], int]
+    _next_identifier: int
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        conflict_rate: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ) -> None:
+        super().__init__(latency)
+        if not 0 <= conflict_rate <= 1:
+            raise ValueError('The conflict rate has to be between 0 and 1')
+        if not 0 <= error_rate <= 1:
+            raise ValueError('The error rate has to be between 0 and 1')
+        self._conflict_rate = conflict_rate
+        self._error_rate = error_rate
+        self._random = random.Random(seed)
+        self._assets = dict()
+        self._platform_identifiers = dict()
+        self._next_identifier = 1
+
+    def _draw(self, rate: float) -> bool:
+        with self._lock:
+            return self._random.random() < rate
+
+    def _store(self, endpoint: str, asset: dict) -> int:
+        with self._lock:
+            identifier = self._next_identifier
+            self._next_identifier += 1
+            self._assets.setdefault(endpoint, dict())[identifier] = dict(asset, identifier=identifier)
+            key = (endpoint, asset.get('platform', ''), asset.get('platform_resource_identifier', ''))
+            self._platform_identifiers[key] = identifier
+        return identifier
+
+    def _list(self, platform: str, endpoint: str, query: str) -> list[dict]:
+        # A page of the assets of the platform, in the order they were stored
+        parameters = parse_qs(query)
+        offset = int(parameters.get('offset', ['0'])[0])
+        limit = int(parameters.get('limit', ['100'])[0])
+        with self._lock:
+            owned = [
+                asset
+                for asset in self._assets.get(endpoint, dict()).values()
+                if asset.get('platform') == platform
+            ]
+        return owned[offset:offset + limit]
+
+    def handle(self, method: str, path: str, body: dict | None) -> tuple[int, object]:
+        url = urlsplit(path)
+        parts = url.path.strip('/').split('/')
+        match parts:
+            case ['authorization_test']:
+                self._count(method, 'authorization_test')
+                return HTTPStatus.OK, {'name': 'benchmark'}
+            case ['platforms', platform, endpoint, 'v1']:
+                self._count(method, f'platforms/{endpoint}/list')
+                return HTTPStatus.OK, self._list(platform, endpoint, url.query)
+            case ['platforms', platform, endpoint, 'v1', platform_resource_identifier]:
+                self._count(method, f'platforms/{endpoint}')
+                identifier = self._platform_identifiers.get((endpoint, platform, platform_resource_identifier))
+                if identifier is None:
+                    return HTTPStatus.NOT_FOUND, {'detail': 'Not found'}
+                return HTTPStatus.OK, self._assets[endpoint][identifier]
+            case [endpoint, 'v1', *rest]:
+                self._count(method, endpoint)
+                identifier = int(rest[0]) if rest and rest[0] else None
+            case _:
+                return HTTPStatus.NOT_FOUND, {'detail': 'Not found'}
+
+        if endpoint != 'platforms' and self._draw(self._error_rate):
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'detail': 'Injected server error'}
+
+        stored = self._assets.get(endpoint, dict())
+        match method, identifier:
+            case 'POST', None:
+                key = (endpoint, body.get('platform', ''), body.get('platform_resource_identifier', ''))
+                existing = self._platform_identifiers.get(key)
+                if existing is None and endpoint != 'platforms' and self._draw(self._conflict_rate):
+                    existing = self._store(endpoint, body)
+                if existing is not None:
+                    return HTTPStatus.CONFLICT, {
+                        'detail': f'There already exists a {endpoint} with the same platform and '
+                                  f'platform_resource_identifier, with identifier={existing}.'
+                    }
+                return HTTPStatus.OK, {'identifier': self._store(endpoint, body)}
+            case 'GET', None:
+                return HTTPStatus.OK, {endpoint: len(stored)}
+            case _, _ if identifier not in stored:
+                return HTTPStatus.NOT_FOUND, {'detail': 'Not found'}
+            case 'GET', _:
+                return HTTPStatus.OK, stored[identifier]
+            case 'PUT', _:
+                with self._lock:
+                    stored[identifier] = dict(body, identifier=identifier)
+                return HTTPStatus.OK, {'identifier': identifier}
+            case 'DELETE', _:
+                with self._lock:
+                    asset = stored.pop(identifier)
+                    key = (endpoint, asset.get('platform', ''), asset.get('platform_resource_identifier', ''))
+                    if self._platform_identifiers.get(key) == identifier:
+                        del self._platform_identifiers[key]
+                return HTTPStatus.OK, {}
+        return HTTPStatus.METHOD_NOT_ALLOWED, {'detail': 'Method not allowed'}
+
+
+def serve(settings: dict, connection: Connection) -> None:
+    # Run the two stand-ins in a process of their own, so that they take
+    # neither the time nor the memory measured in the bridge process: their
+    # URLs are sent through the connection, which is then waited on to stop
+    portal = FakePortal(
+        synthetic_assets(**settings['assets']),
+        latency=settings['portal_latency']
+    )
+    aiod = FakeAIoD(**settings['aiod'])
+    portal.start()
+    aiod.start()
+    connection.send((portal.url, aiod.url))
+    try:
+        connection.recv()
+    except EOFError:
+        pass
+    portal.stop()
+    aiod.stop()
@@ -0,0 +1,241 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import requests
+
+from aiod.aiod import AIoD
+from airedgio.airedgio import AIRedgio
+from benchmarks.fakes import STATS_PATH, serve
+from bridge.bridge import Bridge
+
+# Run from the "src" folder with: python -m benchmarks.load
+# Converts synthetic assets end to end, from a local stand-in of the portal to
+# a local stand-in of AIoD, and fails when a threshold is given and missed.
+
+CHECK_PUBLISH = '../check_publish'
+
+
+def init_argparse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--count',
+        action='store',
+        type=int,
+        default=1000,
+        help='The number of synthetic assets'
+    )
+    parser.add_argument(
+        '--contacts',
+        action='store',
+        type=int,
+        default=2,
+        help='The number of contacts of each asset'
+    )
+    parser.add_argument(
+        '--list_length',
+        action='store',
+        type=int,
+        default=3,
+        help='The number of entries of the other lists of each asset'
+    )
+    parser.add_argument(
+        '--contact_overlap',
+        action='store',
+        type=float,
+        default=0.5,
+        help='The share of the contacts shared with other assets'
+    )
+    parser.add_argument(
+        '--portal_latency',
+        action='store',
+        type=float,
+        default=0.0,
+        help='The seconds taken by the portal to answer'
+    )
+    parser.add_argument(
+        '--aiod_latency',
+        action='store',
+        type=float,
+        default=0.0,
+        help='The seconds taken by AIoD to answer'
+    )
+    parser.add_argument(
+        '--conflict_rate',
+        action='store',
+        type=float,
+        default=0.0,
+        help='The share of the new AIoD assets answered as already uploaded'
+    )
+    parser.add_argument(
+        '--error_rate',
+        action='store',
+        type=float,
+        default=0.0,
+        help='The share of the AIoD requests failing with a server error'
+    )
+    parser.add_argument(
+        '--aiod_cache',
+        action='store_true',
+        help='Cache the documents read from AIoD'
+    )
+    parser.add_argument(
+        '--reconcile',
+        action='store_true',
+        help='Reconcile AIoD with the portal after the conversion, which should find nothing to do'
+    )
+    parser.add_argument(
+        '--translation_processes',
+        action='store',
+        type=int,
+        default=0,
+        help='The number of processes of the translation pool'
+    )
+    parser.add_argument(
+        '--seed',
+        action='store',
+        type=int,
+        default=0,
+        help='The seed of the synthetic assets and of the injected failures'
+    )
+    parser.add_argument(
+        '--min_assets_per_second',
+        action='store',
+        type=float,
+        default=0.0,
+        help='Fail if fewer assets are converted per second'
+    )
+    parser.add_argument(
+        '--max_requests_per_asset',
+        action='store',
+        type=float,
+        default=0.0,
+        help='Fail if more AIoD requests are sent per asset'
+    )
+    parser.add_argument(
+        '--max_memory',
+        action='store',
+        type=float,
+        default=0.0,
+        help='Fail if the peak memory of the bridge exceeds these MiB'
+    )
+    parser.add_argument(
+        '--log_level',
+        action='store',
+        default='ERROR',
+        help='The logging level of the bridge'
+    )
+
+    return parser.parse_args()
+
+
+def peak_memory() -> float:
+    # Peak resident memory of this process in MiB, reported in KiB on Linux
+    # and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def stats(url: str) -> dict[str, int]:
+    return requests.get(f'{url}{STATS_PATH}').json()
+
+
+def main() -> None:
+    args = init_argparse()
+    logging.basicConfig(level=args.log_level.upper())
+
+    settings = {
+        'assets': {
+            'count': args.count,
+            'contacts': args.contacts,
+            'list_length': args.list_length,
+            'contact_overlap': args.contact_overlap,
+            'seed': args.seed
+        },
+        'portal_latency': args.portal_latency,
+        'aiod': {
+            'latency': args.aiod_latency,
+            'conflict_rate': args.conflict_rate,
+            'error_rate': args.error_rate,
+            'seed': args.seed
+        }
+    }
+    connection, child_connection = multiprocessing.Pipe()
+    fakes = multiprocessing.Process(target=serve, args=(settings, child_connection), daemon=True)
+    fakes.start()
+    portal_url, aiod_url = connection.recv()
+
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            aiod = AIoD(
+                aiod_url,
+                cache_filepath=os.path.join(folder, 'aiod_cache.json') if args.aiod_cache else ''
+            )
+            bridge = Bridge(f'{CHECK_PUBLISH}/configuration_folder', aiod)
+            airedgio = AIRedgio(
+                api_endpoint=f'{portal_url}/search',
+                bridge=bridge,
+                memory_filepath=f'sqlite:{os.path.join(folder, "memory.sqlite3")}',
+                translation_processes=args.translation_processes
+            )
+
+            start = time.perf_counter()
+            airedgio.convert_all()
+            elapsed = time.perf_counter() - start
+            converted = sum(1 for _ in airedgio.memory.success_created)
+
+            plan = None
+            if args.reconcile:
+                before = stats(aiod_url)
+                start = time.perf_counter()
+                plan = airedgio.reconcile()
+                reconciliation_elapsed = time.perf_counter() - start
+                reconciliation_requests = sum(stats(aiod_url).values()) - sum(before.values())
+            bridge.close()
+            aiod.save_cache()
+
+        portal_requests = stats(portal_url)
+        aiod_requests = stats(aiod_url)
+    finally:
+        connection.send(None)
+        fakes.join()
+
+    memory = peak_memory()
+    sent = sum(aiod_requests.values())
+    assets_per_second = args.count / elapsed
+    requests_per_asset = sent / max(args.count, 1)
+
+    print(f'{args.count} assets, {converted} converted in {elapsed:.3f} s')
+    print(f'{"assets/s":<30} {assets_per_second:10.1f}')
+    print(f'{"AIoD requests/asset":<30} {requests_per_asset:10.2f}')
+    print(f'{"portal queries/asset":<30} {sum(portal_requests.values()) / max(args.count, 1):10.2f}')
+    print(f'{"peak memory":<30} {memory:10.1f} MiB')
+    for name, count in sorted((portal_requests | aiod_requests).items()):
+        print(f'  {name:<28} {count:10d}')
+    if args.reconcile:
+        if plan is None:
+            print('Reconciliation failed')
+        else:
+            actions = ', '.join(f'{count} {action}' for action, count in plan.counts.items())
+            print(f'Reconciliation in {reconciliation_elapsed:.3f} s with {reconciliation_requests} AIoD requests: {actions}')
+
+    failures = list()
+    if args.min_assets_per_second and assets_per_second < args.min_assets_per_second:
+        failures.append(f'{assets_per_second:.1f} assets/s < {args.min_assets_per_second}')
+    if args.max_requests_per_asset and requests_per_asset > args.max_requests_per_asset:
+        failures.append(f'{requests_per_asset:.2f} requests/asset > {args.max_requests_per_asset}')
+    if args.max_memory and memory > args.max_memory:
+        failures.append(f'{memory:.1f} MiB > {args.max_memory} MiB')
+    if failures:
+        print(f'Regression: {", ".join(failures)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import tempfile
+import time
+
+from airedgio.memory_sqlite import MemorySQLite
+
+# Run from the "src" folder with: python -m benchmarks.memory_sqlite
+
+
+def init_argparse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--count',
+        action='store',
+        type=int,
+        default=1_000_000,
+        help='The number of asset ids to insert'
+    )
+    parser.add_argument(
+        '--synchronous',
+        action='store',
+        default='NORMAL',
+        help='The SQLite synchronous level to benchmark'
+    )
+    parser.add_argument(
+        '--chunk_size',
+        action='store',
+        type=int,
+        default=10000,
+        help='The number of ids loaded in the scratch table at a time'
+    )
+
+    return parser.parse_args()
+
+
+def timed(label: str, function, *args) -> None:
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<40} {elapsed:8.3f} s')
+
+
+def main() -> None:
+    args = init_argparse()
+
+    ids = [f'asset-{i:08d}' for i in range(args.count)]
+    half = ids[::2]
+
+    with tempfile.TemporaryDirectory() as folder:
+        memory = MemorySQLite(
+            f'sqlite:{os.path.join(folder, "memory.sqlite3")}',
+            synchronous=args.synchronous,
+            chunk_size=args.chunk_size
+        )
+
+        def insert() -> None:
+            memory.update_created([], ids)
+            memory.save()
+
+        def diff() -> None:
+            # Half of the failed ids succeed: removed from failed, added to created
+            memory.update_created(half, [])
+            memory.save()
+
+        def scan() -> None:
+            for _ in memory.failed_created:
+                pass
+
+        def remove() -> None:
+            memory.update_removed(half)
+            memory.save()
+
+        def watermark() -> None:
+            for _ in range(args.count):
+                memory.latest_created_date
+
+        print(f'{args.count} ids, synchronous={args.synchronous}')
+        timed('insert as failed', insert)
+        timed('diff half into created', diff)
+        timed('scan remaining failed', scan)
+        timed('remove created', remove)
+        timed(f'read watermark {args.count} times', watermark)
+
+
+if __name__ == '__main__':
+    main()
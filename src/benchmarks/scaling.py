@@ -0,0 +1,212 @@
+import argparse
+import gc
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from aiod.aiod import Result
+from benchmarks.fakes import synthetic_assets
+from bridge.bridge import Bridge
+
+# Run from the "src" folder with: python -m benchmarks.scaling
+# Sweeps the length of the lists of an asset and the nesting depth of its
+# translator through Bridge.translate, Bridge.upload and Bridge.merge, and
+# fails if the time of one of them grows faster than the expected power of
+# the size (1 for linear).
+
+CHECK_PUBLISH = '../check_publish'
+
+
+def init_argparse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--lengths',
+        action='store',
+        type=int,
+        nargs='+',
+        default=[500, 1000, 2000, 4000, 8000],
+        help='The number of contacts of the asset'
+    )
+    parser.add_argument(
+        '--depths',
+        action='store',
+        type=int,
+        nargs='+',
+        default=[25, 50, 100, 200, 400],
+        help='The nesting depth of the translator'
+    )
+    parser.add_argument(
+        '--repeat',
+        action='store',
+        type=int,
+        default=5,
+        help='The number of runs of each measure, the fastest is kept'
+    )
+    parser.add_argument(
+        '--max_exponent',
+        action='store',
+        type=float,
+        default=1.3,
+        help='Fail if a time grows faster than the size to this power'
+    )
+
+    return parser.parse_args()
+
+
+class StubAIoD:
+    # Answers the uploads of the bridge in memory, like AIoD without conflicts
+    _identifier: int = 0
+
+    def add_asset(self, asset_type: str, asset: dict) -> Result:
+        self._identifier += 1
+        return Result(True, {'identifier': self._identifier}, [])
+
+    def get_asset(self, asset_type: str, id: int) -> Result:
+        return Result(True, {'identifier': id}, [])
+
+    def update_asset(self, asset_type: str, asset: dict) -> Result:
+        return Result(True, {'identifier': asset['identifier']}, [])
+
+
+def nested_configuration(folder: str, depth: int) -> str:
+    # A copy of the check_publish configuration whose asset translator
+    # nests its contacts "depth" dictionaries deep
+    translator = {
+        'contact': '$listref/service_Contact/_source/contact',
+        'creator': ['$ref/service_Owner'],
+        'name': '$/_source/title'
+    }
+    for level in range(depth):
+        translator = {f'level{level}': translator}
+    translator['platform'] = 'ai_redgio'
+    translator['platform_resource_identifier'] = '$/_id'
+
+    configuration = os.path.join(folder, f'depth_{depth}')
+    os.makedirs(os.path.join(configuration, 'translators'))
+    for filename in ('platform.json', 'type_to_aiod_endpoint.json'):
+        with open(f'{CHECK_PUBLISH}/configuration_folder/{filename}', 'r') as fin:
+            content = fin.read()
+        with open(os.path.join(configuration, filename), 'w') as fout:
+            fout.write(content)
+    for translator_type in ('service_Contact', 'service_Owner'):
+        with open(f'{CHECK_PUBLISH}/configuration_folder/translators/{translator_type}.json', 'r') as fin:
+            content = fin.read()
+        with open(os.path.join(configuration, 'translators', f'{translator_type}.json'), 'w') as fout:
+            fout.write(content)
+    with open(os.path.join(configuration, 'translators', 'as_a_service.json'), 'w') as fout:
+        json.dump(translator, fout)
+    return configuration
+
+
+def nested(depth: int, leaf: dict) -> dict:
+    for level in range(depth):
+        leaf = {f'level{level}': leaf}
+    return leaf
+
+
+def fastest(function: Callable[[], Callable[[], object]], repeat: int) -> float:
+    # "function" prepares a run and returns it, only the run is timed. Like
+    # timeit, the garbage collector is off while timing: its passes depend on
+    # every object alive, not on the measured code
+    best = math.inf
+    for _ in range(repeat):
+        run = function()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best
+
+
+def measure(bridge: Bridge, asset: dict, new: dict, old: dict, repeat: int) -> dict[str, float]:
+    def translate() -> Callable[[], object]:
+        return lambda: bridge.translate(asset, 'as_a_service')
+
+    def upload() -> Callable[[], object]:
+        # A new translation every run, the uploads set the identifiers
+        created = bridge.translate(asset, 'as_a_service')
+        return lambda: bridge.upload(created['/as_a_service'])
+
+    def merge() -> Callable[[], object]:
+        return lambda: bridge.merge(new, old)
+
+    return {
+        'translate': fastest(translate, repeat),
+        'upload': fastest(upload, repeat),
+        'merge': fastest(merge, repeat)
+    }
+
+
+def exponent(sizes: list[int], times: list[float]) -> float:
+    # Slope of the least squares line of the times against the sizes on a
+    # log-log scale: the power of the size the time grows with
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(elapsed, 1e-9)) for elapsed in times]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    return (
+        sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+        / sum((x - x_mean) ** 2 for x in xs)
+    )
+
+
+def report(name: str, sizes: list[int], results: list[dict[str, float]], max_exponent: float) -> list[str]:
+    print(f'{name:<10}' + ''.join(f'{operation:>14}' for operation in results[0]))
+    for size, result in zip(sizes, results):
+        print(f'{size:<10}' + ''.join(f'{elapsed * 1000:12.3f}ms' for elapsed in result.values()))
+    failures = list()
+    exponents = list()
+    for operation in results[0]:
+        power = exponent(sizes, [result[operation] for result in results])
+        exponents.append(f'{power:14.2f}')
+        if power > max_exponent:
+            failures.append(f'{operation} by {name} grows as {name}^{power:.2f}')
+    print(f'{"exponent":<10}' + ''.join(exponents))
+    print()
+    return failures
+
+
+def main() -> None:
+    args = init_argparse()
+    if len(args.lengths) < 2 or len(args.depths) < 2:
+        raise ValueError('At least two sizes have to be measured')
+    # Deeper than the default recursion limit of the nested structures
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * max(args.depths)))
+
+    failures = list()
+
+    bridge = Bridge(f'{CHECK_PUBLISH}/configuration_folder', StubAIoD())
+    results = list()
+    for length in args.lengths:
+        asset = synthetic_assets(1, contacts=length, list_length=length, contact_overlap=0)[0]
+        new = {'contact': list(range(length)), 'keyword': [f'new{i}' for i in range(length)]}
+        old = {'contact': list(range(length, 2 * length)), 'keyword': [f'old{i}' for i in range(length)]}
+        results.append(measure(bridge, asset, new, old, args.repeat))
+    failures.extend(report('length', args.lengths, results, args.max_exponent))
+
+    asset = synthetic_assets(1, contacts=10, list_length=10, contact_overlap=0)[0]
+    results = list()
+    with tempfile.TemporaryDirectory() as folder:
+        for depth in args.depths:
+            bridge = Bridge(nested_configuration(folder, depth), StubAIoD())
+            new = nested(depth, {'contact': [1, 2], 'name': 'new'})
+            old = nested(depth, {'contact': [3, 4], 'description': 'old'})
+            results.append(measure(bridge, asset, new, old, args.repeat))
+    failures.extend(report('depth', args.depths, results, args.max_exponent))
+
+    if failures:
+        print(f'Not linear: {", ".join(failures)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
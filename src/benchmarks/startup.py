@@ -0,0 +1,103 @@
+import argparse
+import subprocess
+import sys
+
+# Run from the "src" folder with: python -m benchmarks.startup
+# Measures with "python -X importtime" how long importing an entry point
+# takes, and fails when it exceeds the budget or when it imports one of the
+# modules that have to stay lazy.
+
+# Slow to import and only needed by some runs
+LAZY_MODULES = [
+    'keycloak',
+    'jsonschema',
+    'concurrent.futures.process',
+    'pstats'
+]
+
+
+def init_argparse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--module',
+        action='store',
+        default='main',
+        help='The entry point to import'
+    )
+    parser.add_argument(
+        '--budget',
+        action='store',
+        type=float,
+        default=300,
+        help='The milliseconds the import may take'
+    )
+    parser.add_argument(
+        '--repeat',
+        action='store',
+        type=int,
+        default=5,
+        help='The number of imports measured, the median is kept'
+    )
+    parser.add_argument(
+        '--top',
+        action='store',
+        type=int,
+        default=10,
+        help='The number of slowest imported packages to report'
+    )
+
+    return parser.parse_args()
+
+
+def import_times(module: str) -> dict[str, int]:
+    # The cumulative microseconds of each module imported by a new interpreter
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    times = dict()
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.removeprefix('import time:').split('|')
+        # Nested imports are indented
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> None:
+    args = init_argparse()
+
+    runs = sorted(
+        (import_times(args.module) for _ in range(args.repeat)),
+        key=lambda run: run[args.module]
+    )
+    # The median run
+    imported = runs[len(runs) // 2]
+    elapsed = imported[args.module] / 1000
+
+    print(f'import {args.module}: {elapsed:.1f} ms (budget {args.budget:.0f} ms)')
+    top_level = sorted(
+        ((name, time) for name, time in imported.items() if '.' not in name),
+        key=lambda item: item[1],
+        reverse=True
+    )
+    for name, time in top_level[:args.top]:
+        print(f'  {name:<30} {time / 1000:8.1f} ms')
+
+    failures = list()
+    if elapsed > args.budget:
+        failures.append(f'{elapsed:.1f} ms > {args.budget:.0f} ms')
+    eager = [name for name in LAZY_MODULES if name in imported]
+    if eager:
+        failures.append(f'imported at startup: {", ".join(eager)}')
+    if failures:
+        print(f'Startup regression: {"; ".join(failures)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import gc
+import json
+import os
+import time
+
+from bridge.bridge import Bridge
+
+# Run from the "src" folder with: python -m benchmarks.translation
+
+CHECK_PUBLISH = '../check_publish'
+
+
+def init_argparse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--count',
+        action='store',
+        type=int,
+        default=10000,
+        help='The number of assets to translate'
+    )
+    parser.add_argument(
+        '--window',
+        action='store',
+        type=int,
+        default=1000,
+        help='The number of assets translated in each batch'
+    )
+    parser.add_argument(
+        '--processes',
+        action='store',
+        type=int,
+        default=os.cpu_count(),
+        help='The number of processes of the translation pool'
+    )
+
+    return parser.parse_args()
+
+
+def load_assets(count: int) -> list[dict]:
+    # Copies of the stored services with unique ids
+    with open(f'{CHECK_PUBLISH}/services.json', 'r') as fin:
+        services = json.load(fin)
+    assets = list()
+    for i in range(count):
+        asset = json.loads(json.dumps(services[i % len(services)]))
+        asset['_id'] = f'{asset["_id"]}-{i}'
+        assets.append(asset)
+    return assets
+
+
+def main() -> None:
+    args = init_argparse()
+
+    bridge = Bridge(f'{CHECK_PUBLISH}/configuration_folder', None)
+    assets = load_assets(args.count)
+    asset_types = ['as_a_service'] * len(assets)
+    # The loaded assets stay alive for the whole run, keep the garbage
+    # collector from scanning them over and over
+    gc.freeze()
+
+    start = time.perf_counter()
+    for asset, asset_type in zip(assets, asset_types):
+        bridge.translate(asset, asset_type)
+    elapsed = time.perf_counter() - start
+    print(f'{"sequential":<30} {args.count / elapsed:10.0f} assets/s')
+
+    start = time.perf_counter()
+    for window in range(0, len(assets), args.window):
+        bridge.translate_batch(
+            assets[window:window + args.window], 'as_a_service')
+    elapsed = time.perf_counter() - start
+    print(f'{f"batches of {args.window}":<30} {args.count / elapsed:10.0f} assets/s')
+
+    # The first call also starts the pool
+    bridge.translate_many(
+        assets[:args.processes],
+        asset_types[:args.processes],
+        processes=args.processes
+    )
+    start = time.perf_counter()
+    bridge.translate_many(assets, asset_types, processes=args.processes)
+    elapsed = time.perf_counter() - start
+    print(f'{f"{args.processes} processes":<30} {args.count / elapsed:10.0f} assets/s')
+    bridge.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import hashlib
 from itertools import islice
 import json
 import os
+from threading import Lock
+from typing import TYPE_CHECKING, Iterator
 from aiod.aiod import AIoD
+from bridge.entities import Entity, Reference, UploadState
+from bridge.path_index import PathIndex
 from bridge.platform import Platform
+from bridge.validation import Validator
+from telemetry.tracing import span
 from logging import getLogger
 
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
 logger = getLogger(__name__)
 
 
@@ -14,6 +26,16 @@ class Bridge:
     _timestamp_format = '%Y-%m-%dT%H:%M:%S.%fZ'
     _type_to_aiod_endpoint: dict
     _platform: Platform
+    _translators: dict[str, dict]
+    _paths: dict[str, tuple]
+    _plans: dict[str, list[tuple] | None]
+    _hashes: dict[str, str]
+    _validator: Validator
+    _pool: 'ProcessPoolExecutor | None' = None
+    # The entities shared by several assets of a batch are uploaded by one
+    # thread at a time, each entity guarding its upload with one of the locks
+    _upload_locks: list[Lock]
+    _upload_lock_count = 64
 
     def __init__(
         self,
@@ -34,6 +56,13 @@ class Bridge:
             platform = json.load(fin)
         self._platform = Platform(self._aiod, platform)
 
+        self._translators = dict()
+        self._paths = dict()
+        self._plans = dict()
+        self._hashes = dict()
+        self._validator = Validator(self._configuration_folder)
+        self._upload_locks = [Lock() for _ in range(self._upload_lock_count)]
+
     @property
     def platform(self) -> Platform:
         return self._platform
@@ -44,159 +73,343 @@ class Bridge:
     def check_platform(self) -> bool:
         return self.platform.check_platform()
 
-    def _translate(
-        self,
-        instance: dict,
-        created: dict,
-        translator: dict = {},
-        translator_type: str = '',
-        index: int | None = None
-    ) -> dict:
-
-        # Either use the provided translator JSON or open a translator file based on the type
-        if not translator:
+    def translator(self, translator_type: str) -> dict:
+        # Translator files are read once, the bridge must be rebuilt to read them again
+        if translator_type not in self._translators:
             filepath = f'{self._configuration_folder}/translators/{translator_type}.json'
             if not os.path.isfile(filepath):
                 logger.warning(
-                    'Translation file "%(translator_filepath)s" not found'
+                    'Translation file "%(translator_filepath)s" not found',
+                    {
+                        'translator_filepath': filepath
+                    }
                 )
                 return dict()
             with open(filepath, 'r') as fin:
-                translator = json.load(fin)
-
-        # 'translation' is the resulting AIoD JSON asset
-        translation: dict[str, int | str | dict | list] = {}
-        # 'translation['.reference']' holds the keys to other assets that need to be referenced inside 'translation'
-        translation['.reference'] = dict()
+                self._translators[translator_type] = json.load(fin)
+        return self._translators[translator_type]
+
+    def preload_translators(self) -> None:
+        translators_folder = f'{self._configuration_folder}/translators'
+        for filename in os.listdir(translators_folder):
+            if filename.endswith('.json'):
+                self.translator(filename.removesuffix('.json'))
+
+    def _parse_path(self, value: str) -> tuple[tuple[str, ...], str | list[str]]:
+        # Split a "$/path/to/key$append" value in the path keys and the
+        # appended part, each value is only parsed once
+        if value not in self._paths:
+            # TODO: instead of just path + append, allow something like {path + append} * n
+            splits = value.split('$', 2)
+            path = splits[1]
+            append = splits[2:] if len(splits) > 2 else ''
+            self._paths[value] = (tuple(islice(path.split('/'), 1, None)), append)
+        return self._paths[value]
+
+    def _parse_listref(self, value: str) -> tuple[str, tuple[str, ...]]:
+        # Split a "$listref/type/path/to/list" value in the type and the path keys
+        if value not in self._paths:
+            splits = value.split('/')
+            self._paths[value] = (splits[1], tuple(islice(splits, 2, None)))
+        return self._paths[value]
+
+    def _compile(self, translator: dict) -> list[tuple]:
+        # Turn a translator in a plan: a list of steps (kind, key, arguments),
+        # so that the kind of each value is only worked out once
+        plan = list()
         for key, value in translator.items():
             match value:
                 case int():
-                    translation[key] = value
+                    plan.append(('value', key, value))
                 case str() if not value.startswith('$'):
-                    translation[key] = value
+                    plan.append(('value', key, value))
                 case str() if value.startswith('$/'):
                     # The value represents a path in the AI REDGIO JSON to the wanted value
-                    # TODO: instead of just path + append, allow something like {path + append} * n
-                    splits = value.split('$', 2)
-                    path = splits[1]
-                    append = splits[2:] if len(splits) > 2 else ''
-                    current_value = instance
-                    # Follow the path
-                    for k in islice(path.split('/'), 1, None):
-                        if isinstance(current_value, dict):
-                            if k in current_value:
-                                current_value = current_value[k]
-                            else:
-                                break
-                        elif isinstance(current_value, list):
-                            if k.isdigit() and len(current_value) > int(k):
-                                current_value = current_value[int(k)]
-                            elif k == 'i' and index != None and len(current_value) > index:
-                                current_value = current_value[index]
-                            else:
-                                break
-                        else:
-                            break
-                    else:
-                        # Only use 'current_value' if the for-loop executed till the end (meaning the path was found)
-                        if isinstance(current_value, str):
-                            # Can only append to str
-                            translation[key] = f'{current_value}{append}'
-                        else:
-                            translation[key] = current_value
+                    path, append = self._parse_path(value)
+                    plan.append(('path', key, path, append))
                 case str() if value.startswith('$ref'):
-                    # The value represents a different object that must be created and this 'translation' will only hold a reference identifier to it, not the object itself
-                    if index != None:
-                        value = f'{value}/{index}'
-                    if value in created:
-                        # If it's already been created, reference that one
-                        translation['.reference'][key] = value
-                    else:
-                        # Recursively create the referenced object
-                        created[value] = None
-                        res = self._translate(
-                            instance,
-                            created,
-                            translator_type=value.split('/')[1],
-                            index=index
-                        )
-                        created[value] = res
-                        translation['.reference'][key] = value
+                    # The value represents a different object that must be created and the translation will only hold a reference identifier to it, not the object itself
+                    plan.append(('ref', key, value, value.split('/')[1]))
                 case str() if value.startswith('$listref'):
                     # Replace the list with a list of referenced objects
-                    splits = value.split('/')
-                    t = splits[1]
-                    current_value = instance
-                    for k in islice(splits, 2, None):
-                        if isinstance(current_value, dict) and k in current_value:
-                            current_value = current_value[k]
-                        elif isinstance(current_value, list):
-                            if k.isdigit() and len(current_value) > int(k):
-                                current_value = current_value[int(k)]
-                            else:
-                                break
-                        else:
-                            break
+                    translator_type, path = self._parse_listref(value)
+                    plan.append(('listref', key, translator_type, path))
+                case dict():
+                    plan.append(('dict', key, self._compile(value)))
+                case list():
+                    subplan = self._compile(
+                        {k: v for k, v in enumerate(value)})
+                    if all(step[0] == 'path' for step in subplan):
+                        # Only the lists found following the paths are kept,
+                        # they can be joined without translating each element
+                        plan.append(
+                            ('paths', key, [step[2] for step in subplan]))
                     else:
-                        translation[key] = list()
+                        plan.append(('list', key, subplan))
+        return plan
+
+    def _plan(self, translator_type: str) -> list[tuple] | None:
+        if translator_type not in self._plans:
+            translator = self.translator(translator_type)
+            self._plans[translator_type] = (
+                self._compile(translator) if translator else None
+            )
+        return self._plans[translator_type]
 
+    def _referenced_types(self, translator: dict | list, types: set[str]) -> set[str]:
+        # Collect the types of the translators referenced, directly or not, by a translator
+        values = translator.values() if isinstance(translator, dict) else translator
+        for value in values:
+            match value:
+                case str() if value.startswith('$ref') or value.startswith('$listref'):
+                    translator_type = value.split('/')[1]
+                    if translator_type not in types:
+                        types.add(translator_type)
+                        self._referenced_types(
+                            self.translator(translator_type), types)
+                case dict() | list():
+                    self._referenced_types(value, types)
+        return types
+
+    def asset_types(self) -> set[str]:
+        # The types of the portal assets: the translators no other one references
+        self.preload_translators()
+        referenced = set()
+        for translator in list(self._translators.values()):
+            self._referenced_types(translator, referenced)
+        return set(self._translators) - referenced
+
+    def translators_hash(self, translator_type: str) -> str:
+        # Hash of all the translators used for an asset of the type, it
+        # changes as soon as one of them changes
+        if translator_type not in self._hashes:
+            types = self._referenced_types(
+                self.translator(translator_type), {translator_type})
+            translators = {t: self.translator(t) for t in sorted(types)}
+            self._hashes[translator_type] = hashlib.sha256(
+                json.dumps(translators, sort_keys=True).encode()
+            ).hexdigest()
+        return self._hashes[translator_type]
+
+    def _assemble(
+        self,
+        plan: list[tuple],
+        batch: list[tuple[int, int | None]],
+        path_index: PathIndex,
+        createds: list[dict[str, Entity]],
+        prefix: tuple[str | int, ...] = ()
+    ) -> list[tuple[dict, list[Reference]]]:
+        # Apply each step of the plan to the whole batch. The batch holds the
+        # row of the asset in the path index and the index used by "i" keys,
+        # referenced entities are added to the bundle ('created') of their row.
+        # Return, for each element of the batch, the resulting AIoD JSON and
+        # the references to other entities to be resolved inside it: their
+        # paths start with "prefix", the keys of the dicts holding the JSON,
+        # so that they are built once whatever the nesting depth
+        bodies = [dict() for _ in batch]
+        references = [list() for _ in batch]
+        for step in plan:
+            match step:
+                case ('value', key, value):
+                    for body in bodies:
+                        body[key] = value
+                case ('path', key, path, append):
+                    if 'i' in path:
+                        values = [
+                            path_index.get(path, row, index)
+                            for row, index in batch
+                        ]
+                    else:
+                        column = path_index.column(path)
+                        values = [column[row] for row, _ in batch]
+                    for body, (found, value) in zip(bodies, values):
+                        if not found:
+                            continue
+                        if isinstance(value, str):
+                            # Can only append to str
+                            body[key] = f'{value}{append}'
+                        else:
+                            body[key] = value
+                case ('ref', key, value, translator_type):
+                    pending = list()
+                    for refs, (row, index) in zip(references, batch):
+                        reference = value if index == None else f'{value}/{index}'
+                        target = createds[row].get(reference)
+                        if target is None:
+                            # Reserve the key, the entity is translated below for the whole batch
+                            target = Entity(translator_type)
+                            createds[row][reference] = target
+                            pending.append((row, index, target))
+                        refs.append(Reference((*prefix, key), target))
+                    self._assemble_references(
+                        translator_type, pending, path_index, createds)
+                case ('listref', key, translator_type, path):
+                    pending = list()
+                    for body, refs, (row, _) in zip(bodies, references, batch):
+                        found, value = path_index.get(path, row)
+                        if not found:
+                            continue
+                        body[key] = list()
                         # For each element in the list, apply the same behaviour as with the values starting with '$ref'
                         # Pass 'i' as the index
-                        for i in range(len(current_value)):
-                            value = f'$ref/{splits[1]}/{i}'
-                            if value in created:
-                                translation['.reference'][key] = value
+                        for i in range(len(value)):
+                            reference = f'$ref/{translator_type}/{i}'
+                            target = createds[row].get(reference)
+                            if target is not None:
+                                refs.append(Reference((*prefix, key), target))
                             else:
-                                created[value] = None
-                                res = self._translate(
-                                    instance,
-                                    created,
-                                    translator_type=t,
-                                    index=i
-                                )
-                                created[value] = res
-                                translation['.reference'][f'{key}/{i}'] = value
-                case dict():
+                                target = Entity(translator_type)
+                                createds[row][reference] = target
+                                refs.append(Reference((*prefix, key, i), target))
+                                pending.append((row, i, target))
+                    self._assemble_references(
+                        translator_type, pending, path_index, createds)
+                case ('dict', key, subplan):
                     # Recursively translate each dictionary
-                    res = self._translate(instance, created, value)
-                    translation[key] = res
-                    # Merge the references in the inner dict with the ones of 'translation'
-                    refs = res.pop('.reference', {})
-                    for k, v in refs.items():
-                        translation['.reference'][f'{key}/{k}'] = v
-                case list():
-                    res = self._translate(
-                        instance,
-                        created,
-                        {k: v for k, v in enumerate(value)}
+                    results = self._assemble(
+                        subplan,
+                        [(row, None) for row, _ in batch],
+                        path_index,
+                        createds,
+                        (*prefix, key)
+                    )
+                    for body, refs, (res, res_refs) in zip(bodies, references, results):
+                        body[key] = res
+                        # Merge the references in the inner dict with the ones of the body
+                        refs.extend(res_refs)
+                case ('paths', key, paths):
+                    for body, (row, _) in zip(bodies, batch):
+                        values = [
+                            path_index.get(path, row)[1]
+                            for path in paths
+                        ]
+                        body[key] = [
+                            x for value in values
+                            if isinstance(value, list) for x in value
+                        ]
+                case ('list', key, subplan):
+                    results = self._assemble(
+                        subplan,
+                        [(row, None) for row, _ in batch],
+                        path_index,
+                        createds,
+                        (*prefix, key)
                     )
-                    refs = res.pop('.reference', {})
-                    res = [x for sublist in res.values() if isinstance(
-                        sublist, list) for x in sublist]
-                    for k, v in refs.items():
-                        translation['.reference'][f'{key}/{k}'] = v
-                    translation[key] = list(res)
+                    for body, refs, (res, res_refs) in zip(bodies, references, results):
+                        refs.extend(res_refs)
+                        body[key] = [x for sublist in res.values() if isinstance(
+                            sublist, list) for x in sublist]
+
+        return list(zip(bodies, references))
+
+    def _assemble_references(
+        self,
+        translator_type: str,
+        pending: list[tuple[int, int | None, Entity]],
+        path_index: PathIndex,
+        createds: list[dict[str, Entity]]
+    ) -> None:
+        # Translate the entities reserved by a step of the plan, an entity
+        # without translator is left empty
+        plan = self._plan(translator_type)
+        if not pending or plan is None:
+            return
+        results = self._assemble(
+            plan,
+            [(row, index) for row, index, _ in pending],
+            path_index,
+            createds
+        )
+        for (_, _, entity), (body, references) in zip(pending, results):
+            entity.body = body
+            entity.references = references
 
-        return translation
+    def translate_batch(
+        self,
+        instances: list[dict],
+        translator_type: str
+    ) -> list[dict[str, Entity]]:
+        # Translate assets sharing the same type: the translator plan is
+        # applied a step at a time to the whole batch, the paths are looked
+        # up in an index of the assets shared by all their translators.
+        # Return the bundle of entities created for each asset
+        plan = self._plan(translator_type)
+        if plan is None:
+            return [dict() for _ in instances]
+
+        path_index = PathIndex(instances)
+        createds: list[dict[str, Entity]] = [dict() for _ in instances]
+        results = self._assemble(
+            plan,
+            [(row, None) for row in range(len(instances))],
+            path_index,
+            createds
+        )
+
+        # Entities without references of their own that are equal in more
+        # assets are shared, so that they are uploaded once
+        shared: dict[str, Entity] = dict()
+        root = f'/{translator_type}'
+        for created, (body, references) in zip(createds, results):
+            replaced: dict[Entity, Entity] = dict()
+            for key, entity in created.items():
+                if entity.body and not entity.references:
+                    # Built by the same plan, equal entities have the same repr
+                    signature = repr((entity.type, entity.body))
+                    first = shared.setdefault(signature, entity)
+                    if first is not entity:
+                        created[key] = replaced[entity] = first
+            created[root] = Entity(translator_type, body, references)
+            if replaced:
+                for entity in created.values():
+                    for reference in entity.references:
+                        reference.target = replaced.get(
+                            reference.target, reference.target)
+        return createds
 
     def translate(
         self,
         instance: dict,
         translator_type: str,
-    ) -> dict:
-        created = dict()
-        translated = self._translate(
-            instance,
-            created,
-            translator_type=translator_type
+    ) -> dict[str, Entity]:
+        return self.translate_batch([instance], translator_type)[0]
+
+    def translate_many(
+        self,
+        assets: list[dict],
+        asset_types: list[str],
+        processes: int | None = None,
+        chunksize: int = 16
+    ) -> list[dict[str, Entity]]:
+        # Translation is pure CPU work, spread it over a pool of processes
+        # (kept for the following calls) and return the results in input order
+        if not self._pool:
+            # Imports multiprocessing, only needed by the pool
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_init_translation_worker,
+                initargs=(self._configuration_folder,)
+            )
+        return list(
+            self._pool.map(
+                _translate_in_worker,
+                assets,
+                asset_types,
+                chunksize=chunksize
+            )
         )
-        if not translated:
-            return dict()
-        created[f'/{translator_type}'] = translated
-        return created
+
+    def close(self) -> None:
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
 
     def merge(self, new: dict, old: dict) -> dict:
-        result = json.loads(json.dumps(new))
+        # Copied once, then merged in place level by level
+        return self._merge_into(json.loads(json.dumps(new)), old)
+
+    def _merge_into(self, result: dict, old: dict) -> dict:
         for key, value in old.items():
             if key not in result:
                 result[key] = value
@@ -207,14 +420,14 @@ class Bridge:
                             result[key].extend(value)
                     case dict():
                         if isinstance(result[key], dict):
-                            result[key] = self.merge(result[key], value)
+                            self._merge_into(result[key], value)
 
         return result
 
-    def post_and_put(self, entity_key: str, entity: dict) -> dict:
+    def post_and_put(self, entity: Entity) -> Entity:
 
         # Find the AIoD endpoint matching the AI REDGIO type
-        asset_type = entity_key.split('/')[1]
+        asset_type = entity.type
         aiod_type = self.aiod_endpoint_from_type(asset_type)
         if not aiod_type:
             logger.warning(
@@ -226,14 +439,16 @@ class Bridge:
             return entity
 
         # Upload to AIoD
-        success, content, reasons = self._aiod.add_asset(aiod_type, entity)
+        body = entity.body
+        success, content, reasons = self._aiod.add_asset(aiod_type, body)
         if success:
-            entity['identifier'] = content['identifier']
+            body['identifier'] = content['identifier']
+            entity.posted = True
         else:
             logger.info(
                 'Could not upload asset %(asset_id)s',
                 {
-                    'asset_id': entity['platform_resource_identifier']
+                    'asset_id': body['platform_resource_identifier']
                 }
             )
             try:
@@ -257,35 +472,36 @@ class Bridge:
                         logger.info(
                             'Asset %(asset_id)s already uploaded with identifier %(asset_identifier)d, trying to solve conflict...',
                             {
-                                'asset_id': entity['platform_resource_identifier'],
+                                'asset_id': body['platform_resource_identifier'],
                                 'asset_identifier': first_id
                             }
                         )
 
-                        # Retrieve the asset already on the AIoD platform
-                        success, asset, _ = self._aiod.get_asset(
-                            aiod_type, first_id)
-                        if success:
-                            # Merge the created asset with the one already on the platform and update it
-                            merged = self.merge(entity, asset)
-                            success, _, _ = self._aiod.update_asset(
-                                aiod_type, merged)
+                        with span('conflict', identifier=first_id):
+                            # Retrieve the asset already on the AIoD platform
+                            success, asset, _ = self._aiod.get_asset(
+                                aiod_type, first_id)
                             if success:
-                                entity['identifier'] = first_id
-                        else:
-                            logger.warning(
-                                'Could not PUT asset %(asset_id)s with identifier %(asset_identifier)d',
-                                {
-                                    'asset_id': entity['platform_resource_identifier'],
-                                    'asset_identifier': first_id
-                                }
-                            )
+                                # Merge the created asset with the one already on the platform and update it
+                                merged = self.merge(body, asset)
+                                success, _, _ = self._aiod.update_asset(
+                                    aiod_type, merged)
+                                if success:
+                                    body['identifier'] = first_id
+                            else:
+                                logger.warning(
+                                    'Could not PUT asset %(asset_id)s with identifier %(asset_identifier)d',
+                                    {
+                                        'asset_id': body['platform_resource_identifier'],
+                                        'asset_identifier': first_id
+                                    }
+                                )
                 else:
                     for d in reasons:
                         logger.info(
                             'Asset %(asset_id)s: %(upload_error)s',
                             {
-                                'asset_id': entity['platform_resource_identifier'],
+                                'asset_id': body['platform_resource_identifier'],
                                 'upload_error': d
                             }
                         )
@@ -294,64 +510,112 @@ class Bridge:
                 logger.warning(
                     'Error with asset %(asset_id)s: %(error_message)s',
                     {
-                        'asset_id': entity['platform_resource_identifier'],
+                        'asset_id': body['platform_resource_identifier'],
                         'error_message': repr(ex)
                     }
                 )
 
         return entity
 
-    def upload(self, created: dict, entity_key: str) -> dict:
-        if not '.visited' in created:
-            created['.visited'] = set()
-        if not '.failed' in created:
-            created['.failed'] = {}
-        created['.failed'][entity_key] = set()
-
-        current_entity = created[entity_key]
-
-        if entity_key in created['.visited']:
-            return current_entity
-        created['.visited'].add(entity_key)
+    def put(self, entity: Entity) -> Entity:
+        # Update an entity already on AIoD, its identifier set on its body:
+        # the fields of the AIoD document the translation does not set are
+        # kept, the others replaced. The identifier is removed if it fails.
+        aiod_type = self.aiod_endpoint_from_type(entity.type)
+        body = entity.body
+        success, document, reasons = self._aiod.get_asset(aiod_type, body['identifier'])
+        if success:
+            success, _, reasons = self._aiod.update_asset(aiod_type, {**document, **body})
+        if not success:
+            logger.info(
+                'Could not update asset %(asset_id)s with identifier %(asset_identifier)d: %(reasons)s',
+                {
+                    'asset_id': body.get('platform_resource_identifier'),
+                    'asset_identifier': body['identifier'],
+                    'reasons': reasons
+                }
+            )
+            del body['identifier']
+        return entity
 
-        # Before uploading the current asset, solve each of its references
-        if '.reference' in current_entity:
-            for location, subentity_key in list(current_entity['.reference'].items()):
-                if subentity_key in created['.visited']:
+    def upload(self, entity: Entity, state: UploadState | None = None) -> Entity:
+        if state is None:
+            state = UploadState()
+        if entity in state.visited:
+            return entity
+        state.visited.add(entity)
+
+        with span('upload', type=entity.type) as current:
+            # Before uploading the current entity, solve each of its references:
+            # the resolved ones are dropped, the others kept for a later upload
+            remaining = list()
+            for position, reference in enumerate(entity.references):
+                target = reference.target
+                if target in state.visited and target.identifier is None:
+                    # Still being uploaded higher in the recursion, or failed
+                    remaining.append(reference)
                     continue
-                self.upload(created, subentity_key)
-                if 'identifier' in created[subentity_key]:
-                    new = created[subentity_key]['identifier']
-                    current = current_entity
-                    for step in location.split('/'):
-                        match current:
-                            case dict():
-                                if step in current:
-                                    current = current[step]
-                                else:
-                                    current[step] = new
-                            case list():
-                                step = int(step)
-                                if len(current) >= step:
-                                    current.append(new)
-                                else:
-                                    current[step] = new
-                    else:
-                        current_entity['.reference'].pop(location, None)
-                else:
-                    created['.failed'][entity_key].add(location)
+                self.upload(target, state)
+                if target.identifier is None:
+                    state.failed[entity] = reference
+                    remaining.extend(entity.references[position:])
                     break
+                reference.resolve(entity.body, target.identifier)
+            entity.references = remaining
+
+            if entity not in state.failed and entity.identifier is None:
+                # Only upload the current entity if all its references are resolved,
+                # and if it was not uploaded already while sharing it with another
+                # asset, possibly by another thread meanwhile
+                with self._upload_locks[hash(entity) % self._upload_lock_count]:
+                    if entity.identifier is None:
+                        self.post_and_put(entity)
+            if current:
+                current.attributes['identifier'] = entity.identifier
+        return entity
 
-        if not created['.failed'][entity_key]:
-            # Only upload the current asset if all its references are resolved
-            created['.failed'].pop(entity_key, None)
-            self.post_and_put(entity_key, current_entity)
-        return current_entity
+    # Placeholder for the identifiers of the referenced entities, which are
+    # only known once uploaded
+    _placeholder_identifier = 1
 
-    def convert_asset(self, asset: dict, asset_type: str) -> bool:
+    def validate(
+        self,
+        asset: dict,
+        asset_type: str,
+        created: dict[str, Entity]
+    ) -> list[str]:
+        errors = [
+            f'{asset_type} {error}'
+            for error in self._validator.errors('airedgio', asset_type, asset)
+        ]
+        for key, entity in created.items():
+            endpoint = self.aiod_endpoint_from_type(entity.type)
+            if not self._validator.has_schema('aiod', endpoint):
+                continue
+            # Validate the body as it will be uploaded, references resolved
+            body = copy.deepcopy(entity.body)
+            for reference in entity.references:
+                reference.resolve(body, self._placeholder_identifier)
+            errors.extend(
+                f'{key} {error}'
+                for error in self._validator.errors('aiod', endpoint, body)
+            )
+        return errors
 
-        # Translate a JSON asset into AIoD format
-        created = self.translate(asset, translator_type=asset_type)
+    def convert_asset(
+        self,
+        asset: dict,
+        asset_type: str,
+        created: dict[str, Entity] | None = None,
+        identifier: int | None = None
+    ) -> bool:
+        # If given, "identifier" is the one of the asset already on AIoD,
+        # which is then updated in place instead of being posted again
+
+        # Translate a JSON asset into AIoD format, unless already translated
+        if created is None:
+            with span('translate', count=1):
+                created = self.translate(asset, translator_type=asset_type)
         if not created:
             logger.warning(
                 'Failed to translate asset %(asset_id)s',
@@ -368,11 +632,33 @@ class Bridge:
             }
         )
 
-        # TODO: Validate AIoD entity
+        # Validate the asset and everything created from it before any upload,
+        # so that an invalid asset costs no AIoD request
+        with span('validate'):
+            errors = self.validate(asset, asset_type, created)
+        if errors:
+            logger.warning(
+                'Asset %(asset_id)s is not valid: %(errors)s',
+                {
+                    'asset_id': asset['_id'],
+                    'errors': '; '.join(errors)
+                }
+            )
+            return False
 
         # Upload all the created AIoD assets
-        uploaded = self.upload(created, f'/{asset_type}')
-        if not 'identifier' in uploaded:
+        root = created[f'/{asset_type}']
+        if identifier is None:
+            uploaded = self.upload(root)
+        else:
+            # The references are uploaded first, the asset is then PUT as is
+            root.body['identifier'] = identifier
+            uploaded = self.upload(root)
+            if uploaded.references:
+                del uploaded.body['identifier']
+            else:
+                self.put(uploaded)
+        if uploaded.identifier is None:
             logger.warning(
                 'Failed to upload asset %(asset_id)s',
                 {
@@ -380,48 +666,161 @@ class Bridge:
                 }
             )
 
-            # TODO: Delete from AIoD all related entities if this failed (what if other assets reference one of these related?)
+            # The related entities already uploaded are left to the garbage
+            # collection, as other assets may reference them too
             return False
 
         logger.info(
             'Successfully uploaded asset %(asset_id)s with id %(asset_identifier)d',
             {
                 'asset_id': asset['_id'],
-                'asset_identifier': uploaded['identifier']
+                'asset_identifier': uploaded.identifier
             }
         )
 
         return True
 
-    def delete_asset(self, asset_id: str, asset_type: str) -> bool:
-        success, asset, reasons = self._aiod.get_asset_from_platform(
-            self.platform.name, asset_type, asset_id)
-        if not success:
-            logger.warn(
-                'Could not find asset %(asset_id)d by platform "%(platform_name)s on AIoD',
-                {
-                    'asset_id': asset_id,
-                    'platform_name': self.platform.name
-                }
-            )
-            for r in reasons:
-                logger.debug(r)
-            return False
-        identifier = asset['identifier']
-        success, _, reasons = self._aiod.delete_asset(identifier, asset_type)
+    def referenced_entities(
+        self,
+        created: dict[str, Entity],
+        asset_type: str,
+        posted_only: bool = False
+    ) -> set[tuple[str, int]]:
+        # The AIoD endpoints and identifiers of the uploaded entities created
+        # for an asset, except the asset itself; only the ones the bridge
+        # posted if "posted_only", the others may be referenced elsewhere
+        root = created.get(f'/{asset_type}')
+        return {
+            (self.aiod_endpoint_from_type(entity.type), entity.identifier)
+            for entity in created.values()
+            if entity is not root and entity.identifier is not None and (entity.posted or not posted_only)
+        }
+
+    def delete_entities(
+        self,
+        entities: list[tuple[str, int]],
+        concurrency: int = 4
+    ) -> list[tuple[str, int]]:
+        # Delete AIoD entities by endpoint and identifier with at most
+        # "concurrency" requests at a time, returning the deleted ones
+        def delete(entity: tuple[str, int]) -> bool:
+            endpoint, identifier = entity
+            success, _, reasons = self._aiod.delete_asset(identifier, endpoint)
+            if not success:
+                logger.debug(
+                    'Could not delete entity %(identifier)d from %(endpoint)s: %(reasons)s',
+                    {
+                        'identifier': identifier,
+                        'endpoint': endpoint,
+                        'reasons': reasons
+                    }
+                )
+            return success
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(delete, entities))
+        return [
+            entity
+            for entity, success in zip(entities, outcomes)
+            if success
+        ]
+
+    def find_asset(self, asset_id: str) -> tuple[str, int] | None:
+        # The type and identifier of an asset of the platform on AIoD,
+        # looked up in the endpoint of each asset type
+        for asset_type in sorted(self.asset_types()):
+            endpoint = self.aiod_endpoint_from_type(asset_type)
+            if not endpoint:
+                continue
+            success, asset, _ = self._aiod.get_asset_from_platform(
+                self.platform.name, endpoint, asset_id)
+            if success:
+                return asset_type, asset['identifier']
+        return None
+
+    def delete_asset(
+        self,
+        asset_id: str,
+        asset_type: str | None,
+        identifier: int | None = None
+    ) -> bool:
+        # Delete an asset from AIoD, looking up its identifier if not known,
+        # in every asset type endpoint if its type is not known either
+        if asset_type is None:
+            found = self.find_asset(asset_id)
+            if found is None:
+                logger.warning(
+                    'Could not find asset %(asset_id)s by platform "%(platform_name)s" on AIoD',
+                    {
+                        'asset_id': asset_id,
+                        'platform_name': self.platform.name
+                    }
+                )
+                return False
+            asset_type, identifier = found
+        endpoint = self.aiod_endpoint_from_type(asset_type)
+        if identifier is None:
+            success, asset, reasons = self._aiod.get_asset_from_platform(
+                self.platform.name, endpoint, asset_id)
+            if not success:
+                logger.warning(
+                    'Could not find asset %(asset_id)s by platform "%(platform_name)s" on AIoD',
+                    {
+                        'asset_id': asset_id,
+                        'platform_name': self.platform.name
+                    }
+                )
+                for r in reasons or []:
+                    logger.debug(r)
+                return False
+            identifier = asset['identifier']
+
+        success, _, reasons = self._aiod.delete_asset(identifier, endpoint)
         if not success:
-            logger.warn(
-                'Could not delete asset %(asset_id)d with identifier %(identifier) from AIoD',
+            logger.warning(
+                'Could not delete asset %(asset_id)s with identifier %(identifier)d from AIoD',
                 {
                     'asset_id': asset_id,
                     'identifier': identifier
                 }
             )
-            for r in reasons:
+            for r in reasons or []:
                 logger.debug(r)
 
         return success
 
+    def delete_assets(
+        self,
+        assets: dict[str, tuple[str | None, int | None]],
+        concurrency: int = 4
+    ) -> dict[str, bool]:
+        # Delete many assets from AIoD, given by id with their type and
+        # identifier if known, with at most "concurrency" assets at a time
+        def delete(item: tuple[str, tuple[str | None, int | None]]) -> bool:
+            asset_id, (asset_type, identifier) = item
+            return self.delete_asset(asset_id, asset_type, identifier)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(delete, assets.items()))
+        return dict(zip(assets, outcomes))
+
+    def platform_assets(self, asset_type: str, page_size: int = 100) -> Iterator[dict]:
+        # All the assets of the type owned by the platform on AIoD, listed a
+        # page at a time. Raises ConnectionError if a page cannot be listed.
+        endpoint = self.aiod_endpoint_from_type(asset_type)
+        offset = 0
+        while True:
+            success, page, reasons = self._aiod.list_assets_from_platform(
+                self.platform.name, endpoint, offset, page_size)
+            if not success:
+                raise ConnectionError(
+                    f'Could not list the {endpoint} of platform "{self.platform.name}" from offset {offset}: {reasons}'
+                )
+            yield from page
+            if len(page) < page_size:
+                break
+            offset += len(page)
+
     def check_aiod_login(self, access_token: str = '') -> bool:
         if not self._aiod.is_logged_in:
             logger.debug('User not logged in to AIoD, logging in...')
@@ -429,7 +828,29 @@ class Bridge:
                 logger.warn('Could not login')
                 return False
             if not self._aiod.is_logged_in:
-                logger.warn('Could not login')
-                return False
+                # The token kept from a previous login may have expired, request a new one
+                logger.debug('Login failed, retrying with a new token...')
+                self._aiod.clear_token()
+                if not self._aiod.login(access_token=access_token):
+                    logger.warn('Could not login')
+                    return False
+                if not self._aiod.is_logged_in:
+                    logger.warn('Could not login')
+                    return False
             logger.debug('Logged in to AIoD')
         return True
+
+
+# Bridge used by the processes of the translation pool, the translators are
+# loaded once when the process starts
+_worker_bridge: Bridge | None = None
+
+
+def _init_translation_worker(configuration_folder: str) -> None:
+    global _worker_bridge
+    _worker_bridge = Bridge(configuration_folder, None)
+    _worker_bridge.preload_translators()
+
+
+def _translate_in_worker(asset: dict, asset_type: str) -> dict[str, Entity]:
+    return _worker_bridge.translate(asset, asset_type)
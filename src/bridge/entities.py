@@ -0,0 +1,118 @@
+class Reference:
+    # A reference from a location of an entity to another entity: once the
+    # target is uploaded, its AIoD identifier is written at the location
+    __slots__ = ('path', 'target')
+
+    path: tuple[str | int, ...]
+    target: 'Entity'
+
+    def __init__(self, path: tuple[str | int, ...], target: 'Entity') -> None:
+        self.path = path
+        self.target = target
+
+    def resolve(self, body: dict, identifier: int) -> None:
+        current = body
+        for step in self.path:
+            match current:
+                case dict():
+                    if step in current:
+                        current = current[step]
+                    else:
+                        current[step] = identifier
+                case list():
+                    step = int(step)
+                    if len(current) >= step:
+                        current.append(identifier)
+                    else:
+                        current[step] = identifier
+
+
+class Entity:
+    # An AIoD asset created by the translation: its JSON body, its type (the
+    # translator used) and the references to the entities it needs the
+    # identifier of before its own upload. "posted" tells whether the bridge
+    # created it on AIoD, rather than finding it there already
+    __slots__ = ('type', 'body', 'references', 'posted')
+
+    type: str
+    body: dict
+    references: list[Reference]
+    posted: bool
+
+    def __init__(
+        self,
+        entity_type: str,
+        body: dict | None = None,
+        references: list[Reference] | None = None
+    ) -> None:
+        self.type = entity_type
+        self.body = body if body is not None else dict()
+        self.references = references if references is not None else list()
+        self.posted = False
+
+    @property
+    def identifier(self) -> int | None:
+        # Set on the body once uploaded to AIoD
+        return self.body.get('identifier')
+
+    def to_dict(self, keys: dict['Entity', str]) -> dict:
+        # The body with the ".reference" key from the locations to the keys of
+        # the referenced entities, as stored in the translation checks
+        return {
+            '.reference': {
+                '/'.join(map(str, reference.path)): keys.get(reference.target, '')
+                for reference in self.references
+            },
+            **self.body
+        }
+
+
+class UploadState:
+    # The entities of a bundle already handled by an upload, and the first
+    # reference that could not be resolved for the entities not uploaded
+    __slots__ = ('visited', 'failed')
+
+    visited: set[Entity]
+    failed: dict[Entity, Reference]
+
+    def __init__(self) -> None:
+        self.visited = set()
+        self.failed = dict()
+
+
+# A bundle holds the entities created by the translation of an asset, by key:
+# "/<type>" for the asset itself and "$ref/<type>[/<index>]" for the others
+
+def dump_bundle(created: dict[str, Entity]) -> dict:
+    # JSON-serializable form of a bundle, references point to bundle keys
+    keys = {entity: key for key, entity in created.items()}
+    return {
+        key: {
+            'type': entity.type,
+            'body': entity.body,
+            'references': [
+                [list(reference.path), keys[reference.target]]
+                for reference in entity.references
+            ]
+        }
+        for key, entity in created.items()
+    }
+
+
+def bundle_to_dicts(created: dict[str, Entity]) -> dict[str, dict]:
+    # The entities of a bundle as dicts, see Entity.to_dict
+    keys = {entity: key for key, entity in created.items()}
+    return {key: entity.to_dict(keys) for key, entity in created.items()}
+
+
+def load_bundle(data: dict) -> dict[str, Entity]:
+    created = {
+        key: Entity(value['type'], value['body'])
+        for key, value in data.items()
+    }
+    for key, value in data.items():
+        created[key].references = [
+            Reference(tuple(path), created[target])
+            for path, target in value['references']
+        ]
+    return created
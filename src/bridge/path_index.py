@@ -0,0 +1,69 @@
+def resolve(
+    value: object,
+    keys: tuple[str, ...],
+    index: int | None = None
+) -> tuple[bool, object]:
+    # Follow the path of keys from "value", "i" selects the element at
+    # "index" of a list: return whether the path was found and the value
+    for k in keys:
+        if isinstance(value, dict):
+            if k in value:
+                value = value[k]
+            else:
+                return False, None
+        elif isinstance(value, list):
+            if k.isdigit() and len(value) > int(k):
+                value = value[int(k)]
+            elif k == 'i' and index != None and len(value) > index:
+                value = value[index]
+            else:
+                return False, None
+        else:
+            return False, None
+    return True, value
+
+
+class PathIndex:
+    # Lazily built index of the values found following paths of keys in the
+    # assets of a batch, shared by every translator working on them. The
+    # values of a path are resolved for all the assets at once (a column)
+    # from the column of its parent path, so that each prefix is walked only
+    # once per asset. Paths with an "i" key are indexed per asset and element.
+    _columns: dict[tuple[str, ...], list[tuple[bool, object]]]
+    _elements: dict[tuple[tuple[str, ...], int, int | None], tuple[bool, object]]
+
+    def __init__(self, instances: list[dict]) -> None:
+        self._columns = {(): [(True, instance) for instance in instances]}
+        self._elements = dict()
+
+    def column(self, path: tuple[str, ...]) -> list[tuple[bool, object]]:
+        # The values of a path without "i" keys, one for each asset
+        column = self._columns.get(path)
+        if column is None:
+            key = path[-1]
+            column = [
+                (True, value[key])
+                if isinstance(value, dict) and key in value
+                else resolve(value, (key,)) if found else (False, None)
+                for found, value in self.column(path[:-1])
+            ]
+            self._columns[path] = column
+        return column
+
+    def get(
+        self,
+        path: tuple[str, ...],
+        row: int,
+        index: int | None = None
+    ) -> tuple[bool, object]:
+        # The value of a path for the asset at "row", "i" keys select the
+        # element at "index"
+        if 'i' not in path:
+            return self.column(path)[row]
+        key = (path, row, index)
+        result = self._elements.get(key)
+        if result is None:
+            found, value = self.get(path[:-1], row, index)
+            result = resolve(value, path[-1:], index) if found else (False, None)
+            self._elements[key] = result
+        return result
@@ -0,0 +1,69 @@
+from functools import cache
+import importlib.util
+import json
+import os
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+@cache
+def _jsonschema():
+    # Imported with the first schema, it is slow to import
+    try:
+        import jsonschema
+    except ImportError:
+        # Optional dependency: without it the assets are not validated
+        return None
+    return jsonschema
+
+
+class Validator:
+    # Validates JSON documents against the schemas found in the "schemas"
+    # folder of the configuration folder: "schemas/airedgio/<asset type>.json"
+    # for the AI REDGIO assets and "schemas/aiod/<AIoD endpoint>.json" for the
+    # AIoD ones. Each schema is read and compiled once, documents without a
+    # schema are always valid.
+    _schemas_folder: str
+    _validators: dict[tuple[str, str], object | None]
+
+    def __init__(self, configuration_folder: str) -> None:
+        self._schemas_folder = f'{configuration_folder}/schemas'
+        self._validators = dict()
+
+        if os.path.isdir(self._schemas_folder) and importlib.util.find_spec('jsonschema') is None:
+            logger.warning(
+                'The jsonschema package is not installed, the schemas in "%(schemas_folder)s" are ignored',
+                {
+                    'schemas_folder': self._schemas_folder
+                }
+            )
+
+    def _validator(self, kind: str, name: str) -> object | None:
+        key = (kind, name)
+        if key not in self._validators:
+            validator = None
+            filepath = f'{self._schemas_folder}/{kind}/{name}.json'
+            jsonschema = _jsonschema() if os.path.isfile(filepath) else None
+            if jsonschema is not None:
+                with open(filepath, 'r') as fin:
+                    schema = json.load(fin)
+                # An invalid schema is a configuration error, raise it right away
+                validator_class = jsonschema.validators.validator_for(schema)
+                validator_class.check_schema(schema)
+                validator = validator_class(schema)
+            self._validators[key] = validator
+        return self._validators[key]
+
+    def has_schema(self, kind: str, name: str) -> bool:
+        return self._validator(kind, name) is not None
+
+    def errors(self, kind: str, name: str, instance: dict) -> list[str]:
+        # The messages of the errors of the document, empty if it is valid
+        validator = self._validator(kind, name)
+        if validator is None:
+            return []
+        return [
+            f'{"/".join(map(str, error.absolute_path)) or "/"}: {error.message}'
+            for error in validator.iter_errors(instance)
+        ]
@@ -1,32 +1,17 @@
+from contextlib import nullcontext
 import json
 import logging
 from aiod.aiod import AIoD
 from airedgio.airedgio import AIRedgio
 from bridge.bridge import Bridge
-from datetime import datetime
+from bridge.entities import bundle_to_dicts
+from telemetry.logs import configure_logging
 import argparse
 
-# TODO: Improve logging level throughout all the files
-
 CONFIGS = './check_publish'
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s [%(name)s] [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler(
-            f"./memory/debug_{datetime.now():%Y_%m_%d_%H_%M_%S}.log"
-        ),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-logging.getLogger(__name__).setLevel(logging.DEBUG)
-logging.getLogger("requests").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-
 
 def init_argparse() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
@@ -69,11 +54,22 @@ def init_argparse() -> argparse.Namespace:
         required=True,
         help='The keycloak client ID of this bridge'
     )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile each phase of the checks, writing the reports in ./memory'
+    )
 
     return parser.parse_args()
 
 def main() -> None:
     args = init_argparse()
+    configure_logging(CONFIGS, 'check_publish')
+    profiler = None
+    if args.profile:
+        # Only imported when profiling
+        from telemetry.profiling import Profiler
+        profiler = Profiler('./memory')
 
     bridge_configuration_path = f'{CONFIGS}/configuration_folder'
     # memory_filepath = f'./memory/memory.json'
@@ -118,7 +114,8 @@ def main() -> None:
     airedgio = AIRedgio(
         api_endpoint=args.airedgio_endpoint,
         bridge=bridge,
-        memory_filepath=memory_filepath
+        memory_filepath=memory_filepath,
+        profiler=profiler
     )
     logger.info("Configured AI REDGIO")
 
@@ -146,10 +143,11 @@ def main() -> None:
     #     exit(1)
 
     # Check if the translation is correct by translating AI REDGIO assets and comparing the results with stored ones
-    for _id in services.keys():
-        services[_id]['translation'] = bridge.translate(
-            services[_id]['original_local'],
-            'as_a_service')['/as_a_service']
+    with profiler.phase('translation') if profiler else nullcontext():
+        for _id in services.keys():
+            services[_id]['translation'] = bundle_to_dicts(bridge.translate(
+                services[_id]['original_local'],
+                'as_a_service'))['/as_a_service']
 
     equals = map(lambda v: v['translation_check'] ==
                  v['translation'], services.values())
@@ -162,30 +160,30 @@ def main() -> None:
     # Convert each asset
     failed = list()
     success = list()
-    for asset in stored_services:
-        # TODO: Validate AIRedgio entity
-        logger.debug(
-            'Converting asset %(asset_id)s',
-            {
-                'asset_id': asset['_id']
-            }
-        )
-        asset_type = (
-            asset['_source']['aitype']
-            .lower()
-            .replace(' ', '_')
-        )
-        if not bridge.convert_asset(asset, asset_type):
-            failed.append(asset['_id'])
-            continue
-
-        success.append(asset['_id'])
-        logger.debug(
-            'Successfully converted asset %(asset_id)s',
-            {
-                'asset_id': asset['_id']
-            }
-        )
+    with profiler.phase('upload') if profiler else nullcontext():
+        for asset in stored_services:
+            logger.debug(
+                'Converting asset %(asset_id)s',
+                {
+                    'asset_id': asset['_id']
+                }
+            )
+            asset_type = (
+                asset['_source']['aitype']
+                .lower()
+                .replace(' ', '_')
+            )
+            if not bridge.convert_asset(asset, asset_type):
+                failed.append(asset['_id'])
+                continue
+
+            success.append(asset['_id'])
+            logger.debug(
+                'Successfully converted asset %(asset_id)s',
+                {
+                    'asset_id': asset['_id']
+                }
+            )
     if failed:
         logger.warning("Failed to upload some assets")
         for asset_id in failed:
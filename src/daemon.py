@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from aiod.aiod import AIoD
+from airedgio.airedgio import AIRedgio
+from airedgio.push import PushServer
+from bridge.bridge import Bridge
+from telemetry import tracing
+from telemetry.logs import configure_logging
+from telemetry.metrics import MetricsServer
+
+CONFIGS = './configurations'
+
+logger = logging.getLogger(__name__)
+
+
+class Daemon:
+    # Keeps the connectors (and their HTTP sessions) alive between syncs,
+    # rebuilding only the ones whose configuration changed on disk
+    _aiod_configuration_path: str
+    _airedgio_configuration_path: str
+    _bridge_configuration_path: str
+    _daemon_configuration_path: str
+    _memory_filepath: str
+
+    _interval: float = 300
+    _jitter: float = 60
+    _deletion_interval: float = 12 * 3600
+    _push_configuration: dict = {}
+    _metrics_configuration: dict = {}
+
+    _aiod: AIoD
+    _bridge: Bridge
+    _airedgio: AIRedgio
+    _push: PushServer | None = None
+    _metrics: MetricsServer | None = None
+    _platform_checked: bool
+    _outdated_checked: bool
+    _last_deletion_check: float
+    _modification_times: dict[str, dict[str, int]]
+    _stop: threading.Event
+
+    def __init__(self, configs: str, memory_filepath: str) -> None:
+        self._aiod_configuration_path = f'{configs}/aiod_configuration.json'
+        self._airedgio_configuration_path = f'{configs}/airedgio_configuration.json'
+        self._bridge_configuration_path = f'{configs}/configuration_folder'
+        self._daemon_configuration_path = f'{configs}/daemon_configuration.json'
+        self._memory_filepath = memory_filepath
+
+        self._platform_checked = False
+        self._outdated_checked = False
+        self._last_deletion_check = 0
+        self._modification_times = dict()
+        self._stop = threading.Event()
+
+        self._load_daemon()
+        self._load_aiod()
+        self._load_bridge()
+        self._load_airedgio()
+        self._changed()
+
+    def _load_daemon(self) -> None:
+        if not os.path.isfile(self._daemon_configuration_path):
+            return
+        with open(self._daemon_configuration_path, 'r') as fin:
+            daemon_configuration = json.load(fin)
+        self._interval = daemon_configuration.get('interval', self._interval)
+        self._jitter = daemon_configuration.get('jitter', self._jitter)
+        self._deletion_interval = daemon_configuration.get(
+            'deletion_interval', self._deletion_interval)
+        self._push_configuration = daemon_configuration.get('push', dict())
+        self._metrics_configuration = daemon_configuration.get('metrics', dict())
+        # Trace the conversion of each asset if asked to
+        if daemon_configuration.get('traces', False):
+            tracing.configure('./memory/traces.jsonl')
+        else:
+            tracing.disable()
+
+    def _load_aiod(self) -> None:
+        with open(self._aiod_configuration_path, 'r') as fin:
+            aiod_configuration = json.load(fin)
+        self._aiod = AIoD(**aiod_configuration)
+
+    def _load_bridge(self) -> None:
+        if hasattr(self, '_bridge'):
+            # Stop the translation processes holding the previous translators
+            self._bridge.close()
+        self._bridge = Bridge(self._bridge_configuration_path, self._aiod)
+        # The platform and the translators may have changed with the configuration
+        self._platform_checked = False
+        self._outdated_checked = False
+
+    def _load_airedgio(self) -> None:
+        with open(self._airedgio_configuration_path, 'r') as fin:
+            airedgio_configuration = json.load(fin)
+        self._airedgio = AIRedgio(
+            **airedgio_configuration,
+            bridge=self._bridge,
+            memory_filepath=self._memory_filepath
+        )
+
+    def _modification_times_of(self, path: str) -> dict[str, int]:
+        if os.path.isfile(path):
+            return {path: os.stat(path).st_mtime_ns}
+        times = dict()
+        for folder, _, filenames in os.walk(path):
+            for filename in filenames:
+                filepath = os.path.join(folder, filename)
+                times[filepath] = os.stat(filepath).st_mtime_ns
+        return times
+
+    def _changed(self) -> set[str]:
+        # Return the configurations whose files changed since the last call
+        changed = set()
+        for path in (
+            self._daemon_configuration_path,
+            self._aiod_configuration_path,
+            self._bridge_configuration_path,
+            self._airedgio_configuration_path
+        ):
+            times = self._modification_times_of(path)
+            if times != self._modification_times.get(path):
+                changed.add(path)
+                self._modification_times[path] = times
+        return changed
+
+    def reload(self) -> None:
+        changed = self._changed()
+        if not changed:
+            return
+
+        logger.info(
+            'Reloading the changed configurations: %(paths)s',
+            {
+                'paths': ', '.join(sorted(changed))
+            }
+        )
+        if self._daemon_configuration_path in changed:
+            self._load_daemon()
+        # The push workers convert with the connectors being replaced, they
+        # finish the queued notifications before the previous ones are closed
+        if self._push and changed - {self._daemon_configuration_path}:
+            self._push.drain()
+        try:
+            if self._aiod_configuration_path in changed:
+                self._load_aiod()
+                self._load_bridge()
+                self._airedgio.bridge = self._bridge
+            elif self._bridge_configuration_path in changed:
+                self._load_bridge()
+                self._airedgio.bridge = self._bridge
+            if self._airedgio_configuration_path in changed:
+                # A single connection to the memory once the new one is open
+                previous = self._airedgio
+                self._load_airedgio()
+                previous.close()
+                if self._push:
+                    self._push.airedgio = self._airedgio
+        finally:
+            if self._push:
+                self._push.resume()
+
+    def sync(self) -> None:
+        if not self._bridge.check_aiod_login():
+            return
+
+        if not self._platform_checked:
+            if not self._bridge.check_platform():
+                return
+            self._platform_checked = True
+
+        if not self._outdated_checked:
+            self._airedgio.enqueue_outdated()
+            self._outdated_checked = True
+
+        self._airedgio.convert_incremental()
+
+        # Checking for deleted assets queries every asset, do it less often
+        if time.monotonic() - self._last_deletion_check >= self._deletion_interval:
+            self._airedgio.check_deletion()
+            with self._airedgio.memory_lock:
+                self._airedgio.memory.save()
+            self._last_deletion_check = time.monotonic()
+
+    def stop(self, *_) -> None:
+        logger.info('Stopping after the current sync')
+        self._stop.set()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        # Notifications pushed by the portal are converted as they arrive,
+        # the periodic sync only catches what was missed
+        if self._push_configuration:
+            self._push = PushServer(self._airedgio, **self._push_configuration)
+            self._push.start()
+
+        # The metrics are served for as long as the daemon runs
+        if self._metrics_configuration:
+            self._metrics = MetricsServer(**self._metrics_configuration)
+            self._metrics.start()
+
+        while not self._stop.is_set():
+            try:
+                self.reload()
+                self.sync()
+            except Exception as ex:
+                # Keep the daemon alive, the next sync will retry
+                logger.exception(
+                    'Sync failed: %(error_message)s',
+                    {
+                        'error_message': repr(ex)
+                    }
+                )
+
+            delay = self._interval + random.uniform(0, self._jitter)
+            logger.debug(
+                'Next sync in %(delay).0f seconds',
+                {
+                    'delay': delay
+                }
+            )
+            self._stop.wait(delay)
+
+        if self._push:
+            self._push.stop()
+        if self._metrics:
+            self._metrics.stop()
+
+
+def main() -> None:
+    configure_logging(CONFIGS, 'daemon')
+
+    # memory_filepath = f'./memory/memory.json'
+    memory_filepath = f'sqlite:memory/memory.sqlite3'
+
+    daemon = Daemon(CONFIGS, memory_filepath)
+    daemon.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,105 @@
+import argparse
 import json
 import logging
 from aiod.aiod import AIoD
 from airedgio.airedgio import AIRedgio
 from bridge.bridge import Bridge
-from datetime import datetime
-
-# TODO: Improve logging level throughout all the files
+from telemetry import tracing
+from telemetry.logs import configure_logging
+from telemetry.metrics import REGISTRY
+from transport import session
 
 CONFIGS = './configurations'
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s [%(name)s] [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler(
-            f"./memory/debug_{datetime.now():%Y_%m_%d_%H_%M_%S}.log"
-        ),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-logging.getLogger(__name__).setLevel(logging.DEBUG)
-logging.getLogger("requests").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
+
+def replay_latency(value: str) -> float | None:
+    return None if value == 'recorded' else float(value)
+
+
+def init_argparse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile each phase of the run, writing the reports in ./memory'
+    )
+    parser.add_argument(
+        '--exit_if_idle',
+        action='store_true',
+        help='Exit without syncing when nothing was created, modified or failed since the last run; such runs skip the check for deleted assets, which needs a run without the option'
+    )
+    parser.add_argument(
+        '--reconcile',
+        action='store_true',
+        help='Diff all the portal assets against all the AIoD assets of the platform and apply the differences, instead of syncing'
+    )
+    parser.add_argument(
+        '--dry_run',
+        action='store_true',
+        help='With --reconcile, only log the differences found'
+    )
+    parser.add_argument(
+        '--reconcile_deletions',
+        action='store_true',
+        help='With --reconcile, also delete from AIoD the assets missing from the portal'
+    )
+    parser.add_argument(
+        '--trace',
+        action='store_true',
+        help='Trace the conversion of each asset, writing the spans in ./memory'
+    )
+    parser.add_argument(
+        '--memory',
+        action='store',
+        default='sqlite:memory/memory.sqlite3',
+        help='The connection string of the memory'
+    )
+    parser.add_argument(
+        '--record',
+        action='store',
+        default='',
+        help='Record the requests of the run to this cassette file'
+    )
+    parser.add_argument(
+        '--replay',
+        action='store',
+        default='',
+        help='Replay the requests recorded in this cassette file instead of using the network'
+    )
+    parser.add_argument(
+        '--replay_latency',
+        action='store',
+        type=replay_latency,
+        default=0.0,
+        help='The seconds each replayed response is delayed by, or "recorded" for the recorded durations'
+    )
+
+    return parser.parse_args()
 
 
 def main() -> None:
+    args = init_argparse()
+    configure_logging(CONFIGS, 'debug')
+
     aiod_configuration_path = f'{CONFIGS}/aiod_configuration.json'
     airedgio_configuration_path = f'{CONFIGS}/airedgio_configuration.json'
     bridge_configuration_path = f'{CONFIGS}/configuration_folder'
     # memory_filepath = f'./memory/memory.json'
-    memory_filepath = f'sqlite:memory/memory.sqlite3'
+    memory_filepath = args.memory
+
+    # Record or replay the requests of the connectors
+    session.configure(args.record, args.replay, args.replay_latency)
 
     # Configure the AIoD connector
     with open(aiod_configuration_path, 'r') as fin:
         aiod_configuration = json.load(fin)
     aiod = AIoD(**aiod_configuration)
+    if session.is_replaying():
+        # The recorded responses do not check the token, do not ask keycloak for one
+        aiod.access_token = 'replay'
 
     # Configure the bridge with the AIoD connector
     bridge = Bridge(bridge_configuration_path, aiod)
@@ -45,14 +107,35 @@ def main() -> None:
     # Configure the AI REDGIO connector
     with open(airedgio_configuration_path, 'r') as fin:
         airedgio_configuration = json.load(fin)
+    profiler = None
+    if args.profile:
+        # Only imported when profiling
+        from telemetry.profiling import Profiler
+        profiler = Profiler('./memory')
     airedgio = AIRedgio(
         **airedgio_configuration,
         bridge=bridge,
-        memory_filepath=memory_filepath
+        memory_filepath=memory_filepath,
+        profiler=profiler
     )
 
-    # Start converting all the assets
-    airedgio.convert_all()
+    # Skip the run, and the check for deleted assets, when the portal reports nothing new
+    if args.exit_if_idle and not airedgio.has_changes():
+        logger.info('Nothing to synchronize since the last run')
+        return
+
+    # Trace the conversion of each asset if asked to
+    if args.trace:
+        tracing.configure('./memory/traces.jsonl')
+
+    # Start converting all the assets, then export the metrics of the run
+    try:
+        if args.reconcile:
+            airedgio.reconcile(dry_run=args.dry_run, delete=args.reconcile_deletions)
+        else:
+            airedgio.convert_all()
+    finally:
+        REGISTRY.write('./memory/metrics.prom')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,142 @@
+import atexit
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import os
+from queue import SimpleQueue
+import zlib
+
+# The logging of the scripts, read from "logging_configuration.json" in the
+# configuration folder and overridden by the environment:
+#   level              BRIDGE_LOG_LEVEL              DEBUG
+#   format             BRIDGE_LOG_FORMAT             "text" or "json"
+#   file               BRIDGE_LOG_FILE               ./memory/<name>.log
+#   max_bytes          BRIDGE_LOG_MAX_BYTES          size of a file before rotating it
+#   backup_count       BRIDGE_LOG_BACKUP_COUNT       rotated files kept
+#   console            BRIDGE_LOG_CONSOLE            also log to the standard error
+#   debug_sample_rate  BRIDGE_LOG_DEBUG_SAMPLE_RATE  share of assets logging at debug level
+_defaults = {
+    'level': 'DEBUG',
+    'format': 'text',
+    'file': '',
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 10,
+    'console': True,
+    'debug_sample_rate': 1.0
+}
+
+_text_format = '%(asctime)s [%(name)s] [%(levelname)s] %(message)s'
+
+
+class JSONFormatter(logging.Formatter):
+    # One JSON object per line, with the named arguments of the message
+    # (e.g. the asset id) as fields of their own
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if isinstance(record.args, dict):
+            entry.update(
+                (key, value)
+                for key, value in record.args.items()
+                if key not in entry
+            )
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    # The queue stays in the process: the records are queued as they are, so
+    # that they are formatted by the listener thread and the JSON formatter
+    # still finds their arguments
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class AssetSampler(logging.Filter):
+    # Keeps the debug records about an asset only for a share of the assets,
+    # chosen by their id so that all the records of a kept asset are kept
+    _threshold: int
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        if not 0 <= rate <= 1:
+            raise ValueError('The debug sample rate has to be between 0 and 1')
+        self._threshold = int(rate * 0x100000000)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or not isinstance(record.args, dict):
+            return True
+        asset_id = record.args.get('asset_id')
+        if asset_id is None:
+            return True
+        return zlib.crc32(str(asset_id).encode()) < self._threshold
+
+
+def _settings(configs: str) -> dict:
+    settings = dict(_defaults)
+    filepath = f'{configs}/logging_configuration.json'
+    if configs and os.path.isfile(filepath):
+        with open(filepath, 'r') as fin:
+            settings.update(json.load(fin))
+    for key, default in _defaults.items():
+        value = os.environ.get(f'BRIDGE_LOG_{key.upper()}')
+        if value is None:
+            continue
+        match default:
+            case bool():
+                settings[key] = value.lower() in ('1', 'true', 'yes')
+            case int() | float():
+                settings[key] = type(default)(value)
+            case _:
+                settings[key] = value
+    return settings
+
+
+def configure_logging(configs: str = '', name: str = 'debug') -> QueueListener:
+    # The records are only queued by the logging threads, a listener thread
+    # formats and writes them; the listener is stopped, flushing the queue,
+    # when the process exits
+    settings = _settings(configs)
+
+    if settings['format'] == 'json':
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter(_text_format)
+
+    handlers = [
+        RotatingFileHandler(
+            settings['file'] or f'./memory/{name}.log',
+            maxBytes=settings['max_bytes'],
+            backupCount=settings['backup_count']
+        )
+    ]
+    if settings['console']:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue = SimpleQueue()
+    queue_handler = RecordQueueHandler(queue)
+    if settings['debug_sample_rate'] < 1:
+        # Dropped before being formatted
+        queue_handler.addFilter(AssetSampler(settings['debug_sample_rate']))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings['level'].upper())
+
+    logging.getLogger("requests").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,267 @@
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+import os
+from threading import Lock, Thread
+import time
+from typing import Iterator
+
+logger = getLogger(__name__)
+
+
+def _escape(value: str) -> str:
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    labels = [
+        f'{name}="{_escape(value)}"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class Metric:
+    # A metric holds one series per combination of the values of its labels
+    _type = ''
+
+    name: str
+    help: str
+    labelnames: tuple[str, ...]
+    _lock: Lock
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'The labels of metric "{self.name}" are {", ".join(self.labelnames)}'
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        return []
+
+    def render(self) -> str:
+        # The metric in the Prometheus text exposition format
+        return '\n'.join([
+            f'# HELP {self.name} {self.help}',
+            f'# TYPE {self.name} {self._type}',
+            *self._samples()
+        ])
+
+
+class Counter(Metric):
+    _type = 'counter'
+
+    _values: dict[tuple[str, ...], float]
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values = dict()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f'{self.name}{_labels(self.labelnames, key)} {value}'
+            for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    _type = 'histogram'
+
+    # Upper bounds in seconds, from a fast SQLite commit to a slow upload
+    _default_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    buckets: tuple[float, ...]
+    # The count of each bucket (not cumulative), then the sum and the count
+    _series: dict[tuple[str, ...], list]
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = ()
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets or self._default_buckets))
+        self._series = dict()
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][position] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[dict]:
+        # Observe the duration of the block; the labels can be changed from
+        # the block through the yielded dict, e.g. to add the outcome
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            series = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._series.items()
+            )
+        samples = list()
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                labels = _labels(self.labelnames, key, f'le="{bound}"')
+                samples.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _labels(self.labelnames, key, 'le="+Inf"')
+            samples.append(f'{self.name}_bucket{labels} {count}')
+            samples.append(f'{self.name}_sum{_labels(self.labelnames, key)} {total}')
+            samples.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return samples
+
+
+class Registry:
+    # The metrics of the process by name: asking again for a metric returns
+    # the existing one, so modules can declare the metrics they update
+    _metrics: dict[str, Metric]
+    _lock: Lock
+
+    def __init__(self) -> None:
+        self._metrics = dict()
+        self._lock = Lock()
+
+    def _get(self, metric_class: type, name: str, *args, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f'Metric "{name}" is already a {metric._type}')
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = ()
+    ) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        return ''.join(f'{metric.render()}\n' for _, metric in metrics)
+
+    def write(self, filepath: str) -> None:
+        # Replace the file at once, so that a collector never reads half of it
+        temporary = f'{filepath}.tmp'
+        with open(temporary, 'w') as fout:
+            fout.write(self.render())
+        os.replace(temporary, filepath)
+
+
+# The registry of the process, updated by all the modules
+REGISTRY = Registry()
+
+
+class MetricsServer:
+    # Serves the metrics of a registry in the Prometheus text format on
+    # GET /metrics, for the long-running processes
+    _registry: Registry
+    _host: str
+    _port: int
+    _server: ThreadingHTTPServer | None = None
+
+    def __init__(
+        self,
+        registry: Registry = REGISTRY,
+        host: str = '127.0.0.1',
+        port: int = 9108
+    ) -> None:
+        self._registry = registry
+        self._host = host
+        self._port = port
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        registry = self._registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path != '/metrics':
+                    self.send_error(HTTPStatus.NOT_FOUND)
+                    return
+                body = registry.render().encode()
+                self.send_response(HTTPStatus.OK)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                logger.debug(format, *args)
+
+        return Handler
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1] if self._server else self._port
+
+    def start(self) -> None:
+        self._server = ThreadingHTTPServer(
+            (self._host, self._port), self._handler())
+        thread = Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        logger.info(
+            'Serving metrics on %(host)s:%(port)d',
+            {
+                'host': self._host,
+                'port': self.port
+            }
+        )
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
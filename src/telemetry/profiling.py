@@ -0,0 +1,97 @@
+import cProfile
+from contextlib import contextmanager
+from datetime import datetime
+import io
+from logging import getLogger
+import pstats
+import sys
+import threading
+import tracemalloc
+from typing import Iterator
+
+logger = getLogger(__name__)
+
+
+class Profiler:
+    # Profiles the phases of a run one at a time: for each phase the CPU
+    # profile is written to "<prefix>_<phase>.prof" (for pstats or snakeviz)
+    # and the report of the slowest functions and of the largest allocations
+    # still alive at the end of the phase to "<prefix>_<phase>.txt". The
+    # threads started during the phase, such as the ones of the deletion and
+    # upload pools, are profiled too.
+    _prefix: str
+    _top: int
+
+    def __init__(self, folder: str = './memory', top: int = 25) -> None:
+        if top < 1:
+            raise ValueError('The number of reported entries has to be a positive number')
+        self._prefix = f'{folder}/profile_{datetime.now():%Y_%m_%d_%H_%M_%S}'
+        self._top = top
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        profile = cProfile.Profile()
+        thread_profiles = list()
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        if sys.version_info < (3, 12):
+            # Before Python 3.12 a profile only follows the thread enabling
+            # it: each new thread enables its own as soon as it starts
+            def profile_thread(frame, event, arg) -> None:
+                thread_profile = cProfile.Profile()
+                thread_profiles.append(thread_profile)
+                thread_profile.enable()
+            threading.setprofile(profile_thread)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            threading.setprofile(None)
+            statistics = pstats.Stats(profile)
+            for thread_profile in thread_profiles:
+                statistics.add(thread_profile)
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+            self._write(name, statistics, snapshot, current, peak)
+
+    def _write(
+        self,
+        name: str,
+        statistics: pstats.Stats,
+        snapshot: tracemalloc.Snapshot,
+        current: int,
+        peak: int
+    ) -> None:
+        filepath = f'{self._prefix}_{name}'
+        statistics.dump_stats(f'{filepath}.prof')
+
+        functions = io.StringIO()
+        statistics.stream = functions
+        statistics.sort_stats('cumulative').print_stats(self._top)
+        allocations = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        )).statistics('lineno')
+        with open(f'{filepath}.txt', 'w') as fout:
+            fout.write(f'Phase {name}\n')
+            fout.write(f'Memory traced at the end: {current / 1024:.1f} KiB, peak: {peak / 1024:.1f} KiB\n\n')
+            fout.write(f'Top {self._top} allocations alive at the end of the phase:\n')
+            for statistic in allocations[:self._top]:
+                fout.write(f'{statistic}\n')
+            fout.write(f'\nTop {self._top} functions by cumulative time:\n')
+            fout.write(functions.getvalue())
+
+        logger.info(
+            'Profile of phase %(phase)s written to %(filepath)s.prof and %(filepath)s.txt',
+            {
+                'phase': name,
+                'filepath': filepath
+            }
+        )
@@ -0,0 +1,119 @@
+import argparse
+from collections import defaultdict
+import glob
+import json
+import os
+
+# Prints the slowest assets of a run traced by telemetry.tracing and the
+# critical path of each: from the asset span, the longest child span at every
+# level (the children of a span run one after the other), which is the chain
+# of operations that made the asset slow.
+#   python -m telemetry.report [--run RUN] [--top N] [memory/traces.jsonl]
+
+
+def init_argparse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        'filepath',
+        nargs='?',
+        default='./memory/traces.jsonl',
+        help='The spans file, its rotated files are read too'
+    )
+    parser.add_argument(
+        '--run',
+        action='store',
+        default='',
+        help='The run to report, the latest one by default'
+    )
+    parser.add_argument(
+        '--top',
+        action='store',
+        type=int,
+        default=10,
+        help='The number of slowest assets to report'
+    )
+    parser.add_argument(
+        '--name',
+        action='store',
+        default='asset',
+        help='The name of the root spans to rank'
+    )
+
+    return parser.parse_args()
+
+
+def read_spans(filepath: str) -> list[dict]:
+    spans = list()
+    filepaths = [filepath] + glob.glob(f'{glob.escape(filepath)}.[0-9]*')
+    for path in filepaths:
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'r') as fin:
+            for line in fin:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line cut by a crash
+                    continue
+    return spans
+
+
+def latest_run(spans: list[dict]) -> str:
+    starts = dict()
+    for span in spans:
+        starts[span['run']] = max(starts.get(span['run'], 0), span['start'])
+    return max(starts, key=starts.get) if starts else ''
+
+
+def critical_path(root: dict, children: dict[str, list[dict]]) -> list[dict]:
+    path = [root]
+    while children.get(path[-1]['span']):
+        path.append(max(
+            children[path[-1]['span']],
+            key=lambda span: span['duration']
+        ))
+    return path
+
+
+def describe(span: dict) -> str:
+    attributes = ' '.join(
+        f'{key}={value}'
+        for key, value in span['attributes'].items()
+    )
+    return f'{span["name"]} {attributes}'.strip()
+
+
+def report(spans: list[dict], run: str, top: int, name: str) -> str:
+    spans = [span for span in spans if span['run'] == run]
+    children = defaultdict(list)
+    for span in spans:
+        if span['parent']:
+            children[span['parent']].append(span)
+    roots = sorted(
+        (span for span in spans if not span['parent'] and span['name'] == name),
+        key=lambda span: span['duration'],
+        reverse=True
+    )
+
+    lines = [f'Run {run}: {len(roots)} "{name}" spans, {len(spans)} spans in total']
+    for root in roots[:top]:
+        lines.append('')
+        lines.append(f'{root["duration"]:9.3f}s {describe(root)}')
+        for depth, span in enumerate(critical_path(root, children)[1:], 1):
+            lines.append(f'{span["duration"]:9.3f}s {"  " * depth}{describe(span)}')
+    return '\n'.join(lines)
+
+
+def main() -> None:
+    args = init_argparse()
+    spans = read_spans(args.filepath)
+    run = args.run or latest_run(spans)
+    if not run:
+        print(f'No spans found in "{args.filepath}"')
+        return
+    print(report(spans, run, args.top, args.name))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import atexit
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+from logging.handlers import QueueListener, RotatingFileHandler
+import os
+from queue import SimpleQueue
+import time
+from typing import Iterator
+from telemetry.logs import RecordQueueHandler
+
+# Spans are written as JSON lines by a logger of their own, which does not
+# propagate them to the handlers of the application logs
+_logger = logging.getLogger('telemetry.spans')
+_logger.propagate = False
+
+# The run the spans of this process belong to, empty while tracing is off
+_run: str = ''
+
+# The thread writing the queued spans, None while tracing is off
+_listener: QueueListener | None = None
+
+_current: ContextVar['Span | None'] = ContextVar('span', default=None)
+
+
+class Span:
+    # An operation of a trace: a trace is the tree of the spans started
+    # inside its root span, e.g. the conversion of an asset
+    __slots__ = ('trace', 'identifier', 'parent', 'name', 'attributes', 'start')
+
+    trace: str
+    identifier: str
+    parent: str
+    name: str
+    attributes: dict
+    start: float
+
+    def __init__(self, name: str, parent: 'Span | None', attributes: dict) -> None:
+        self.identifier = os.urandom(8).hex()
+        self.trace = parent.trace if parent else self.identifier
+        self.parent = parent.identifier if parent else ''
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+
+
+class _SpanFormatter(logging.Formatter):
+    # The span is serialized by the listener thread, not the traced one
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.args, default=str)
+
+
+def configure(
+    filepath: str,
+    run: str = '',
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5
+) -> None:
+    # Write the spans to "filepath", moved to "filepath.1" (and so on, up to
+    # "backup_count" files) once it reaches "max_bytes". The spans are only
+    # queued by the traced threads, a listener thread writes them.
+    global _run, _listener
+    disable()
+    handler = RotatingFileHandler(
+        filepath,
+        maxBytes=max_bytes,
+        backupCount=backup_count
+    )
+    handler.setFormatter(_SpanFormatter())
+    queue = SimpleQueue()
+    _logger.addHandler(RecordQueueHandler(queue))
+    _logger.setLevel(logging.INFO)
+    _listener = QueueListener(queue, handler)
+    _listener.start()
+    _run = run or f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}'
+
+
+@atexit.register
+def disable() -> None:
+    # Stop tracing, writing the spans still queued; tracing is off until
+    # configured again
+    global _run, _listener
+    _run = ''
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+    if _listener:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span | None]:
+    # Trace the block as a child of the current span, or as the root of a new
+    # trace; attributes can be added to the yielded span from the block
+    if not _run:
+        yield None
+        return
+    current = Span(name, _current.get(), attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as ex:
+        current.attributes['error'] = repr(ex)
+        raise
+    finally:
+        _current.reset(token)
+        _logger.info('span', {
+            'run': _run,
+            'trace': current.trace,
+            'span': current.identifier,
+            'parent': current.parent,
+            'name': current.name,
+            'start': current.start,
+            'duration': time.time() - current.start,
+            'attributes': current.attributes
+        })
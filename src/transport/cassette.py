@@ -0,0 +1,169 @@
+from collections import defaultdict, deque
+from datetime import timedelta
+import base64
+import gzip
+import hashlib
+import json
+from logging import getLogger
+import re
+from threading import Lock
+import time
+
+from requests import ConnectionError, PreparedRequest, Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = getLogger(__name__)
+
+# A cassette is a gzipped file of JSON lines, one per exchange: the request
+# (method, URL, a hash of its body and a hash of its body without the end of
+# its time window) and the response (status, headers, body and the seconds it
+# took), in the order they happened
+
+# Describe the transfer of the recorded body, not the body as replayed
+_dropped_headers = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+# The end of the time window of a portal query, the current time for the
+# last window, which differs from one run to the next
+_window_end = re.compile(rb'("lte": ?)"[^"]*"')
+
+
+def _key(method: str, url: str, body: bytes | str | None) -> tuple[str, str, str]:
+    if isinstance(body, str):
+        body = body.encode()
+    return method, url, hashlib.sha1(body or b'').hexdigest()
+
+
+def _window_key(method: str, url: str, body: bytes | str | None) -> tuple[str, str, str] | None:
+    # The key of a query on a time window whatever its end, None for the
+    # other requests
+    if isinstance(body, str):
+        body = body.encode()
+    if not body or not _window_end.search(body):
+        return None
+    return method, url, hashlib.sha1(_window_end.sub(rb'\1""', body)).hexdigest()
+
+
+def read_cassette(filepath: str) -> list[dict]:
+    entries = list()
+    try:
+        with gzip.open(filepath, 'rt') as fin:
+            for line in fin:
+                entries.append(json.loads(line))
+    except (EOFError, json.JSONDecodeError):
+        # The end of a cassette cut by a crash
+        pass
+    return entries
+
+
+class RecordingAdapter(HTTPAdapter):
+    # Sends the requests to the network and appends each exchange to the
+    # cassette, shared by the sessions and threads of the process
+    _fout: gzip.GzipFile
+    _lock: Lock
+
+    def __init__(self, fout: gzip.GzipFile, lock: Lock) -> None:
+        super().__init__()
+        self._fout = fout
+        self._lock = lock
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        response = super().send(request, **kwargs)
+        content = response.content
+        try:
+            body, encoding = content.decode(), ''
+        except UnicodeDecodeError:
+            body, encoding = base64.b64encode(content).decode(), 'base64'
+        method, url, body_hash = _key(request.method, request.url, request.body)
+        window_key = _window_key(request.method, request.url, request.body)
+        line = json.dumps({
+            'method': method,
+            'url': url,
+            'body_hash': body_hash,
+            'window_hash': window_key[2] if window_key else '',
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {
+                key: value
+                for key, value in response.headers.items()
+                if key.lower() not in _dropped_headers
+            },
+            'body': body,
+            'encoding': encoding,
+            'elapsed': response.elapsed.total_seconds()
+        })
+        with self._lock:
+            self._fout.write(f'{line}\n'.encode())
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    # Answers the requests with the recorded responses, without any network:
+    # a request gets the first response not replayed yet recorded for the
+    # same method, URL and body. A portal query on a time window may also
+    # get the one of the same query with another window end (the window
+    # ending at the current time), any other request without a response of
+    # its own fails. Each response is delayed by the seconds it took when
+    # recorded if "latency" is None, by "latency" seconds otherwise.
+    _exact: dict[tuple[str, str, str], deque]
+    _windows: dict[tuple[str, str, str], deque]
+    _latency: float | None
+    _lock: Lock
+
+    def __init__(self, entries: list[dict], latency: float | None = 0.0) -> None:
+        super().__init__()
+        if latency is not None and latency < 0:
+            raise ValueError('The replay latency cannot be a negative number')
+        self._exact = defaultdict(deque)
+        self._windows = defaultdict(deque)
+        for entry in entries:
+            # Shared by both queues, replayed once through either of them
+            entry = dict(entry, replayed=False)
+            self._exact[(entry['method'], entry['url'], entry['body_hash'])].append(entry)
+            if entry.get('window_hash'):
+                self._windows[(entry['method'], entry['url'], entry['window_hash'])].append(entry)
+        self._latency = latency
+        self._lock = Lock()
+
+    def _next(self, queue: deque) -> dict | None:
+        while queue and queue[0]['replayed']:
+            queue.popleft()
+        if not queue:
+            return None
+        entry = queue.popleft()
+        entry['replayed'] = True
+        return entry
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        method, url, body_hash = _key(request.method, request.url, request.body)
+        window_key = _window_key(request.method, request.url, request.body)
+        with self._lock:
+            entry = self._next(self._exact[(method, url, body_hash)])
+            if entry is None and window_key is not None:
+                entry = self._next(self._windows[window_key])
+        if entry is None:
+            raise ConnectionError(
+                f'No recorded response left for {method} {url}', request=request)
+
+        delay = entry['elapsed'] if self._latency is None else self._latency
+        if delay:
+            time.sleep(delay)
+
+        response = Response()
+        response.status_code = entry['status']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        if entry['encoding'] == 'base64':
+            response._content = base64.b64decode(entry['body'])
+        else:
+            response._content = entry['body'].encode()
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=delay)
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,61 @@
+import atexit
+import gzip
+from logging import getLogger
+from threading import Lock
+
+from requests import Session, session
+from requests.adapters import BaseAdapter
+
+from transport.cassette import ReplayAdapter, RecordingAdapter, read_cassette
+
+logger = getLogger(__name__)
+
+# The adapter mounted on the sessions of the connectors, the network one of
+# requests while neither recording nor replaying
+_adapter: BaseAdapter | None = None
+
+
+def configure(record: str = '', replay: str = '', latency: float | None = 0.0) -> None:
+    # Record the exchanges of the sessions created from now on to the
+    # cassette "record", or replay the ones of the cassette "replay" (see
+    # transport.cassette.ReplayAdapter for the latency)
+    global _adapter
+    if record and replay:
+        raise ValueError('A cassette cannot be recorded and replayed at the same time')
+    if record:
+        fout = gzip.open(record, 'wb')
+        atexit.register(fout.close)
+        _adapter = RecordingAdapter(fout, Lock())
+        logger.info(
+            'Recording the requests to %(filepath)s',
+            {
+                'filepath': record
+            }
+        )
+    elif replay:
+        entries = read_cassette(replay)
+        _adapter = ReplayAdapter(entries, latency)
+        logger.info(
+            'Replaying %(count)d requests from %(filepath)s',
+            {
+                'count': len(entries),
+                'filepath': replay
+            }
+        )
+    else:
+        _adapter = None
+
+
+def is_replaying() -> bool:
+    return isinstance(_adapter, ReplayAdapter)
+
+
+def new_session(headers: dict) -> Session:
+    # The session of a connector, sending its requests through the
+    # configured adapter
+    new = session()
+    new.headers.update(headers)
+    if _adapter:
+        new.mount('http://', _adapter)
+        new.mount('https://', _adapter)
+    return new
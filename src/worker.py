@@ -0,0 +1,97 @@
+import argparse
+import json
+import logging
+import os
+import socket
+from aiod.aiod import AIoD
+from airedgio.airedgio import AIRedgio
+from airedgio.sharded import ShardedWorker
+from bridge.bridge import Bridge
+from telemetry import tracing
+from telemetry.logs import configure_logging
+from telemetry.metrics import REGISTRY
+
+CONFIGS = './configurations'
+
+logger = logging.getLogger(__name__)
+
+
+def init_argparse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--owner',
+        action='store',
+        default=f'{socket.gethostname()}-{os.getpid()}',
+        help='The name identifying this worker in the leases'
+    )
+    parser.add_argument(
+        '--lease_ttl',
+        action='store',
+        type=float,
+        default=600,
+        help='The seconds a lease lasts if not renewed'
+    )
+    parser.add_argument(
+        '--batch_size',
+        action='store',
+        type=int,
+        default=100,
+        help='The number of failed assets claimed at a time'
+    )
+    parser.add_argument(
+        '--trace',
+        action='store_true',
+        help='Trace the conversion of each asset, writing the spans in ./memory'
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = init_argparse()
+    # One file per worker, they run in separate processes
+    configure_logging(CONFIGS, f'worker_{args.owner}')
+
+    aiod_configuration_path = f'{CONFIGS}/aiod_configuration.json'
+    airedgio_configuration_path = f'{CONFIGS}/airedgio_configuration.json'
+    bridge_configuration_path = f'{CONFIGS}/configuration_folder'
+    # Workers share their work through the memory, only SQLite supports it
+    memory_filepath = f'sqlite:memory/memory.sqlite3'
+
+    # Configure the AIoD connector
+    with open(aiod_configuration_path, 'r') as fin:
+        aiod_configuration = json.load(fin)
+    aiod = AIoD(**aiod_configuration)
+
+    # Configure the bridge with the AIoD connector
+    bridge = Bridge(bridge_configuration_path, aiod)
+
+    # Configure the AI REDGIO connector
+    with open(airedgio_configuration_path, 'r') as fin:
+        airedgio_configuration = json.load(fin)
+    airedgio = AIRedgio(
+        **airedgio_configuration,
+        bridge=bridge,
+        memory_filepath=memory_filepath
+    )
+
+    # Convert the assets together with the other workers
+    worker = ShardedWorker(
+        airedgio,
+        owner=args.owner,
+        lease_ttl=args.lease_ttl,
+        batch_size=args.batch_size
+    )
+    # Trace the conversion of each asset if asked to, one file per worker as well
+    if args.trace:
+        tracing.configure(f'./memory/traces_{args.owner}.jsonl')
+    try:
+        worker.convert_all()
+    finally:
+        # One file per worker, they run in separate processes
+        REGISTRY.write(f'./memory/metrics_{args.owner}.prom')
+
+
+if __name__ == '__main__':
+    main()